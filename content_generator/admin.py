@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Task, Event, DailySummary, LLMAdvice
+from .models import Task, Event, DailySummary, DailyRollup, LLMAdvice, LLMJob, LLMWorker, LLMCall, MediaBlob, UploadSession, UserStats
+from .telemetry import SUMMARY_DAYS, recent_calls, summarize_calls, token_prices
 
 # 任务管理器
 @admin.register(Task)
@@ -52,4 +53,99 @@ class LLMAdviceAdmin(admin.ModelAdmin):
     ]
     search_fields = ['content', 'user__username']
     readonly_fields = ['created_at']
-    date_hierarchy = 'created_at'
\ No newline at end of file
+    date_hierarchy = 'created_at'
+
+# LLM调用记录管理器（列表页顶部按生成类型汇总延迟分位数和用量）
+@admin.register(LLMCall)
+class LLMCallAdmin(admin.ModelAdmin):
+    list_display = [
+        'call_type', 'source', 'latency_ms', 'first_token_ms',
+        'prompt_chars', 'response_chars', 'batch_size', 'error', 'created_at'
+    ]
+    list_filter = [
+        'call_type', 'source', 'created_at'
+    ]
+    search_fields = ['error']
+    date_hierarchy = 'created_at'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        # 汇总范围与当前筛选条件一致，没有按日期筛选时只汇总最近几天
+        changelist = getattr(response, 'context_data', {}).get('cl')
+        if changelist is not None:
+            queryset = changelist.queryset
+            date_filtered = any(key.startswith('created_at') for key in request.GET)
+            if not date_filtered:
+                queryset = recent_calls(queryset)
+            response.context_data['call_summary'] = summarize_calls(queryset)
+            response.context_data['summary_days'] = None if date_filtered else SUMMARY_DAYS
+            response.context_data['show_cost'] = any(token_prices())
+        return response
+
+# LLM生成任务管理器
+@admin.register(LLMJob)
+class LLMJobAdmin(admin.ModelAdmin):
+    list_display = [
+        'user', 'advice_type', 'related_id', 'status',
+        'attempts', 'locked_by', 'created_at'
+    ]
+    list_filter = [
+        'status', 'advice_type', 'created_at'
+    ]
+    search_fields = ['user__username', 'error']
+    readonly_fields = ['created_at', 'updated_at']
+    date_hierarchy = 'created_at'
+
+# LLM执行者管理器
+@admin.register(LLMWorker)
+class LLMWorkerAdmin(admin.ModelAdmin):
+    list_display = ['worker_id', 'started_at', 'last_seen']
+    readonly_fields = ['worker_id', 'started_at', 'last_seen']
+
+# 用户统计管理器
+@admin.register(UserStats)
+class UserStatsAdmin(admin.ModelAdmin):
+    list_display = [
+        'user', 'total_tasks', 'completed_tasks',
+        'total_events', 'total_summaries', 'updated_at'
+    ]
+    search_fields = ['user__username']
+    readonly_fields = [field.name for field in UserStats._meta.fields]
+
+# 每日汇总管理器
+@admin.register(DailyRollup)
+class DailyRollupAdmin(admin.ModelAdmin):
+    list_display = [
+        'user', 'date', 'tasks_created', 'tasks_completed',
+        'events_created', 'updated_at'
+    ]
+    list_filter = ['date']
+    search_fields = ['user__username']
+    readonly_fields = [field.name for field in DailyRollup._meta.fields]
+    date_hierarchy = 'date'
+
+# 图片上传会话管理器
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = [
+        'filename', 'user', 'size', 'offset', 'result_name', 'created_at', 'expires_at'
+    ]
+    list_filter = ['created_at', 'expires_at']
+    search_fields = ['filename', 'user__username']
+    readonly_fields = [field.name for field in UploadSession._meta.fields]
+
+# 图片文件管理器
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = [
+        'name', 'size', 'ref_count', 'created_at', 'updated_at'
+    ]
+    list_filter = ['created_at']
+    search_fields = ['name']
+    readonly_fields = [field.name for field in MediaBlob._meta.fields]
@@ -0,0 +1,229 @@
+"""
+任务效率分析
+
+把用户的每日汇总和带截止时间的任务按列载入 NumPy 数组，以向量化方式计算：
+
+- 完成率趋势：按创建日期的新建/完成数及滑动窗口完成率；
+- 意愿度与按时完成：各意愿度的按时完成率，以及两者的相关系数；
+- 各优先级的平均逾期时长。
+
+结果按用户缓存，缓存键中带有该用户数据的最后写入时间（任务和每日汇总的
+updated_at 最大值），任务或事件变更后自然换用新的键，无需主动失效。
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Task, DailyRollup
+
+ANALYTICS_CACHE_KEY = 'task_analytics:{user_id}:{version}:{date}:{days}:{window}'
+# 未完成任务的逾期时长随时间增长，缓存不宜过久
+ANALYTICS_CACHE_TIMEOUT = 10 * 60
+
+DEFAULT_DAYS = 90
+MAX_DAYS = 366
+DEFAULT_WINDOW = 7
+
+PRIORITIES = [value for value, _ in Task.PRIORITY_CHOICES]
+# 意愿度从低到高依次记为 1~5 分
+WILLINGNESS_LEVELS = [value for value, _ in Task.WILLINGNESS_CHOICES]
+
+
+def analytics_version(user):
+    """
+    用户任务数据的最后写入时间，作为缓存版本
+
+    任务保存会更新任务的 updated_at，任务新建、完成和删除会更新每日汇总的 updated_at。
+
+    Returns:
+        str: 微秒时间戳，没有数据时为 '0'
+    """
+    versions = [
+        Task.objects.filter(user=user).aggregate(version=Max('updated_at'))['version'],
+        DailyRollup.objects.filter(user=user).aggregate(version=Max('updated_at'))['version'],
+    ]
+    versions = [version for version in versions if version is not None]
+    if not versions:
+        return '0'
+    return str(int(max(versions).timestamp() * 1_000_000))
+
+
+def rolling_sum(values, window):
+    """
+    滑动窗口求和，前 window-1 天按已有天数求和
+    """
+    totals = np.concatenate(([0], np.cumsum(values)))
+    ends = np.arange(1, len(values) + 1)
+    return totals[ends] - totals[np.maximum(ends - window, 0)]
+
+
+def safe_ratio(numerators, denominators):
+    """
+    逐元素相除，分母为0的位置为 NaN
+    """
+    numerators = np.asarray(numerators, dtype=float)
+    denominators = np.asarray(denominators, dtype=float)
+    return np.divide(numerators, denominators, out=np.full(numerators.shape, np.nan), where=denominators > 0)
+
+
+def to_list(values, digits=4):
+    """
+    转换为可序列化为JSON的列表，NaN 转为 None
+    """
+    return [None if np.isnan(value) else round(float(value), digits) for value in values]
+
+
+def completion_trend(user, start, end, window):
+    """
+    按创建日期的完成率趋势，数据来自每日汇总
+
+    没有汇总行的日期计为0，日期轴是连续的。
+    """
+    days = (end - start).days + 1
+    rows = list(
+        DailyRollup.objects.filter(user=user, date__gte=start, date__lte=end)
+        .values_list('date', 'tasks_created', 'tasks_completed')
+    )
+    created = np.zeros(days, dtype=np.int64)
+    completed = np.zeros(days, dtype=np.int64)
+    if rows:
+        dates, created_counts, completed_counts = zip(*rows)
+        offsets = np.array([(day - start).days for day in dates], dtype=np.int64)
+        created[offsets] = created_counts
+        completed[offsets] = completed_counts
+
+    return {
+        'dates': [(start + timedelta(days=offset)).isoformat() for offset in range(days)],
+        'created': created.tolist(),
+        'completed': completed.tolist(),
+        'rolling_rate': to_list(safe_ratio(rolling_sum(completed, window), rolling_sum(created, window))),
+    }
+
+
+def load_task_columns(user, start, end):
+    """
+    把日期范围内创建、带截止时间的任务载入列数组
+
+    Returns:
+        dict: priority（PRIORITIES 下标）、willingness（1~5分）、
+              due/completed_at（Unix 秒，未完成为 NaN）
+    """
+    rows = list(
+        Task.objects.filter(
+            user=user, created_date__gte=start, created_date__lte=end, due_date__isnull=False,
+        ).values_list('priority', 'willingness', 'due_date', 'completed', 'completed_at')
+    )
+    priority_index = {value: index for index, value in enumerate(PRIORITIES)}
+    willingness_score = {value: index + 1 for index, value in enumerate(WILLINGNESS_LEVELS)}
+    return {
+        'priority': np.array([priority_index.get(row[0], 1) for row in rows], dtype=np.int64),
+        'willingness': np.array([willingness_score.get(row[1], 3) for row in rows], dtype=np.int64),
+        'due': np.array([row[2].timestamp() for row in rows], dtype=float),
+        'completed_at': np.array(
+            [row[4].timestamp() if row[3] and row[4] else np.nan for row in rows], dtype=float,
+        ),
+    }
+
+
+def deadline_stats(columns, now):
+    """
+    意愿度与按时完成的关系，以及各优先级的逾期情况
+
+    只统计已完成或已过截止时间的任务；未完成的任务按当前时间计算逾期时长。
+    """
+    finished = ~np.isnan(columns['completed_at'])
+    measured = finished | (columns['due'] < now)
+    finish_time = np.where(finished, columns['completed_at'], now)[measured]
+    due = columns['due'][measured]
+    priority = columns['priority'][measured]
+    willingness = columns['willingness'][measured]
+
+    on_time = finished[measured] & (finish_time <= due)
+    lateness_hours = np.clip(finish_time - due, 0, None) / 3600
+
+    # 意愿度分为 1~5，下标0不使用
+    levels = len(WILLINGNESS_LEVELS) + 1
+    level_tasks = np.bincount(willingness, minlength=levels)
+    level_on_time = np.bincount(willingness, weights=on_time, minlength=levels)
+    level_rates = safe_ratio(level_on_time, level_tasks)
+
+    # 任一列没有变化时相关系数无意义
+    correlation = None
+    if len(on_time) >= 2 and np.ptp(willingness) > 0 and np.ptp(on_time.astype(float)) > 0:
+        correlation = round(float(np.corrcoef(willingness, on_time.astype(float))[0, 1]), 4)
+
+    priority_tasks = np.bincount(priority, minlength=len(PRIORITIES))
+    priority_late = np.bincount(priority, weights=lateness_hours > 0, minlength=len(PRIORITIES))
+    priority_lateness = safe_ratio(np.bincount(priority, weights=lateness_hours, minlength=len(PRIORITIES)), priority_tasks)
+
+    willingness_labels = dict(Task.WILLINGNESS_CHOICES)
+    priority_labels = dict(Task.PRIORITY_CHOICES)
+    return {
+        'willingness': {
+            'levels': [
+                {
+                    'value': value,
+                    'label': willingness_labels[value],
+                    'tasks': int(level_tasks[score]),
+                    'on_time_rate': to_list([level_rates[score]])[0],
+                }
+                for score, value in enumerate(WILLINGNESS_LEVELS, start=1)
+            ],
+            'correlation': correlation,
+        },
+        'lateness_by_priority': [
+            {
+                'priority': value,
+                'label': priority_labels[value],
+                'tasks': int(priority_tasks[index]),
+                'late_tasks': int(priority_late[index]),
+                'avg_lateness_hours': to_list([priority_lateness[index]], 2)[0],
+            }
+            for index, value in enumerate(PRIORITIES)
+        ],
+    }
+
+
+def compute_task_analytics(user, today, days=DEFAULT_DAYS, window=DEFAULT_WINDOW):
+    """
+    计算用户最近 days 天的任务效率分析（不使用缓存）
+
+    Args:
+        user: 当前用户
+        today (date): TIME_ZONE 下的当前日期
+        days (int): 统计的天数（含今天）
+        window (int): 完成率的滑动窗口天数
+
+    Returns:
+        dict: 可直接返回为JSON的分析结果
+    """
+    start = today - timedelta(days=days - 1)
+    columns = load_task_columns(user, start, today)
+    return {
+        'start': start.isoformat(),
+        'end': today.isoformat(),
+        'window': window,
+        'completion_trend': completion_trend(user, start, today, window),
+        **deadline_stats(columns, timezone.now().timestamp()),
+    }
+
+
+def get_task_analytics(user, today, days=DEFAULT_DAYS, window=DEFAULT_WINDOW):
+    """
+    获取任务效率分析，按用户数据的最后写入时间缓存
+
+    Returns:
+        dict: compute_task_analytics() 的结果，附带 version
+    """
+    version = analytics_version(user)
+    key = ANALYTICS_CACHE_KEY.format(
+        user_id=user.pk, version=version, date=today.isoformat(), days=days, window=window,
+    )
+    analytics = cache.get(key)
+    if analytics is None:
+        analytics = {'version': version, **compute_task_analytics(user, today, days, window)}
+        cache.set(key, analytics, ANALYTICS_CACHE_TIMEOUT)
+    return analytics
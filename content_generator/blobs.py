@@ -0,0 +1,236 @@
+"""
+事件图片文件的引用计数和垃圾回收
+
+Event.image 按内容寻址存储（见 storage.py），多个事件上传同一张照片时共用一个文件。
+MediaBlob 记录每个文件被多少事件引用，由事件的保存/删除信号维护；
+缩略图按文件生成一次，记录在 MediaBlob.variants 中，引用同一文件的事件直接共用。
+
+引用数降到0的文件不会立即删除，由 gc_media 命令在宽限期后删除（连同它的缩略图）：
+- 宽限期内刚被重新上传的文件修改时间会被刷新，不会被删除；
+- 绕过信号修改 Event.image 后，用 --recount 从事件表重新计数；
+- --sweep 额外扫描存储目录，删除不被任何事件引用的文件（升级前上传的、更换缩略图配置后留下的）。
+
+删除时先把文件改名为墓碑名，之后的上传看不到它、会重新写入；改名后再确认文件仍然过期
+且没有被重新引用才真正删除，否则改回原名。
+"""
+import logging
+import os
+import posixpath
+import uuid
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Event, MediaBlob
+from .storage import event_image_storage
+
+logger = logging.getLogger(__name__)
+
+# 引用数为0的文件保留的时间
+DEFAULT_GRACE = timedelta(days=1)
+
+
+def blob_size(name):
+    """
+    文件大小，文件不存在时为0
+    """
+    try:
+        return event_image_storage().size(name)
+    except OSError:
+        return 0
+
+
+def change_refs(name, delta):
+    """
+    调整文件的引用数，第一次引用时创建记录
+    """
+    now = timezone.now()
+    updated = MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') + delta, updated_at=now)
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            MediaBlob.objects.create(name=name, size=blob_size(name), ref_count=delta, updated_at=now)
+    except IntegrityError:
+        # 并发请求刚刚创建了这条记录
+        MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') + delta, updated_at=now)
+
+
+def image_changed(old_name, new_name):
+    """
+    事件的图片从 old_name 换成 new_name 后更新两边的引用数（空名字表示没有图片）
+    """
+    if old_name == new_name:
+        return
+    if new_name:
+        change_refs(new_name, 1)
+    if old_name:
+        change_refs(old_name, -1)
+
+
+def shared_variants(name):
+    """
+    引用同一文件的事件已经生成的缩略图，没有时返回 None
+    """
+    variants = MediaBlob.objects.filter(name=name).values_list('variants', flat=True).first()
+    if variants and variants.get('source') == name and variants.get('variants'):
+        return variants
+    return None
+
+
+def remember_variants(name, info):
+    """
+    记录文件的缩略图，供之后引用同一文件的事件共用
+    """
+    MediaBlob.objects.filter(name=name).update(variants=info)
+
+
+def recount_references():
+    """
+    从事件表重新计算所有文件的引用数
+
+    Returns:
+        int: 引用数被修正的文件数
+    """
+    counts = dict(
+        Event.objects.exclude(image='').exclude(image__isnull=True)
+        .values('image').annotate(refs=Count('id')).values_list('image', 'refs')
+    )
+    fixed = 0
+    for blob in MediaBlob.objects.only('pk', 'name', 'ref_count').iterator():
+        refs = counts.pop(blob.name, 0)
+        if blob.ref_count != refs:
+            MediaBlob.objects.filter(pk=blob.pk).update(ref_count=refs, updated_at=timezone.now())
+            fixed += 1
+    for name, refs in counts.items():
+        MediaBlob.objects.get_or_create(name=name, defaults={'size': blob_size(name), 'ref_count': refs})
+        fixed += 1
+    return fixed
+
+
+def live_names():
+    """
+    仍被引用的全部文件名：事件的图片和它们的缩略图，以及有引用的文件记录的缩略图
+    """
+    names = set()
+    for image, info in Event.objects.exclude(image='').exclude(image__isnull=True).values_list('image', 'image_variants').iterator():
+        names.add(image)
+        names.update(variant['name'] for variant in (info or {}).get('variants', []))
+    for info in MediaBlob.objects.filter(ref_count__gt=0).values_list('variants', flat=True).iterator():
+        names.update(variant['name'] for variant in (info or {}).get('variants', []))
+    return names
+
+
+def is_stale(storage, name, cutoff):
+    """
+    文件在 cutoff 之前就没有再被写入（刚重新上传的文件修改时间会被刷新）
+    """
+    try:
+        return storage.get_modified_time(name) < cutoff
+    except OSError:
+        return True
+
+
+def delete_file(storage, name):
+    """
+    删除文件，文件已不存在时忽略
+    """
+    try:
+        storage.delete(name)
+    except OSError as e:
+        logger.error(f"删除图片文件 {name} 失败: {str(e)}")
+
+
+def delete_unused(storage, name, source, cutoff):
+    """
+    文件改名为墓碑名后再次确认仍然过期、source 也没有被重新引用，才删除墓碑
+
+    Args:
+        name (str): 要删除的文件
+        source (str): 文件所属的原图（原图本身时与 name 相同）
+        cutoff (datetime): 宽限期的截止时间
+
+    Returns:
+        int: 释放的字节数，文件被保留或已不存在时为 None
+    """
+    tombstone = posixpath.join(posixpath.dirname(name), f'.{uuid.uuid4().hex}.deleted')
+    try:
+        os.rename(storage.path(name), storage.path(tombstone))
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.error(f"删除图片文件 {name} 失败: {str(e)}")
+        return None
+    if not is_stale(storage, tombstone, cutoff) or MediaBlob.objects.filter(name=source, ref_count__gt=0).exists():
+        # 改名前刚被重新上传或引用；改名后又写入的同名文件内容相同，直接覆盖
+        os.replace(storage.path(tombstone), storage.path(name))
+        return None
+    size = storage.size(tombstone)
+    delete_file(storage, tombstone)
+    return size
+
+
+def collect_garbage(grace=DEFAULT_GRACE, sweep=False, dry_run=False):
+    """
+    删除引用数为0且超过宽限期的文件及其缩略图
+
+    Args:
+        grace (timedelta): 宽限期
+        sweep (bool): 是否扫描存储目录，删除没有任何引用的文件
+        dry_run (bool): 只统计不删除
+
+    Returns:
+        tuple: (删除的文件数, 释放的字节数)
+    """
+    storage = event_image_storage()
+    cutoff = timezone.now() - grace
+    live = live_names()
+    files = freed = 0
+
+    dead = MediaBlob.objects.filter(ref_count__lte=0, updated_at__lt=cutoff)
+    for blob in dead.iterator():
+        names = [blob.name] + [variant['name'] for variant in (blob.variants or {}).get('variants', [])]
+        names = [name for name in names if name not in live and storage.exists(name) and is_stale(storage, name, cutoff)]
+        if dry_run:
+            files += len(names)
+            freed += sum(storage.size(name) for name in names)
+            continue
+        # 以引用数和更新时间为条件删除记录，期间被重新引用的文件保留
+        if not MediaBlob.objects.filter(pk=blob.pk, ref_count__lte=0, updated_at__lt=cutoff).delete()[0]:
+            continue
+        for name in names:
+            size = delete_unused(storage, name, blob.name, cutoff)
+            if size is not None:
+                freed += size
+                files += 1
+
+    if sweep:
+        known = live | set(MediaBlob.objects.filter(ref_count__gt=0).values_list('name', flat=True))
+        for name in walk(storage, Event._meta.get_field('image').upload_to.rstrip('/')):
+            if name in known or not is_stale(storage, name, cutoff):
+                continue
+            if dry_run:
+                freed += storage.size(name)
+                files += 1
+                continue
+            size = delete_unused(storage, name, name, cutoff)
+            if size is not None:
+                freed += size
+                files += 1
+    return files, freed
+
+
+def walk(storage, directory):
+    """
+    递归列出存储目录下的全部文件名
+    """
+    try:
+        directories, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in files:
+        yield posixpath.join(directory, name)
+    for child in directories:
+        yield from walk(storage, posixpath.join(directory, child))
@@ -0,0 +1,240 @@
+"""
+事件图片缩略图
+
+事件保存（事务提交）后，若图片还没有对应的缩略图，就交给后台线程池生成：
+按 WIDTHS 中不超过原图宽度的每个宽度各生成一张 WebP 和 JPEG，
+结果写入 Event.image_variants，模板据此输出 <picture>/srcset，列表只需下载几十KB的缩略图。
+
+线程池的线程数和排队任务数都有上限，队列满时跳过，之后运行
+generate_image_variants 命令补齐。配置（均可省略）：
+
+    IMAGE_VARIANTS = {'WIDTHS': [320, 640, 1280], 'QUALITY': 80, 'WORKERS': 2, 'MAX_PENDING': 32}
+
+WORKERS 为0时在当前线程中同步生成（测试和命令使用）。
+"""
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.signals import setting_changed
+from django.db import connection
+from django.dispatch import receiver
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import blobs
+from .models import Event
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'WIDTHS': [320, 640, 1280],
+    'QUALITY': 80,
+    'WORKERS': 2,
+    'MAX_PENDING': 32,
+}
+
+# 缩略图格式：(格式名, Pillow 格式, 扩展名)
+FORMATS = [
+    ('webp', 'WEBP', 'webp'),
+    ('jpeg', 'JPEG', 'jpg'),
+]
+
+VARIANTS_DIR = 'events/variants'
+
+# EXIF 方向标签，5~8 表示图片需要旋转90°显示
+ORIENTATION_TAG = 0x0112
+ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+def variant_config():
+    """
+    合并默认值后的缩略图配置
+    """
+    return {**DEFAULTS, **(getattr(settings, 'IMAGE_VARIANTS', None) or {})}
+
+
+def needs_variants(event):
+    """
+    事件有图片且还没有为这张图片生成过缩略图
+    """
+    return bool(event.image) and (event.image_variants or {}).get('source') != event.image.name
+
+
+def open_image(source, max_width):
+    """
+    打开图片并按 EXIF 方向旋转，转换为 RGB
+
+    JPEG 用 draft() 在解码时直接缩小，超大照片不必完整解码。
+    """
+    image = Image.open(source)
+    if image.format == 'JPEG':
+        image.draft('RGB', (max_width, max_width))
+    image = ImageOps.exif_transpose(image)
+    if image.mode != 'RGB':
+        background = Image.new('RGB', image.size, 'white')
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        image = background
+    return image
+
+
+def render_variants(source, source_name, storage, config=None):
+    """
+    生成并保存一张图片的全部缩略图
+
+    Args:
+        source: 原图文件对象
+        source_name (str): 原图在存储中的名字，用于生成缩略图文件名
+        storage: 保存缩略图的存储
+
+    Returns:
+        dict: 写入 Event.image_variants 的信息
+    """
+    config = config or variant_config()
+    widths = sorted(config['WIDTHS'])
+    # 只读取文件头得到尺寸，EXIF 方向为旋转90°时交换宽高
+    with Image.open(source) as probe:
+        original_size = probe.size
+        if probe.getexif().get(ORIENTATION_TAG) in ROTATED_ORIENTATIONS:
+            original_size = original_size[::-1]
+    source.seek(0)
+
+    # 不放大：只保留不超过原图宽度的尺寸，原图比最小尺寸还小时按原图宽度生成一张
+    targets = [width for width in widths if width <= original_size[0]] or [original_size[0]]
+    image = open_image(source, targets[-1])
+    stem = posixpath.splitext(posixpath.basename(source_name))[0]
+
+    variants = []
+    # 从大到小缩放，每次在上一张的基础上缩小
+    for width in reversed(targets):
+        height = max(1, round(original_size[1] * width / original_size[0]))
+        image = image.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+        for name, pillow_format, extension in FORMATS:
+            buffer = BytesIO()
+            image.save(buffer, pillow_format, quality=config['QUALITY'], optimize=True)
+            saved_name = storage.save(
+                posixpath.join(VARIANTS_DIR, f'{stem}-{width}w.{extension}'),
+                ContentFile(buffer.getvalue()),
+            )
+            variants.append({'width': width, 'height': height, 'format': name, 'name': saved_name})
+
+    variants.sort(key=lambda variant: (variant['format'], variant['width']))
+    return {
+        'source': source_name,
+        'width': original_size[0],
+        'height': original_size[1],
+        'variants': variants,
+    }
+
+
+def generate_event_variants(event_id, source_name, reuse=True):
+    """
+    为事件的图片生成缩略图并保存到 image_variants
+
+    同一文件（按内容寻址，见 blobs.py）已经生成过缩略图时直接共用，不再解码；
+    生成的结果写入所有引用这个文件的事件。
+    图片已被更换或事件已删除时放弃；图片无法解码时记录错误，不再重试。
+
+    Args:
+        reuse (bool): 是否共用已有的缩略图，为 False 时重新生成
+    """
+    event = Event.objects.filter(pk=event_id, image=source_name).first()
+    if event is None:
+        return
+    info = blobs.shared_variants(source_name) if reuse else None
+    if info is None:
+        storage = event.image.storage
+        try:
+            with storage.open(source_name, 'rb') as source:
+                info = render_variants(source, source_name, storage)
+        except (UnidentifiedImageError, Image.DecompressionBombError, SyntaxError) as e:
+            logger.error(f"事件 {event_id} 的图片无法解码: {str(e)}")
+            info = {'source': source_name, 'variants': [], 'error': str(e)[:200]}
+        except OSError as e:
+            logger.error(f"生成事件 {event_id} 的缩略图失败: {str(e)}")
+            return
+        blobs.remember_variants(source_name, info)
+    # 用 update() 写入，不触发保存信号
+    Event.objects.filter(image=source_name).update(image_variants=info)
+
+
+class VariantPool:
+    """
+    有界的缩略图生成线程池
+
+    Args:
+        workers (int): 线程数，0为同步执行
+        max_pending (int): 最多排队和执行中的任务数，超出时 submit() 返回False
+    """
+
+    def __init__(self, workers, max_pending):
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-variants') if workers else None
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def submit(self, event_id, source_name):
+        """
+        提交一个生成任务
+
+        Returns:
+            bool: 是否已接受
+        """
+        if self._executor is None:
+            generate_event_variants(event_id, source_name)
+            return True
+        if not self._slots.acquire(blocking=False):
+            logger.warning(f"缩略图队列已满，跳过事件 {event_id}，稍后可运行 generate_image_variants 补齐")
+            return False
+        self._executor.submit(self._run, event_id, source_name)
+        return True
+
+    def _run(self, event_id, source_name):
+        try:
+            generate_event_variants(event_id, source_name)
+        except Exception as e:
+            logger.error(f"生成事件 {event_id} 的缩略图失败: {str(e)}")
+        finally:
+            # 线程池中的数据库连接用完即关
+            connection.close()
+            self._slots.release()
+
+    def shutdown(self):
+        """
+        等待执行中的任务完成并关闭线程池
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_variant_pool():
+    """
+    按 settings.IMAGE_VARIANTS 创建并返回进程内共享的线程池
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                config = variant_config()
+                _pool = VariantPool(config['WORKERS'], config['MAX_PENDING'])
+    return _pool
+
+
+@receiver(setting_changed)
+def reset_variant_pool(setting, **kwargs):
+    """
+    IMAGE_VARIANTS 变化时重建线程池
+    """
+    global _pool
+    if setting == 'IMAGE_VARIANTS':
+        with _pool_lock:
+            if _pool is not None:
+                _pool.shutdown()
+            _pool = None
@@ -0,0 +1,372 @@
+"""
+LLM生成任务队列
+
+视图只负责把生成请求写入 LLMJob 表并立即返回，
+由 `manage.py run_llm_worker` 启动的执行者领取任务、调用生成函数并写入 LLMAdvice。
+
+领取任务时先在事务中用 select_for_update(skip_locked) 挑选候选行
+（不支持行锁的后端如SQLite会忽略该子句），再以带条件的 UPDATE 抢占租约，
+因此多个执行者并发运行时同一任务只会被一个执行者领取；
+执行者崩溃后租约到期，任务会被其他执行者重新领取。
+尝试次数在领取时累加，导致执行者崩溃的任务重新领取 MAX_ATTEMPTS 次后标记为失败，不会无限重试。
+
+执行者一次领取一批任务（凑批窗口内陆续到达的任务也会并入），
+把它们的提示词合并为一次后端调用，再把结果分别写回各自的任务。
+
+同一对象同时只有一个未完成的任务（数据库部分唯一约束），重复请求共享该任务；
+生成结果按 (用户, 类型, 关联ID) 唯一保存，重新生成时覆盖旧建议。
+
+执行者运行时定期写入心跳（LLMWorker）。视图通过 submit_advice_job() 提交任务，
+没有存活的执行者时（例如部署中没有启动执行者服务）直接在当前请求中执行，不会一直排队。
+"""
+import logging
+import os
+import socket
+import time
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Task, Event, LLMAdvice, LLMJob, LLMWorker
+from .llm import complete_batch, content_prompt, content_template, task_advice_prompt, task_advice_template
+
+logger = logging.getLogger(__name__)
+
+# 默认租约时长（秒），执行时间超过租约的任务会被视为执行者已失联
+DEFAULT_LEASE_SECONDS = 60
+
+# 失败后最多重试的次数
+MAX_ATTEMPTS = 3
+
+# 重试退避基数（秒），第n次失败后等待 RETRY_BACKOFF_SECONDS * 2**(n-1)
+RETRY_BACKOFF_SECONDS = 5
+
+# 执行者写入心跳的间隔（秒）
+HEARTBEAT_INTERVAL = 10
+
+# 超过这个时间（秒）没有心跳的执行者视为已退出；执行一批任务期间不写心跳，因此不短于租约
+WORKER_TIMEOUT = DEFAULT_LEASE_SECONDS * 2
+
+
+def enqueue_advice_job(user, advice_type, related_id):
+    """
+    写入一条生成任务
+
+    同一对象已有未完成的任务时直接返回该任务，避免重复排队。
+    并发请求同时创建时由唯一约束 llmjob_active_uniq 拒绝后到者，后到者改为返回已有任务。
+
+    Args:
+        user: 任务所属用户
+        advice_type (str): 建议类型，取值见 LLMAdvice.ADVICE_TYPE_CHOICES
+        related_id (int): 关联的任务或事件ID
+
+    Returns:
+        LLMJob: 新建或已存在的任务
+    """
+    active = LLMJob.objects.filter(
+        user=user,
+        advice_type=advice_type,
+        related_id=related_id,
+        status__in=['pending', 'running'],
+    )
+    job = active.first()
+    if job is not None:
+        return job
+    try:
+        with transaction.atomic():
+            return LLMJob.objects.create(user=user, advice_type=advice_type, related_id=related_id)
+    except IntegrityError:
+        # 其他请求刚刚创建了同一对象的任务，共享该任务
+        job = active.first()
+        if job is None:
+            raise
+        return job
+
+
+def heartbeat(worker_id):
+    """
+    记录执行者仍在运行
+    """
+    LLMWorker.objects.update_or_create(worker_id=worker_id, defaults={'last_seen': timezone.now()})
+
+
+def worker_exited(worker_id):
+    """
+    执行者正常退出时删除心跳，视图随即改为在请求中生成
+    """
+    LLMWorker.objects.filter(worker_id=worker_id).delete()
+
+
+def workers_available():
+    """
+    是否有最近写过心跳的执行者
+    """
+    return LLMWorker.objects.filter(last_seen__gte=timezone.now() - timedelta(seconds=WORKER_TIMEOUT)).exists()
+
+
+def submit_advice_job(user, advice_type, related_id):
+    """
+    提交生成任务：有存活的执行者时只排队，否则在当前请求中领取并执行
+
+    Returns:
+        LLMJob: 任务（在请求中执行时为执行后的状态）
+    """
+    job = enqueue_advice_job(user, advice_type, related_id)
+    if job.status != 'pending' or workers_available():
+        return job
+    worker_id = f'inline:{socket.gethostname()}:{os.getpid()}'
+    claimed = claim_jobs(worker_id, job_ids=[job.id])
+    if claimed:
+        run_jobs(claimed, worker_id)
+        job.refresh_from_db()
+    return job
+
+
+def save_advice(user_id, advice_type, related_id, content):
+    """
+    保存生成结果，对象已有建议时覆盖
+
+    Returns:
+        LLMAdvice: 保存后的建议
+    """
+    advice, _ = LLMAdvice.objects.update_or_create(
+        user_id=user_id,
+        advice_type=advice_type,
+        related_id=related_id,
+        defaults={'content': content},
+    )
+    return advice
+
+
+def claim_jobs(worker_id, limit=1, lease_seconds=DEFAULT_LEASE_SECONDS, job_ids=None):
+    """
+    领取可执行的任务并加上租约，同时累加尝试次数
+
+    租约到期的任务说明上一次执行没有结束（执行者崩溃或卡住），同样计为一次尝试；
+    已用完尝试次数的这类任务直接标记为失败，不再领取。
+
+    Args:
+        worker_id (str): 执行者标识
+        limit (int): 最多领取的任务数
+        lease_seconds (int): 租约时长
+        job_ids (list, optional): 只从这些任务中领取
+
+    Returns:
+        list: 领取成功的 LLMJob 列表
+    """
+    now = timezone.now()
+    expired = Q(status='running', locked_until__lt=now)
+    LLMJob.objects.filter(expired, attempts__gte=MAX_ATTEMPTS).update(
+        status='failed', error='执行者多次失联', locked_until=None, updated_at=now,
+    )
+    claimable = Q(status='pending', available_at__lte=now) | (expired & Q(attempts__lt=MAX_ATTEMPTS))
+    if job_ids is not None:
+        claimable &= Q(id__in=job_ids)
+    claimed = []
+    with transaction.atomic():
+        candidates = list(
+            LLMJob.objects.select_for_update(skip_locked=True)
+            .filter(claimable)
+            .order_by('available_at', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        for job_id in candidates:
+            # 条件更新保证同一任务只被一个执行者抢到
+            updated = LLMJob.objects.filter(claimable, id=job_id).update(
+                status='running',
+                attempts=F('attempts') + 1,
+                locked_by=worker_id,
+                locked_until=now + timedelta(seconds=lease_seconds),
+                updated_at=now,
+            )
+            if updated:
+                claimed.append(job_id)
+    return list(LLMJob.objects.filter(id__in=claimed).order_by('available_at', 'id'))
+
+
+def claim_batch(worker_id, limit, lease_seconds=DEFAULT_LEASE_SECONDS, window=0.0, poll=0.01):
+    """
+    领取一批任务，未凑满时在 window 秒内继续领取新到达的任务
+
+    没有任务时立即返回，因此空闲时不会额外等待；
+    单个任务的延迟最多增加 window 秒。
+
+    Returns:
+        list: 领取到的任务
+    """
+    jobs = claim_jobs(worker_id, limit, lease_seconds)
+    if not jobs or window <= 0:
+        return jobs
+    deadline = time.monotonic() + window
+    while len(jobs) < limit:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        time.sleep(min(poll, remaining))
+        jobs += claim_jobs(worker_id, limit - len(jobs), lease_seconds)
+    return jobs
+
+
+def advice_request(job):
+    """
+    构造任务对应的提示词和模板生成函数
+
+    Returns:
+        tuple: (生成类型, 提示词, 模板生成函数)
+    """
+    if job.advice_type == 'task':
+        task = Task.objects.get(id=job.related_id, user_id=job.user_id)
+        return 'task', task_advice_prompt(task), lambda: task_advice_template(task)
+    if job.advice_type == 'event':
+        event = Event.objects.get(id=job.related_id, user_id=job.user_id)
+        return 'event', content_prompt(event), lambda: content_template(event)
+    raise ValueError(f'不支持的建议类型: {job.advice_type}')
+
+
+def held_job(job, worker_id):
+    """
+    仍由该执行者持有租约的任务
+    """
+    return LLMJob.objects.filter(id=job.id, status='running', locked_by=worker_id)
+
+
+def renew_lease(jobs, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """
+    延长仍由该执行者持有的任务的租约，长时间执行时定期调用，避免被其他执行者当作失联接管
+
+    Returns:
+        int: 续约成功的任务数
+    """
+    return LLMJob.objects.filter(id__in=[job.id for job in jobs], status='running', locked_by=worker_id).update(
+        locked_until=timezone.now() + timedelta(seconds=lease_seconds),
+    )
+
+
+def abandon_job(job, worker_id, error):
+    """
+    不再重试，直接标记为失败（例如流式生成中途出错，等待同一任务的请求随即收到失败）
+    """
+    held_job(job, worker_id).update(status='failed', error=str(error), locked_until=None, updated_at=timezone.now())
+
+
+def fail_job(job, worker_id, error):
+    """
+    记录一次失败：按指数退避重新排队，超过最大尝试次数后标记为失败（尝试次数已在领取时累加）
+    """
+    attempts = job.attempts
+    now = timezone.now()
+    held = held_job(job, worker_id)
+    if attempts >= MAX_ATTEMPTS:
+        held.update(status='failed', error=str(error), locked_until=None, updated_at=now)
+    else:
+        held.update(
+            status='pending',
+            error=str(error),
+            available_at=now + timedelta(seconds=RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1)),
+            locked_until=None,
+            updated_at=now,
+        )
+
+
+def complete_job(job, worker_id, content):
+    """
+    写入生成结果并标记完成，租约已被其他执行者接管时放弃结果
+
+    Returns:
+        bool: 是否写入成功
+    """
+    held = held_job(job, worker_id)
+    with transaction.atomic():
+        if not held.select_for_update().exists():
+            logger.warning(f"LLM任务 {job.id} 的租约已失效，放弃结果")
+            return False
+        advice = save_advice(job.user_id, job.advice_type, job.related_id, content)
+        held.update(
+            status='done',
+            advice=advice,
+            error='',
+            locked_until=None,
+            updated_at=timezone.now(),
+        )
+    return True
+
+
+def run_jobs(jobs, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """
+    执行一批已领取的任务
+
+    所有任务的提示词合并为一次 complete_batch() 调用，结果分别写回各任务；
+    某一项失败只影响对应的任务，整批调用失败时每个任务各记一次失败。
+    后端每完成一次请求就为整批任务续约 lease_seconds，后端不支持批量接口、
+    逐个生成整批提示词时，总耗时超过一个租约也不会被其他执行者接管。
+
+    Returns:
+        list: 与 jobs 一一对应，表示各任务是否成功完成
+    """
+    outcomes = {}
+    ready = []
+    requests = []
+    for job in jobs:
+        try:
+            requests.append(advice_request(job))
+        except (Task.DoesNotExist, Event.DoesNotExist):
+            # 关联对象已删除，没有重试的意义
+            held_job(job, worker_id).update(
+                status='failed', error='关联对象不存在', locked_until=None, updated_at=timezone.now(),
+            )
+            outcomes[job.id] = False
+            continue
+        except ValueError as e:
+            logger.error(f"LLM任务 {job.id} 执行失败: {str(e)}")
+            fail_job(job, worker_id, e)
+            outcomes[job.id] = False
+            continue
+        ready.append(job)
+
+    if ready:
+        try:
+            results = complete_batch(requests, progress=lambda: renew_lease(ready, worker_id, lease_seconds))
+        except Exception as e:
+            logger.exception(f"LLM任务批量生成失败（{len(ready)} 个任务）")
+            results = [e] * len(ready)
+
+        for job, result in zip(ready, results):
+            if isinstance(result, Exception):
+                logger.error(f"LLM任务 {job.id} 执行失败: {str(result)}")
+                fail_job(job, worker_id, result)
+                outcomes[job.id] = False
+            else:
+                outcomes[job.id] = complete_job(job, worker_id, result)
+    return [outcomes[job.id] for job in jobs]
+
+
+def run_job(job, worker_id):
+    """
+    执行一条已领取的任务
+
+    生成成功后写入 LLMAdvice 并标记完成；失败时按指数退避重新排队，
+    超过最大尝试次数后标记为失败。租约已被其他执行者接管时放弃本次结果。
+
+    Returns:
+        bool: 任务是否成功完成
+    """
+    return run_jobs([job], worker_id)[0]
+
+
+def job_status_payload(job):
+    """
+    生成供前端轮询的任务状态数据
+    """
+    payload = {
+        'success': job.status != 'failed',
+        'job_id': job.id,
+        'status': job.status,
+    }
+    if job.status == 'done' and job.advice_id:
+        payload['content'] = job.advice.content
+        payload['advice_id'] = job.advice_id
+    elif job.status == 'failed':
+        payload['error'] = '生成失败，请重试'
+    return payload
@@ -0,0 +1,343 @@
+"""
+LLM内容生成
+
+视图和后台执行者共用的生成函数。每个函数先构造提示词，
+配置了 LLM_BACKEND 时交给后端生成（失败时抛出 LLMError），
+相同提示词的结果由响应缓存复用；未配置时使用内置模板（模拟实现）。
+每次生成都会写入一条 LLMCall 调用记录（见 telemetry.py）。
+"""
+import random
+import time
+
+from .llm_backends import LLMError, get_backend
+from .llm_cache import get_response_cache, prompt_fingerprint
+from .telemetry import build_call, record_call, save_calls
+
+
+def complete(call_type, prompt, fallback):
+    """
+    调用已配置的后端生成文本，未配置后端时使用模板
+
+    规范化后相同的提示词优先从响应缓存读取，未命中才调用后端。
+
+    Args:
+        call_type (str): 生成类型，取值见 LLMCall.CALL_TYPE_CHOICES
+        prompt (str): 提示词
+        fallback: 无参数的模板生成函数
+
+    Returns:
+        str: 生成的文本
+    """
+    started = time.perf_counter()
+    backend = get_backend()
+    if backend is None:
+        content = fallback()
+        record_call(call_type, 'template', started, prompt, content)
+        return content
+
+    cache = get_response_cache()
+    key = prompt_fingerprint(prompt, backend.cache_namespace())
+    content = cache.get(key)
+    if content is not None:
+        record_call(call_type, 'cache', started, prompt, content)
+        return content
+
+    try:
+        content = backend.complete(prompt)
+    except LLMError as e:
+        record_call(call_type, 'backend', started, prompt, error=e)
+        raise
+    record_call(call_type, 'backend', started, prompt, content, usage=backend.last_usage())
+    cache.set(key, content)
+    return content
+
+
+def complete_batch(requests, progress=None):
+    """
+    批量版本的 complete()，未命中缓存的提示词合并为一次后端调用
+
+    相同的提示词只请求一次；整批调用失败时每一项都得到该异常。
+
+    Args:
+        requests (list): (生成类型, 提示词, 模板生成函数) 列表
+        progress (callable, optional): 传给后端 complete_batch()，每完成一次后端请求后调用
+
+    Returns:
+        list: 与 requests 一一对应，元素为生成的文本或 LLMError 实例
+    """
+    calls = []
+    backend = get_backend()
+    if backend is None:
+        results = []
+        for call_type, prompt, fallback in requests:
+            started = time.perf_counter()
+            results.append(fallback())
+            calls.append(build_call(call_type, 'template', started, prompt, results[-1]))
+        save_calls(calls)
+        return results
+
+    cache = get_response_cache()
+    namespace = backend.cache_namespace()
+    keys = [prompt_fingerprint(prompt, namespace) for _, prompt, _ in requests]
+    resolved = {}
+    missing = {}
+    for key, (call_type, prompt, _) in zip(keys, requests):
+        if key in resolved or key in missing:
+            continue
+        started = time.perf_counter()
+        content = cache.get(key)
+        if content is None:
+            missing[key] = prompt
+        else:
+            resolved[key] = content
+            calls.append(build_call(call_type, 'cache', started, prompt, content))
+
+    if missing:
+        started = time.perf_counter()
+        try:
+            outputs = backend.complete_batch(list(missing.values()), progress=progress)
+        except LLMError as e:
+            outputs = [e] * len(missing)
+        for key, output in zip(missing, outputs):
+            if not isinstance(output, LLMError):
+                cache.set(key, output)
+            resolved[key] = output
+
+        # 合并到同一次后端调用的请求各记一条，耗时均为整批耗时
+        for key, (call_type, prompt, _) in zip(keys, requests):
+            if key in missing:
+                output = resolved[key]
+                failed = isinstance(output, LLMError)
+                calls.append(build_call(
+                    call_type, 'backend', started, prompt,
+                    content='' if failed else output,
+                    error=output if failed else '',
+                    batch_size=len(missing),
+                ))
+    save_calls(calls)
+    return [resolved[key] for key in keys]
+
+
+def stream_complete(call_type, prompt, fallback):
+    """
+    流式版本的 complete()，逐段返回生成的文本
+
+    缓存命中或未配置后端时一次性返回全文；流式生成结束后写入响应缓存。
+    调用记录额外包含首个片段的耗时。
+
+    Yields:
+        str: 生成的文本片段
+    """
+    started = time.perf_counter()
+    backend = get_backend()
+    if backend is None:
+        content = fallback()
+        record_call(call_type, 'template', started, prompt, content)
+        yield content
+        return
+
+    cache = get_response_cache()
+    key = prompt_fingerprint(prompt, backend.cache_namespace())
+    content = cache.get(key)
+    if content is not None:
+        record_call(call_type, 'cache', started, prompt, content)
+        yield content
+        return
+
+    parts = []
+    first_token_at = None
+    error = ''
+    try:
+        for piece in backend.stream(prompt):
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            parts.append(piece)
+            yield piece
+    except LLMError as e:
+        error = e
+        raise
+    except GeneratorExit:
+        error = '客户端中断'
+        raise
+    finally:
+        record_call(
+            call_type, 'backend', started, prompt, ''.join(parts),
+            error=error, first_token_at=first_token_at,
+        )
+    cache.set(key, ''.join(parts).strip())
+
+
+def format_due_date(task):
+    """
+    格式化任务截止时间
+    """
+    return task.due_date.strftime('%Y-%m-%d %H:%M') if task.due_date else '无'
+
+
+def summary_prompt(total_tasks, completed_count):
+    """
+    日总结提示词
+    """
+    return (
+        "请根据今天的任务完成情况写一句简短的日总结，语气积极。\n"
+        f"任务总数：{total_tasks}\n"
+        f"已完成：{completed_count}"
+    )
+
+
+def work_evaluation_prompt(total_tasks, completed_count, high_total, high_completed):
+    """
+    工作评估提示词
+    """
+    return (
+        "请根据今天的任务完成情况给出一句工作效率评估和一条改进建议。\n"
+        f"任务总数：{total_tasks}\n"
+        f"已完成：{completed_count}\n"
+        f"高优先级任务：{high_total}，已完成：{high_completed}"
+    )
+
+
+def content_prompt(event):
+    """
+    事件分享文案提示词
+    """
+    return (
+        "请为下面这条生活记录写一段适合分享到社交平台的简短文案。\n"
+        f"标题：{event.title}\n"
+        f"内容：{event.content}\n"
+        f"心情：{event.get_mood_display()}"
+    )
+
+
+def task_advice_prompt(task):
+    """
+    任务建议提示词
+
+    只包含优先级、意愿度和截止时间，相同组合的任务得到相同的提示词。
+    """
+    return (
+        "请为下面的任务给出一两句执行建议。\n"
+        f"优先级：{task.get_priority_display()}\n"
+        f"意愿度：{task.get_willingness_display()}\n"
+        f"截止时间：{format_due_date(task)}"
+    )
+
+
+def generate_summary_with_llm(counts):
+    """
+    使用LLM生成日总结
+
+    Args:
+        counts (dict): 当天的任务计数，见 stats.get_daily_task_counts()
+    """
+    total_tasks = counts['total']
+    completed_count = counts['completed']
+
+    if total_tasks == 0:
+        return "今天没有安排任务，可以适当放松一下。"
+
+    def template():
+        completion_rate = completed_count / total_tasks * 100
+        templates = [
+            f"今天完成了{completed_count}个任务，完成率{completion_rate:.1f}%。继续保持良好的工作状态！",
+            f"今日任务完成情况：{completed_count}/{total_tasks}，完成率{completion_rate:.1f}%。做得很好！",
+            f"今天完成了{completed_count}项任务，完成率{completion_rate:.1f}%。继续努力！"
+        ]
+        return random.choice(templates)
+
+    return complete('summary', summary_prompt(total_tasks, completed_count), template)
+
+
+def generate_work_evaluation_with_llm(counts):
+    """
+    使用LLM生成工作评估
+
+    Args:
+        counts (dict): 当天的任务计数，见 stats.get_daily_task_counts()
+    """
+    total_tasks = counts['total']
+    completed_count = counts['completed']
+
+    if total_tasks == 0:
+        return "今日无任务安排。"
+
+    high_total = counts['high_total']
+    high_completed = counts['high_completed']
+
+    def template():
+        completion_rate = completed_count / total_tasks * 100
+        if completion_rate >= 80:
+            evaluation = "工作效率很高，任务完成度优秀。"
+        elif completion_rate >= 60:
+            evaluation = "工作效率良好，任务完成度较好。"
+        elif completion_rate >= 40:
+            evaluation = "工作效率一般，还有提升空间。"
+        else:
+            evaluation = "工作效率较低，需要加强时间管理。"
+
+        # 添加具体建议
+        if high_completed < high_total:
+            evaluation += "建议优先处理高优先级任务。"
+        return evaluation
+
+    return complete(
+        'evaluation',
+        work_evaluation_prompt(total_tasks, completed_count, high_total, high_completed),
+        template,
+    )
+
+
+def content_template(event):
+    """
+    事件分享文案模板
+    """
+    templates = [
+        f"今天发生了件有趣的事：{event.title}。{event.content} {event.get_mood_display()}",
+        f"分享一个生活片段：{event.title}。{event.content} 感觉{event.get_mood_display()}",
+        f"今日心情记录：{event.title}。{event.content} {event.get_mood_display()}",
+    ]
+    return random.choice(templates)
+
+
+def generate_content_with_llm(event):
+    """
+    使用LLM为事件生成分享文案
+    """
+    return complete('event', content_prompt(event), lambda: content_template(event))
+
+
+def stream_content_with_llm(event):
+    """
+    使用LLM为事件流式生成分享文案
+
+    Yields:
+        str: 生成的文本片段
+    """
+    return stream_complete('event', content_prompt(event), lambda: content_template(event))
+
+
+def task_advice_template(task):
+    """
+    任务建议模板
+    """
+    # 根据任务优先级和意愿度生成建议
+    if task.priority == 'high' and task.willingness in ['😭', '😕']:
+        advice = "这是一个高优先级但你不太愿意做的任务。建议将其分解成小步骤，逐步完成。"
+    elif task.priority == 'high' and task.willingness in ['🙂', '😄']:
+        advice = "这是一个高优先级且你愿意做的任务。建议安排专门的时间块来高效完成。"
+    elif task.priority == 'low' and task.willingness in ['😭', '😕']:
+        advice = "这是一个低优先级且你不太愿意做的任务。可以考虑委托给他人或延后处理。"
+    else:
+        advice = "这是一个常规任务。建议合理安排时间，平衡工作与休息。"
+
+    # 添加时间管理建议
+    if task.due_date:
+        advice += f" 任务截止时间是{format_due_date(task)}，请合理安排时间。"
+    return advice
+
+
+def generate_task_advice_with_llm(task):
+    """
+    使用LLM为任务生成建议
+    """
+    return complete('task', task_advice_prompt(task), lambda: task_advice_template(task))
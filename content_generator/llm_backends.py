@@ -0,0 +1,436 @@
+"""
+LLM后端
+
+生成函数通过 get_backend() 获取后端实例，后端由 settings.LLM_BACKEND 配置：
+
+    LLM_BACKEND = {
+        'BACKEND': 'content_generator.llm_backends.HTTPBackend',
+        'OPTIONS': {'url': 'http://127.0.0.1:8001/v1/chat/completions', 'timeout': 30},
+    }
+
+未配置时返回None，生成函数使用内置模板。
+HTTPBackend 对接 OpenAI 兼容的 chat completions 接口，复用长连接、
+支持单次调用超时以及带指数退避的重试；配置 batch_path（如 /v1/completions）后，
+complete_batch() 把多个提示词合并为一次请求。本地测试可使用 llm_stub 提供的模拟服务。
+"""
+import http.client
+import json
+import queue
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+
+class LLMError(Exception):
+    """
+    LLM调用失败
+    """
+
+
+class BaseLLMBackend:
+    """
+    LLM后端基类，子类实现 complete()
+    """
+
+    def complete(self, prompt, timeout=None):
+        """
+        根据提示词生成文本
+
+        Args:
+            prompt (str): 提示词
+            timeout (float, optional): 本次调用的超时时间（秒），默认使用后端配置
+
+        Returns:
+            str: 生成的文本
+
+        Raises:
+            LLMError: 调用失败
+        """
+        raise NotImplementedError
+
+    def stream(self, prompt, timeout=None):
+        """
+        流式生成文本，逐段返回；默认实现一次性返回 complete() 的结果
+
+        Yields:
+            str: 生成的文本片段
+
+        Raises:
+            LLMError: 调用失败
+        """
+        yield self.complete(prompt, timeout)
+
+    def complete_batch(self, prompts, timeout=None, progress=None):
+        """
+        一次生成多个提示词的文本；默认实现逐个调用 complete()
+
+        Args:
+            prompts (list): 提示词列表
+            progress (callable, optional): 每完成一次后端请求后调用，
+                执行者借此续约，逐个调用时整批耗时可能远超一次调用
+
+        Returns:
+            list: 与 prompts 一一对应，元素为生成的文本，单条失败时为 LLMError 实例
+
+        Raises:
+            LLMError: 整批调用失败
+        """
+        results = []
+        for prompt in prompts:
+            try:
+                results.append(self.complete(prompt, timeout))
+            except LLMError as e:
+                results.append(e)
+            if progress is not None:
+                progress()
+        return results
+
+    def max_call_seconds(self):
+        """
+        单次 complete() 最长可能耗时（秒，含重试），无法估计时返回None
+        """
+        return None
+
+    def last_usage(self):
+        """
+        当前线程最近一次 complete() 的token用量，后端不提供时返回None
+
+        Returns:
+            dict: 包含 prompt_tokens 和 completion_tokens
+        """
+        return None
+
+    def cache_namespace(self):
+        """
+        响应缓存的命名空间，不同后端或模型的结果互不复用
+        """
+        return f'{type(self).__module__}.{type(self).__qualname__}'
+
+    def close(self):
+        """
+        释放后端持有的资源
+        """
+
+
+class ConnectionPool:
+    """
+    线程安全的HTTP长连接池
+
+    空闲连接后进先出复用，最多保留 maxsize 个；
+    借出的连接出错或服务端要求关闭时直接丢弃，不放回池中。
+    """
+
+    def __init__(self, scheme, host, port, maxsize=10, timeout=30):
+        self.connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize)
+
+    def acquire(self, timeout=None):
+        """
+        借出一个连接，并把超时设置为本次调用的超时
+        """
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self.connection_class(self.host, self.port, timeout=timeout)
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn
+
+    def release(self, conn, reusable=True):
+        """
+        归还连接；不可复用或池已满时关闭连接
+        """
+        if reusable:
+            try:
+                self._idle.put_nowait(conn)
+                return
+            except queue.Full:
+                pass
+        conn.close()
+
+    def close(self):
+        """
+        关闭所有空闲连接
+        """
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class HTTPBackend(BaseLLMBackend):
+    """
+    OpenAI 兼容 chat completions 接口的HTTP后端
+    """
+
+    # 这些状态码视为暂时性错误，会重试
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, url, api_key='', model='default', timeout=30, max_retries=2,
+                 backoff=0.5, pool_size=10, temperature=0.7, max_tokens=512,
+                 batch_path=None, max_batch_size=16):
+        parts = urlsplit(url)
+        self.path = parts.path or '/'
+        if parts.query:
+            self.path += f'?{parts.query}'
+        # 同一服务上接受提示词列表的 completions 接口，未配置时批量调用退化为逐个调用
+        self.batch_path = batch_path
+        self.max_batch_size = max_batch_size
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.pool = ConnectionPool(parts.scheme, parts.hostname, parts.port, pool_size, timeout)
+        # 每个线程最近一次调用的 usage
+        self._local = threading.local()
+
+    def headers(self):
+        """
+        请求头
+        """
+        headers = {'Content-Type': 'application/json', 'Connection': 'keep-alive'}
+        if self.api_key:
+            headers['Authorization'] = f'Bearer {self.api_key}'
+        return headers
+
+    def payload(self, prompt, **extra):
+        """
+        请求体
+        """
+        return {
+            'model': self.model,
+            'messages': [{'role': 'user', 'content': prompt}],
+            'temperature': self.temperature,
+            'max_tokens': self.max_tokens,
+            **extra,
+        }
+
+    def send(self, body, timeout=None, path=None):
+        """
+        发送一次请求，拿到成功的响应头后返回，暂时性错误按指数退避重试
+
+        Returns:
+            tuple: (conn, response)，调用方读完响应后通过 release() 归还连接
+
+        Raises:
+            LLMError: 重试用尽或遇到不可重试的错误
+        """
+        data = json.dumps(body).encode('utf-8')
+        last_error = None
+        attempt = 0
+        while attempt <= self.max_retries:
+            if attempt and last_error is not None:
+                # 指数退避并加入随机抖动，避免多个执行者同时重试
+                time.sleep(self.backoff * 2 ** (attempt - 1) * (1 + random.random()))
+
+            conn = self.pool.acquire(timeout)
+            reused = conn.sock is not None
+            try:
+                conn.request('POST', path or self.path, body=data, headers=self.headers())
+                response = conn.getresponse()
+                if response.status >= 400:
+                    content = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                self.pool.release(conn, reusable=False)
+                if reused:
+                    # 空闲连接已被服务端关闭，换新连接重发，不计入重试次数
+                    continue
+                last_error = LLMError(f'LLM请求失败: {e}')
+                attempt += 1
+                continue
+            except (OSError, http.client.HTTPException) as e:
+                self.pool.release(conn, reusable=False)
+                last_error = LLMError(f'LLM请求失败: {e}')
+                attempt += 1
+                continue
+
+            if response.status < 400:
+                return conn, response
+            self.release(conn, response)
+            if response.status in self.RETRY_STATUSES:
+                last_error = LLMError(f'LLM服务暂时不可用: HTTP {response.status}')
+                attempt += 1
+                continue
+            raise LLMError(f'LLM请求被拒绝: HTTP {response.status} {content[:200]!r}')
+
+        raise last_error
+
+    def release(self, conn, response, finished=True):
+        """
+        归还连接；响应未读完或服务端要求关闭时丢弃连接
+        """
+        self.pool.release(conn, reusable=finished and not response.will_close)
+
+    def request(self, body, timeout=None, path=None):
+        """
+        发送一次请求并返回解析后的JSON
+
+        Raises:
+            LLMError: 请求失败或响应不是合法的JSON
+        """
+        conn, response = self.send(body, timeout, path)
+        try:
+            content = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            self.release(conn, response, finished=False)
+            raise LLMError(f'LLM请求失败: {e}')
+        self.release(conn, response)
+        try:
+            return json.loads(content)
+        except ValueError as e:
+            raise LLMError(f'LLM响应不是合法的JSON: {e}')
+
+    def complete(self, prompt, timeout=None):
+        self._local.usage = None
+        result = self.request(self.payload(prompt), timeout)
+        content = self.content_of(result)
+        usage = result.get('usage')
+        self._local.usage = usage if isinstance(usage, dict) else None
+        return content
+
+    def last_usage(self):
+        return getattr(self._local, 'usage', None)
+
+    def content_of(self, result):
+        """
+        从非流式响应中取出生成的文本
+        """
+        try:
+            return result['choices'][0]['message']['content'].strip()
+        except (KeyError, IndexError, TypeError, AttributeError):
+            raise LLMError('LLM响应缺少 choices[0].message.content')
+
+    def complete_batch(self, prompts, timeout=None, progress=None):
+        """
+        按 max_batch_size 分批，每批通过 batch_path 一次请求生成
+        """
+        if not self.batch_path:
+            return super().complete_batch(prompts, timeout, progress)
+
+        results = []
+        for start in range(0, len(prompts), self.max_batch_size):
+            chunk = prompts[start:start + self.max_batch_size]
+            result = self.request({
+                'model': self.model,
+                'prompt': chunk,
+                'temperature': self.temperature,
+                'max_tokens': self.max_tokens,
+            }, timeout, self.batch_path)
+            texts = [LLMError('LLM批量响应缺少该条结果')] * len(chunk)
+            try:
+                for choice in result['choices']:
+                    index = choice['index']
+                    if 0 <= index < len(chunk):
+                        texts[index] = choice['text'].strip()
+            except (KeyError, TypeError, AttributeError):
+                raise LLMError('LLM批量响应缺少 choices[].index/text')
+            results.extend(texts)
+            if progress is not None:
+                progress()
+        return results
+
+    def max_call_seconds(self):
+        # 每次尝试都可能等满超时，重试前的退避最多为基数的两倍
+        backoff = sum(self.backoff * 2 ** attempt * 2 for attempt in range(self.max_retries))
+        return self.timeout * (self.max_retries + 1) + backoff
+
+    def stream(self, prompt, timeout=None):
+        """
+        以 stream=true 请求接口，逐个解析SSE中的 delta 文本
+
+        超时作用于每次读取，而不是整个生成过程。
+        """
+        conn, response = self.send(self.payload(prompt, stream=True), timeout)
+        finished = False
+        try:
+            if not response.getheader('Content-Type', '').startswith('text/event-stream'):
+                # 服务端忽略了 stream 参数，按普通响应处理
+                try:
+                    result = json.loads(response.read())
+                except ValueError as e:
+                    raise LLMError(f'LLM响应不是合法的JSON: {e}')
+                finished = True
+                yield self.content_of(result)
+                return
+
+            while True:
+                line = response.readline()
+                if not line:
+                    finished = True
+                    break
+                line = line.decode('utf-8').strip()
+                if not line.startswith('data:'):
+                    continue
+                data = line[5:].strip()
+                if data == '[DONE]':
+                    response.read()
+                    finished = True
+                    break
+                try:
+                    delta = json.loads(data)['choices'][0].get('delta') or {}
+                except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+                    raise LLMError(f'LLM流式响应格式错误: {data[:200]!r}')
+                if delta.get('content'):
+                    yield delta['content']
+        except (OSError, http.client.HTTPException) as e:
+            raise LLMError(f'LLM流式响应中断: {e}')
+        finally:
+            # 调用方提前停止读取时连接上还有未读数据，不能复用
+            self.release(conn, response, finished)
+
+    def cache_namespace(self):
+        return f'{super().cache_namespace()}:{self.pool.host}:{self.pool.port}{self.path}:{self.model}'
+
+    def close(self):
+        self.pool.close()
+
+
+# 进程内共享的后端实例，连接池随之复用
+_backend = None
+_backend_loaded = False
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    按 settings.LLM_BACKEND 创建并缓存后端实例，未配置时返回None
+    """
+    global _backend, _backend_loaded
+    if not _backend_loaded:
+        with _backend_lock:
+            if not _backend_loaded:
+                config = getattr(settings, 'LLM_BACKEND', None)
+                if config:
+                    backend_class = import_string(config['BACKEND'])
+                    _backend = backend_class(**config.get('OPTIONS', {}))
+                _backend_loaded = True
+    return _backend
+
+
+@receiver(setting_changed)
+def reset_backend(setting, **kwargs):
+    """
+    LLM_BACKEND 变化时（如测试中覆盖配置）丢弃缓存的后端
+    """
+    global _backend, _backend_loaded
+    if setting == 'LLM_BACKEND':
+        with _backend_lock:
+            if _backend is not None:
+                _backend.close()
+            _backend = None
+            _backend_loaded = False
@@ -0,0 +1,165 @@
+"""
+LLM响应缓存
+
+以规范化后的提示词指纹为键缓存后端的生成结果，大小有上限（LRU淘汰），
+每条记录有有效期（TTL），并统计命中、未命中和淘汰次数。
+缓存位于进程内存中，生成主要发生在 run_llm_worker 进程里，因此在那里命中率最高。
+
+配置（均可省略）：
+
+    LLM_CACHE = {'MAX_SIZE': 1024, 'TTL': 3600}
+
+MAX_SIZE 为0时关闭缓存。
+"""
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+DEFAULT_MAX_SIZE = 1024
+DEFAULT_TTL = 3600
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_prompt(prompt):
+    """
+    规范化提示词：统一Unicode形式、合并空白、去掉首尾空白
+    """
+    prompt = unicodedata.normalize('NFKC', prompt)
+    return _WHITESPACE_RE.sub(' ', prompt).strip()
+
+
+def prompt_fingerprint(prompt, namespace=''):
+    """
+    计算提示词指纹
+
+    Args:
+        prompt (str): 提示词
+        namespace (str): 区分不同后端/模型的命名空间
+
+    Returns:
+        str: SHA-256 十六进制摘要
+    """
+    digest = hashlib.sha256()
+    digest.update(namespace.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(normalize_prompt(prompt).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """
+    线程安全的 LRU + TTL 缓存
+
+    Args:
+        max_size (int): 最多保留的条目数，超出时淘汰最久未使用的条目
+        ttl (float): 条目有效期（秒）
+        clock: 返回当前时间（秒）的函数，测试时可替换
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, ttl=DEFAULT_TTL, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """
+        读取缓存，未命中或已过期时返回None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= self.clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """
+        写入缓存，必要时淘汰最久未使用的条目
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, self.clock() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """
+        清空缓存和计数
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def stats(self):
+        """
+        返回缓存统计
+
+        Returns:
+            dict: size、hits、misses、evictions、expirations 和 hit_rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """
+    按 settings.LLM_CACHE 创建并返回进程内共享的响应缓存
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                config = getattr(settings, 'LLM_CACHE', None) or {}
+                _cache = ResponseCache(
+                    max_size=config.get('MAX_SIZE', DEFAULT_MAX_SIZE),
+                    ttl=config.get('TTL', DEFAULT_TTL),
+                )
+    return _cache
+
+
+@receiver(setting_changed)
+def reset_response_cache(setting, **kwargs):
+    """
+    LLM_CACHE 或 LLM_BACKEND 变化时丢弃缓存
+    """
+    global _cache
+    if setting in ('LLM_CACHE', 'LLM_BACKEND'):
+        with _cache_lock:
+            _cache = None
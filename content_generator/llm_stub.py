@@ -0,0 +1,223 @@
+"""
+本地LLM模拟服务
+
+实现 OpenAI 兼容的 POST /v1/chat/completions 接口（含 stream=true 的SSE流式响应）
+和接受提示词列表的 POST /v1/completions 批量接口，按配置模拟首包延迟、
+逐token延迟和随机错误，用于离线测试和压测 HTTPBackend 的吞吐量。
+批量请求整体只计一次延迟（按最长的回复计算逐token延迟），与GPU批量推理的特点一致。
+服务使用 HTTP/1.1 并保持长连接，与真实服务的连接复用行为一致。
+"""
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COMPLETIONS_PATH = '/v1/chat/completions'
+BATCH_PATH = '/v1/completions'
+
+
+class StubConfig:
+    """
+    模拟服务的行为配置
+
+    Args:
+        latency (float): 每个请求的固定延迟（秒）
+        jitter (float): 在固定延迟上叠加的随机延迟上限（秒）
+        token_latency (float): 每个输出token的额外延迟（秒）
+        error_rate (float): 返回 503 的概率，用于验证重试
+    """
+
+    def __init__(self, latency=0.2, jitter=0.0, token_latency=0.0, error_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.token_latency = token_latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def count_request(self):
+        """
+        记录请求数并返回当前序号
+        """
+        with self._lock:
+            self.requests += 1
+            return self.requests
+
+
+def stub_reply(prompt):
+    """
+    根据提示词生成确定性的模拟回复
+    """
+    first_line = prompt.strip().splitlines()[0] if prompt.strip() else ''
+    return f"[模拟回复] {first_line[:60]}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    模拟服务的请求处理器
+    """
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'VanityLLMStub/1.0'
+
+    def log_message(self, format, *args):
+        # 压测时逐条打印请求日志会影响吞吐量
+        pass
+
+    def send_json(self, status, payload):
+        """
+        返回JSON响应
+        """
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def write_chunk(self, data):
+        """
+        以 chunked 编码写出一块数据并立即发送
+        """
+        self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+    def send_stream(self, text, model):
+        """
+        以SSE逐字返回回复，每个字之间按 token_latency 延迟
+        """
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        config = self.server.config
+        for index, token in enumerate(text):
+            if index and config.token_latency:
+                time.sleep(config.token_latency)
+            chunk = {
+                'id': f'stub-{config.requests}',
+                'object': 'chat.completion.chunk',
+                'model': model,
+                'choices': [{'index': 0, 'delta': {'content': token}, 'finish_reason': None}],
+            }
+            self.write_chunk(f'data: {json.dumps(chunk, ensure_ascii=False)}\n\n'.encode('utf-8'))
+        self.write_chunk(b'data: [DONE]\n\n')
+        self.write_chunk(b'')
+
+    def send_batch(self, body):
+        """
+        批量接口：prompt 为字符串或字符串列表，按 index 返回每个提示词的回复
+        """
+        prompts = body.get('prompt')
+        if isinstance(prompts, str):
+            prompts = [prompts]
+        if not isinstance(prompts, list) or not all(isinstance(prompt, str) for prompt in prompts):
+            self.send_json(400, {'error': {'message': 'invalid request'}})
+            return
+
+        config = self.server.config
+        texts = [stub_reply(prompt) for prompt in prompts]
+        longest = max((len(text) for text in texts), default=0)
+        time.sleep(config.latency + random.uniform(0, config.jitter) + config.token_latency * longest)
+        self.send_json(200, {
+            'id': f'stub-{config.requests}',
+            'object': 'text_completion',
+            'model': body.get('model', 'stub'),
+            'choices': [
+                {'index': index, 'text': text, 'finish_reason': 'stop'}
+                for index, text in enumerate(texts)
+            ],
+        })
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length)
+        path = self.path.split('?')[0]
+        if path not in (COMPLETIONS_PATH, BATCH_PATH):
+            self.send_json(404, {'error': {'message': 'not found'}})
+            return
+
+        config = self.server.config
+        config.count_request()
+        try:
+            body = json.loads(raw or b'{}')
+            if path == BATCH_PATH:
+                prompt = None
+            else:
+                prompt = body['messages'][-1]['content']
+        except (ValueError, KeyError, IndexError, TypeError):
+            self.send_json(400, {'error': {'message': 'invalid request'}})
+            return
+
+        if config.error_rate and random.random() < config.error_rate:
+            self.send_json(503, {'error': {'message': 'simulated overload'}})
+            return
+
+        if path == BATCH_PATH:
+            self.send_batch(body)
+            return
+
+        text = stub_reply(prompt)
+        if body.get('stream'):
+            time.sleep(config.latency + random.uniform(0, config.jitter))
+            self.send_stream(text, body.get('model', 'stub'))
+            return
+
+        time.sleep(config.latency + random.uniform(0, config.jitter) + config.token_latency * len(text))
+        self.send_json(200, {
+            'id': f'stub-{config.requests}',
+            'object': 'chat.completion',
+            'model': body.get('model', 'stub'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': text},
+                'finish_reason': 'stop',
+            }],
+            'usage': {
+                'prompt_tokens': len(prompt),
+                'completion_tokens': len(text),
+                'total_tokens': len(prompt) + len(text),
+            },
+        })
+
+
+class StubServer(ThreadingHTTPServer):
+    """
+    模拟服务，客户端超时断开属于预期行为，不打印异常
+    """
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+def make_stub_server(host='127.0.0.1', port=0, **options):
+    """
+    创建模拟服务（不启动），port为0时由系统分配端口
+
+    Returns:
+        StubServer: 通过 server.config 调整行为，server.server_address 获取端口
+    """
+    server = StubServer((host, port), StubHandler)
+    server.config = StubConfig(**options)
+    return server
+
+
+def start_stub_server(**options):
+    """
+    在后台线程中启动模拟服务，供测试和压测使用
+
+    Returns:
+        tuple: (server, completions_url)，用完后调用 server.shutdown()
+    """
+    server = make_stub_server(**options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    return server, f'http://{host}:{port}{COMPLETIONS_PATH}'
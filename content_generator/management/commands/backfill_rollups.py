@@ -0,0 +1,64 @@
+"""
+回填每日汇总命令
+
+按原始任务和事件重建 DailyRollup。创建汇总表的迁移（0010）已回填已有数据，
+之后汇总由保存/删除信号增量维护，只有绕过信号的批量修改
+（QuerySet.update()、bulk_create() 等）之后才需要运行，可用 --since/--until 限定范围。
+"""
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from content_generator.stats import rebuild_daily_rollups
+
+
+def parse_date(value):
+    """
+    解析 YYYY-MM-DD 格式的日期参数
+    """
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'日期格式错误: {value}，应为 YYYY-MM-DD')
+
+
+class Command(BaseCommand):
+    help = '按原始任务和事件重建每日汇总'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', dest='usernames', action='append', help='只处理指定用户（可重复使用）')
+        parser.add_argument('--since', help='起始日期（YYYY-MM-DD，含），默认不限')
+        parser.add_argument('--until', help='结束日期（YYYY-MM-DD，含），默认不限')
+        parser.add_argument('--chunk-size', type=int, default=100, help='每批处理的用户数')
+
+    def handle(self, *args, **options):
+        since = parse_date(options['since'])
+        until = parse_date(options['until'])
+        if since and until and since > until:
+            raise CommandError('--since 不能晚于 --until')
+        chunk_size = max(options['chunk_size'], 1)
+
+        users = User.objects.order_by('pk')
+        usernames = options.get('usernames')
+        if usernames:
+            users = users.filter(username__in=usernames)
+            missing = set(usernames) - set(users.values_list('username', flat=True))
+            if missing:
+                raise CommandError(f"用户不存在: {', '.join(sorted(missing))}")
+
+        # 每批在一个事务中删除并重写，中断后重新运行即可
+        processed = rows = 0
+        last_id = 0
+        while True:
+            user_ids = list(users.filter(pk__gt=last_id).values_list('pk', flat=True)[:chunk_size])
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+            rows += rebuild_daily_rollups(user_ids, since, until)
+            processed += len(user_ids)
+            self.stdout.write(f'已处理到用户 {last_id}，共 {processed} 个用户，{rows} 行汇总')
+
+        self.stdout.write(self.style.SUCCESS(f'回填完成：{processed} 个用户，{rows} 行汇总'))
@@ -0,0 +1,46 @@
+"""
+压缩相似回忆向量文件命令
+
+事件修改和删除只在向量文件中标记旧记录，此命令定期去掉这些记录；
+--rebuild 从数据库重新嵌入全部事件（更换嵌入器后或文件损坏时使用）。
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from content_generator.similar import get_vector_store
+
+
+class Command(BaseCommand):
+    help = '压缩或重建事件的相似回忆向量文件'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            dest='usernames',
+            action='append',
+            help='只处理指定用户（可重复使用）',
+        )
+        parser.add_argument('--rebuild', action='store_true', help='从数据库重新嵌入全部事件')
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        usernames = options.get('usernames')
+        if usernames:
+            users = users.filter(username__in=usernames)
+            missing = set(usernames) - set(users.values_list('username', flat=True))
+            if missing:
+                raise CommandError(f"用户不存在: {', '.join(sorted(missing))}")
+
+        store = get_vector_store()
+        count = rows = 0
+        for user_id in users.values_list('pk', flat=True).iterator():
+            if options['rebuild']:
+                rows += store.build(user_id)
+            else:
+                rows += store.compact(user_id)
+            count += 1
+
+        if options['rebuild']:
+            self.stdout.write(self.style.SUCCESS(f'已重建 {count} 个用户的向量，共 {rows} 条'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'已压缩 {count} 个用户的向量，去掉 {rows} 条已删除记录'))
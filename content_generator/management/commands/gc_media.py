@@ -0,0 +1,33 @@
+"""
+事件图片垃圾回收命令
+
+删除不再被任何事件引用、且超过宽限期的图片文件及其缩略图，适合定时执行。
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from content_generator.blobs import collect_garbage, recount_references
+
+
+class Command(BaseCommand):
+    help = '删除不再被引用的事件图片文件'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=24, help='引用数为0后保留的小时数（默认24）')
+        parser.add_argument('--recount', action='store_true', help='先从事件表重新计算引用数')
+        parser.add_argument('--sweep', action='store_true', help='扫描存储目录，删除没有任何引用的文件')
+        parser.add_argument('--dry-run', action='store_true', help='只统计，不删除')
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            fixed = recount_references()
+            self.stdout.write(f'已修正 {fixed} 个文件的引用数')
+
+        files, freed = collect_garbage(
+            grace=timedelta(hours=options['grace_hours']),
+            sweep=options['sweep'],
+            dry_run=options['dry_run'],
+        )
+        action = '可删除' if options['dry_run'] else '已删除'
+        self.stdout.write(self.style.SUCCESS(f'{action} {files} 个文件，共 {freed / (1024 * 1024):.1f}MB'))
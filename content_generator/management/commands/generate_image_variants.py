@@ -0,0 +1,30 @@
+"""
+生成事件图片缩略图命令
+
+为还没有缩略图的事件图片（上线前上传的、或线程池队列满时被跳过的）同步生成缩略图。
+引用同一文件的事件共用一套缩略图，--force 时每个文件也只重新生成一次。
+"""
+from django.core.management.base import BaseCommand
+
+from content_generator.images import generate_event_variants, needs_variants
+from content_generator.models import Event
+
+
+class Command(BaseCommand):
+    help = '为缺少缩略图的事件图片生成缩略图'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='重新生成所有图片的缩略图')
+
+    def handle(self, *args, **options):
+        events = Event.objects.exclude(image='').exclude(image__isnull=True).only('pk', 'image', 'image_variants')
+        count = 0
+        done = set()
+        for event in events.iterator():
+            if event.image.name in done:
+                continue
+            if options['force'] or needs_variants(event):
+                generate_event_variants(event.pk, event.image.name, reuse=not options['force'])
+                done.add(event.image.name)
+                count += 1
+        self.stdout.write(self.style.SUCCESS(f'已为 {count} 张图片生成缩略图'))
@@ -0,0 +1,134 @@
+"""
+批量生成日总结命令
+
+为当天有活动（创建了任务或事件）的用户生成指定日期的日总结（适合每晚定时运行），
+没有活动的用户不生成“没有任务”的空总结；--all-users 为所有启用的账户生成：
+
+- 用户按ID分批处理，每批的任务计数通过一次分组聚合得到；
+- 生成在有上限的线程池中并发进行，保存在主线程中逐个完成；
+- 每个用户的日总结生成后立即保存，已有日总结的用户默认跳过，
+  因此命令中断后重新运行会从未完成的用户继续。
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from content_generator.llm import generate_summary_with_llm, generate_work_evaluation_with_llm
+from content_generator.llm_backends import LLMError
+from content_generator.models import DailySummary, Event, Task
+from content_generator.stats import get_daily_task_counts
+
+
+def generate_texts(counts):
+    """
+    生成日总结和工作评估
+    """
+    return generate_summary_with_llm(counts), generate_work_evaluation_with_llm(counts)
+
+
+def generate_texts_in_thread(counts):
+    """
+    在线程池中生成，结束后关闭本线程的数据库连接（调用记录会写库）
+    """
+    try:
+        return generate_texts(counts)
+    finally:
+        connections.close_all()
+
+
+def active_user_ids(day):
+    """
+    当天创建了任务或事件的用户ID（一次查询）
+    """
+    tasks = Task.objects.filter(created_date=day).order_by().values('user_id')
+    events = Event.objects.filter(created_date=day).order_by().values('user_id')
+    return sorted(set(tasks.union(events).values_list('user_id', flat=True)))
+
+
+class Command(BaseCommand):
+    help = '为当天有活动的用户批量生成指定日期的日总结'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='日期（YYYY-MM-DD），默认今天')
+        parser.add_argument('--workers', type=int, default=4, help='并发生成的线程数，1为不使用线程池')
+        parser.add_argument('--chunk-size', type=int, default=200, help='每批处理的用户数')
+        parser.add_argument('--force', action='store_true', help='重新生成已有的日总结（中断后重新运行会从头开始）')
+        parser.add_argument('--all-users', action='store_true', help='为所有启用的账户生成，包括当天没有任务和事件的用户')
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                day = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f"日期格式错误: {options['date']}，应为 YYYY-MM-DD")
+        else:
+            day = timezone.localdate()
+        workers = max(options['workers'], 1)
+        chunk_size = max(options['chunk_size'], 1)
+
+        users = User.objects.filter(is_active=True).order_by('pk')
+        if not options['force']:
+            users = users.exclude(dailysummary__date=day)
+        candidates = None if options['all_users'] else active_user_ids(day)
+
+        generated = failed = 0
+        executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            for last_id, user_ids in self.user_chunks(users, candidates, chunk_size):
+                counts = get_daily_task_counts(user_ids, day)
+
+                if executor is None:
+                    results = ((user_id, lambda user_id=user_id: generate_texts(counts[user_id])) for user_id in user_ids)
+                else:
+                    futures = {executor.submit(generate_texts_in_thread, counts[user_id]): user_id for user_id in user_ids}
+                    results = ((futures[future], future.result) for future in as_completed(futures))
+
+                for user_id, result in results:
+                    try:
+                        summary, work_evaluation = result()
+                    except LLMError as e:
+                        failed += 1
+                        self.stderr.write(f'用户 {user_id} 的日总结生成失败: {e}')
+                        continue
+                    DailySummary.objects.update_or_create(
+                        user_id=user_id,
+                        date=day,
+                        defaults={'summary': summary, 'work_evaluation': work_evaluation},
+                    )
+                    generated += 1
+                self.stdout.write(f'已处理到用户 {last_id}，生成 {generated} 条，失败 {failed} 条')
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('已中断，重新运行命令会跳过已生成的用户'))
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+        style = self.style.SUCCESS if not failed else self.style.WARNING
+        self.stdout.write(style(f'{day} 的日总结：生成 {generated} 条，失败 {failed} 条'))
+
+    def user_chunks(self, users, candidates, chunk_size):
+        """
+        分批返回待生成的用户ID
+
+        candidates 为 None 时按ID从 users 中逐批读取，否则只在 candidates 中筛选。
+
+        Yields:
+            tuple: (本批最后一个候选用户ID, 本批用户ID列表)
+        """
+        if candidates is None:
+            last_id = 0
+            while True:
+                user_ids = list(users.filter(pk__gt=last_id).values_list('pk', flat=True)[:chunk_size])
+                if not user_ids:
+                    return
+                last_id = user_ids[-1]
+                yield last_id, user_ids
+        for start in range(0, len(candidates), chunk_size):
+            chunk = candidates[start:start + chunk_size]
+            user_ids = list(users.filter(pk__in=chunk).values_list('pk', flat=True))
+            if user_ids:
+                yield chunk[-1], user_ids
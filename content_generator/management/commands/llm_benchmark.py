@@ -0,0 +1,74 @@
+"""
+LLM后端吞吐量压测
+
+并发调用当前配置的后端（或 --url 指定的地址），输出吞吐量和延迟分位数，
+配合 run_llm_stub 可以离线调节连接池大小、超时和并发度；
+--batch-size 大于1时每次调用通过 complete_batch() 合并多个提示词，用于对比批量吞吐量。
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from content_generator.llm_backends import HTTPBackend, LLMError, get_backend
+from content_generator.telemetry import percentile
+
+
+class Command(BaseCommand):
+    help = '并发调用LLM后端并统计吞吐量与延迟'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='直接压测该地址，忽略 settings.LLM_BACKEND')
+        parser.add_argument('--requests', type=int, default=100, help='请求总数')
+        parser.add_argument('--concurrency', type=int, default=10, help='并发数')
+        parser.add_argument('--pool-size', type=int, default=10, help='使用 --url 时的连接池大小')
+        parser.add_argument('--timeout', type=float, default=30, help='单次调用超时（秒）')
+        parser.add_argument('--batch-size', type=int, default=1, help='每次调用合并的提示词数')
+        parser.add_argument('--batch-path', help='使用 --url 时的批量接口路径，如 /v1/completions')
+        parser.add_argument('--prompt', default='为一个高优先级任务给出简短的执行建议')
+
+    def handle(self, *args, **options):
+        if options['url']:
+            backend = HTTPBackend(
+                options['url'],
+                pool_size=options['pool_size'],
+                timeout=options['timeout'],
+                batch_path=options['batch_path'],
+                max_batch_size=max(options['batch_size'], 1),
+            )
+        else:
+            backend = get_backend()
+            if backend is None:
+                raise CommandError('未配置 LLM_BACKEND，请通过 --url 指定地址')
+
+        batch_size = max(options['batch_size'], 1)
+
+        def call(_):
+            start = time.perf_counter()
+            try:
+                if batch_size > 1:
+                    results = backend.complete_batch([options['prompt']] * batch_size, timeout=options['timeout'])
+                    ok = not any(isinstance(result, LLMError) for result in results)
+                else:
+                    backend.complete(options['prompt'], timeout=options['timeout'])
+                    ok = True
+            except LLMError:
+                ok = False
+            return ok, time.perf_counter() - start
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            results = list(executor.map(call, range(options['requests'])))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for ok, latency in results if ok)
+        errors = len(results) - len(latencies)
+        self.stdout.write(f'请求数: {len(results)}  失败: {errors}  并发: {options["concurrency"]}')
+        self.stdout.write(f'总耗时: {elapsed:.2f}s  吞吐量: {len(latencies) / elapsed:.1f} req/s')
+        if batch_size > 1:
+            self.stdout.write(f'每批 {batch_size} 条提示词: {len(latencies) * batch_size / elapsed:.1f} prompt/s')
+        for q in (50, 95, 99):
+            self.stdout.write(f'p{q}: {percentile(latencies, q) * 1000:.1f} ms')
+
+        if options['url']:
+            backend.close()
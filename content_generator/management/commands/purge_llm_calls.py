@@ -0,0 +1,22 @@
+"""
+清理LLM调用记录命令
+
+删除早于保留期（settings.LLM_CALL_RETENTION_DAYS，默认30天）的调用记录，适合定时执行。
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from content_generator.telemetry import purge_calls, retention_days
+
+
+class Command(BaseCommand):
+    help = '删除早于保留期的LLM调用记录'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='保留最近多少天的记录，默认读取 LLM_CALL_RETENTION_DAYS')
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else retention_days()
+        if days < 1:
+            raise CommandError('--days 必须大于0')
+        deleted = purge_calls(days)
+        self.stdout.write(self.style.SUCCESS(f'已删除 {deleted} 条 {days} 天前的LLM调用记录'))
@@ -0,0 +1,16 @@
+"""
+清理断点续传暂存区命令
+
+删除过期的上传会话及其分片文件，以及暂存目录中没有对应会话的文件，适合定时执行。
+"""
+from django.core.management.base import BaseCommand
+
+from content_generator.resumable import purge_expired
+
+
+class Command(BaseCommand):
+    help = '删除过期的图片上传会话和暂存文件'
+
+    def handle(self, *args, **options):
+        sessions, files = purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'已删除 {sessions} 个过期会话，{files} 个孤立文件'))
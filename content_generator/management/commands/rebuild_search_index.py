@@ -0,0 +1,40 @@
+"""
+重建全文搜索索引命令
+
+SQLite 下任务、事件和日总结由信号同步到 FTS5 虚拟表，
+QuerySet.update()、bulk_create() 等批量写入不会触发信号，之后运行此命令即可。
+PostgreSQL 下索引由数据库维护，无需重建。
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from content_generator.search import rebuild_search_index, uses_fts
+
+
+class Command(BaseCommand):
+    help = '从任务、事件和日总结重建全文搜索索引'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            dest='usernames',
+            action='append',
+            help='只重建指定用户（可重复使用）',
+        )
+
+    def handle(self, *args, **options):
+        if not uses_fts():
+            self.stdout.write('当前数据库使用数据库维护的索引，无需重建')
+            return
+
+        user_ids = None
+        usernames = options.get('usernames')
+        if usernames:
+            users = User.objects.filter(username__in=usernames)
+            missing = set(usernames) - set(users.values_list('username', flat=True))
+            if missing:
+                raise CommandError(f"用户不存在: {', '.join(sorted(missing))}")
+            user_ids = list(users.values_list('pk', flat=True))
+
+        count = rebuild_search_index(user_ids)
+        self.stdout.write(self.style.SUCCESS(f'已重建搜索索引，共 {count} 条记录'))
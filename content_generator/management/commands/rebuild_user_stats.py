@@ -0,0 +1,38 @@
+"""
+重建用户统计命令
+
+信号无法覆盖 QuerySet.update()、bulk_create() 等批量写入，
+数据被批量修改后运行此命令即可让 UserStats 与原始数据保持一致。
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from content_generator.stats import rebuild_user_stats
+
+
+class Command(BaseCommand):
+    help = '从任务、事件和日总结全量重建 UserStats'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            dest='usernames',
+            action='append',
+            help='只重建指定用户（可重复使用）',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        usernames = options.get('usernames')
+        if usernames:
+            users = users.filter(username__in=usernames)
+            missing = set(usernames) - set(users.values_list('username', flat=True))
+            if missing:
+                raise CommandError(f"用户不存在: {', '.join(sorted(missing))}")
+
+        count = 0
+        for user in users.iterator():
+            rebuild_user_stats(user)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'已重建 {count} 个用户的统计'))
@@ -0,0 +1,37 @@
+"""
+启动本地LLM模拟服务
+"""
+from django.core.management.base import BaseCommand
+
+from content_generator.llm_stub import COMPLETIONS_PATH, make_stub_server
+
+
+class Command(BaseCommand):
+    help = '启动模拟延迟的本地LLM服务（OpenAI 兼容 chat completions 接口）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8001)
+        parser.add_argument('--latency', type=float, default=0.2, help='每个请求的固定延迟（秒）')
+        parser.add_argument('--jitter', type=float, default=0.0, help='随机延迟上限（秒）')
+        parser.add_argument('--token-latency', type=float, default=0.0, help='每个输出token的延迟（秒）')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='返回503的概率')
+
+    def handle(self, *args, **options):
+        server = make_stub_server(
+            host=options['host'],
+            port=options['port'],
+            latency=options['latency'],
+            jitter=options['jitter'],
+            token_latency=options['token_latency'],
+            error_rate=options['error_rate'],
+        )
+        host, port = server.server_address[:2]
+        self.stdout.write(f'LLM模拟服务已启动: http://{host}:{port}{COMPLETIONS_PATH}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f'共处理 {server.config.requests} 个请求')
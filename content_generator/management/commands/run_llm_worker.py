@@ -0,0 +1,75 @@
+"""
+LLM生成任务执行者
+
+持续领取 LLMJob 表中的任务并执行，可以同时启动多个进程。
+每次领取的一批任务合并为一次后端调用，--batch-window 控制凑批的等待时间。
+运行期间定期写入心跳，视图据此判断是排队还是直接在请求中生成（见 jobs.submit_advice_job）。
+"""
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+
+from content_generator.jobs import (
+    DEFAULT_LEASE_SECONDS, HEARTBEAT_INTERVAL, claim_batch, heartbeat, run_jobs, worker_exited,
+)
+from content_generator.llm_backends import get_backend
+from content_generator.llm_cache import get_response_cache
+
+
+class Command(BaseCommand):
+    help = '领取并执行排队中的LLM生成任务'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5, help='每次领取并合并生成的最大任务数')
+        parser.add_argument('--batch-window', type=float, default=0.05,
+                            help='领取到任务但未凑满一批时继续等待新任务的时间（秒），0为不等待')
+        parser.add_argument('--lease-seconds', type=int, default=DEFAULT_LEASE_SECONDS, help='任务租约时长（秒）')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='没有任务时的轮询间隔（秒）')
+        parser.add_argument('--once', action='store_true', help='处理完当前可执行的任务后退出')
+
+    def handle(self, *args, **options):
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self.stdout.write(f'LLM执行者 {worker_id} 已启动')
+
+        # 租约在每次后端请求之间续约，单次请求（含重试）本身不能超过租约
+        backend = get_backend()
+        call_seconds = backend.max_call_seconds() if backend is not None else None
+        if call_seconds is not None and call_seconds >= options['lease_seconds']:
+            self.stderr.write(self.style.WARNING(
+                f"单次LLM调用最长可能耗时 {call_seconds:.0f} 秒，不短于租约 {options['lease_seconds']} 秒，"
+                f"任务可能被其他执行者重复执行，请调大 --lease-seconds"
+            ))
+
+        processed = 0
+        last_heartbeat = None
+        try:
+            while True:
+                if last_heartbeat is None or time.monotonic() - last_heartbeat >= HEARTBEAT_INTERVAL:
+                    heartbeat(worker_id)
+                    last_heartbeat = time.monotonic()
+                jobs = claim_batch(
+                    worker_id,
+                    options['batch_size'],
+                    options['lease_seconds'],
+                    window=options['batch_window'],
+                )
+                if not jobs:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+                run_jobs(jobs, worker_id, options['lease_seconds'])
+                processed += len(jobs)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            worker_exited(worker_id)
+
+        cache_stats = get_response_cache().stats()
+        self.stdout.write(
+            f"响应缓存: 命中 {cache_stats['hits']}，未命中 {cache_stats['misses']}，"
+            f"淘汰 {cache_stats['evictions']}，过期 {cache_stats['expirations']}"
+        )
+        self.stdout.write(self.style.SUCCESS(f'LLM执行者 {worker_id} 退出，共处理 {processed} 个任务'))
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('content_generator', '0003_alter_task_priority'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='用户')),
+                ('total_tasks', models.IntegerField(default=0, verbose_name='任务总数')),
+                ('completed_tasks', models.IntegerField(default=0, verbose_name='已完成任务')),
+                ('high_priority_tasks', models.IntegerField(default=0, verbose_name='高优先级任务')),
+                ('medium_priority_tasks', models.IntegerField(default=0, verbose_name='中优先级任务')),
+                ('low_priority_tasks', models.IntegerField(default=0, verbose_name='低优先级任务')),
+                ('total_events', models.IntegerField(default=0, verbose_name='事件总数')),
+                ('events_with_images', models.IntegerField(default=0, verbose_name='带图片事件')),
+                ('happy_events', models.IntegerField(default=0, verbose_name='开心事件')),
+                ('total_summaries', models.IntegerField(default=0, verbose_name='总结总数')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '用户统计',
+                'verbose_name_plural': '用户统计',
+            },
+        ),
+    ]
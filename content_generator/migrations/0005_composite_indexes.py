@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_generator', '0004_userstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='event_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['user', 'mood'], name='event_user_mood_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='llmadvice',
+            index=models.Index(fields=['user', 'advice_type', 'related_id'], name='advice_user_type_related_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='task_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'completed', 'due_date'], name='task_user_completed_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'priority'], name='task_user_priority_idx'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+BATCH_SIZE = 1000
+
+
+def backfill_created_date(apps, schema_editor):
+    """
+    按 TIME_ZONE 计算已有记录的创建日期
+    """
+    for model_name in ('Task', 'Event'):
+        model = apps.get_model('content_generator', model_name)
+        queryset = model.objects.filter(created_date__isnull=True).only('id', 'created_at').order_by('id')
+        last_id = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id)[:BATCH_SIZE])
+            if not batch:
+                break
+            for obj in batch:
+                obj.created_date = timezone.localdate(obj.created_at)
+            model.objects.bulk_update(batch, ['created_date'])
+            last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_generator', '0005_composite_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='task',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='创建时间'),
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='创建时间'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='created_date',
+            field=models.DateField(editable=False, null=True, verbose_name='创建日期'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='created_date',
+            field=models.DateField(editable=False, null=True, verbose_name='创建日期'),
+        ),
+        migrations.RunPython(backfill_created_date, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='task',
+            name='created_date',
+            field=models.DateField(editable=False, verbose_name='创建日期'),
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='created_date',
+            field=models.DateField(editable=False, verbose_name='创建日期'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'created_date'], name='task_user_created_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['user', 'created_date'], name='event_user_created_date_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:06
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_generator', '0006_created_date'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('advice_type', models.CharField(choices=[('task', '任务建议'), ('event', '事件分享'), ('summary', '总结建议')], max_length=10, verbose_name='建议类型')),
+                ('related_id', models.IntegerField(verbose_name='关联ID')),
+                ('status', models.CharField(choices=[('pending', '等待中'), ('running', '执行中'), ('done', '已完成'), ('failed', '失败')], default='pending', max_length=10, verbose_name='状态')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='尝试次数')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='可执行时间')),
+                ('locked_by', models.CharField(blank=True, default='', max_length=100, verbose_name='执行者')),
+                ('locked_until', models.DateTimeField(blank=True, null=True, verbose_name='租约到期时间')),
+                ('error', models.TextField(blank=True, default='', verbose_name='错误信息')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('advice', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='content_generator.llmadvice', verbose_name='生成结果')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='用户')),
+            ],
+            options={
+                'verbose_name': 'LLM生成任务',
+                'verbose_name_plural': 'LLM生成任务',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'available_at'], name='llmjob_status_available_idx'), models.Index(fields=['user', 'advice_type', 'related_id'], name='llmjob_user_type_related_idx')],
+            },
+        ),
+    ]
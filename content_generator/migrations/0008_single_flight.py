@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Min
+
+
+def remove_duplicates(apps, schema_editor):
+    """
+    添加唯一约束前清理重复数据：
+    每个对象只保留最新的一条建议；多余的未完成任务标记为失败，只保留最早的一个
+    """
+    LLMAdvice = apps.get_model('content_generator', 'LLMAdvice')
+    duplicates = (
+        LLMAdvice.objects.values('user_id', 'advice_type', 'related_id')
+        .annotate(count=Count('id'), keep_id=Max('id'))
+        .filter(count__gt=1)
+    )
+    for row in duplicates:
+        LLMAdvice.objects.filter(
+            user_id=row['user_id'],
+            advice_type=row['advice_type'],
+            related_id=row['related_id'],
+        ).exclude(id=row['keep_id']).delete()
+
+    LLMJob = apps.get_model('content_generator', 'LLMJob')
+    active = LLMJob.objects.filter(status__in=['pending', 'running'])
+    duplicates = (
+        active.values('user_id', 'advice_type', 'related_id')
+        .annotate(count=Count('id'), keep_id=Min('id'))
+        .filter(count__gt=1)
+    )
+    for row in duplicates:
+        active.filter(
+            user_id=row['user_id'],
+            advice_type=row['advice_type'],
+            related_id=row['related_id'],
+        ).exclude(id=row['keep_id']).update(status='failed', error='重复任务', locked_until=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_generator', '0007_llmjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='llmadvice',
+            name='advice_user_type_related_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='llmadvice',
+            constraint=models.UniqueConstraint(fields=('user', 'advice_type', 'related_id'), name='advice_user_type_related_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='llmjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('user', 'advice_type', 'related_id'), name='llmjob_active_uniq'),
+        ),
+    ]
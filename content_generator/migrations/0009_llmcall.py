@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_generator', '0008_single_flight'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMCall',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('call_type', models.CharField(choices=[('task', '任务建议'), ('event', '事件分享'), ('summary', '日总结'), ('evaluation', '工作评估')], max_length=10, verbose_name='生成类型')),
+                ('source', models.CharField(choices=[('backend', '后端'), ('cache', '缓存'), ('template', '模板')], max_length=10, verbose_name='结果来源')),
+                ('latency_ms', models.PositiveIntegerField(verbose_name='耗时(毫秒)')),
+                ('first_token_ms', models.PositiveIntegerField(blank=True, null=True, verbose_name='首字耗时(毫秒)')),
+                ('prompt_chars', models.PositiveIntegerField(default=0, verbose_name='提示词长度')),
+                ('response_chars', models.PositiveIntegerField(default=0, verbose_name='回复长度')),
+                ('prompt_tokens', models.PositiveIntegerField(blank=True, null=True, verbose_name='提示词token数')),
+                ('completion_tokens', models.PositiveIntegerField(blank=True, null=True, verbose_name='回复token数')),
+                ('batch_size', models.PositiveSmallIntegerField(default=1, verbose_name='批大小')),
+                ('error', models.CharField(blank=True, default='', max_length=200, verbose_name='错误信息')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='调用时间')),
+            ],
+            options={
+                'verbose_name': 'LLM调用记录',
+                'verbose_name_plural': 'LLM调用记录',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['call_type', 'created_at'], name='llmcall_type_created_idx'), models.Index(fields=['created_at'], name='llmcall_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,126 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:25
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.utils import timezone
+
+
+USER_BATCH_SIZE = 100
+
+# 迁移时的计数字段，与此时的 Task.PRIORITY_CHOICES、DailyRollup.WILLINGNESS_FIELDS/MOOD_FIELDS 一致
+PRIORITIES = ['high', 'medium', 'low']
+WILLINGNESS_FIELDS = {
+    '😭': 'tasks_willingness_very_low',
+    '😕': 'tasks_willingness_low',
+    '😐': 'tasks_willingness_neutral',
+    '🙂': 'tasks_willingness_high',
+    '😄': 'tasks_willingness_very_high',
+}
+MOOD_FIELDS = {
+    '😄': 'events_happy',
+    '😢': 'events_sad',
+    '😠': 'events_angry',
+    '😲': 'events_surprised',
+    '😴': 'events_sleepy',
+    '😍': 'events_excited',
+    '🤔': 'events_thinking',
+    '😎': 'events_cool',
+}
+
+
+def backfill_rollups(apps, schema_editor):
+    """
+    按已有的任务和事件生成每日汇总，任务和事件各一次按 (用户, 创建日期) 分组的聚合查询
+    """
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Task = apps.get_model('content_generator', 'Task')
+    Event = apps.get_model('content_generator', 'Event')
+    DailyRollup = apps.get_model('content_generator', 'DailyRollup')
+
+    # 注解名使用 n_ 前缀，避免与 completed 等字段同名
+    task_counts = {
+        'n_tasks_created': Count('id'),
+        'n_tasks_completed': Count('id', filter=Q(completed=True)),
+        **{f'n_tasks_{priority}': Count('id', filter=Q(priority=priority)) for priority in PRIORITIES},
+        **{f'n_{field}': Count('id', filter=Q(willingness=value)) for value, field in WILLINGNESS_FIELDS.items()},
+    }
+    event_counts = {
+        'n_events_created': Count('id'),
+        'n_events_with_images': Count('id', filter=Q(image__isnull=False) & ~Q(image='')),
+        **{f'n_{field}': Count('id', filter=Q(mood=value)) for value, field in MOOD_FIELDS.items()},
+    }
+
+    users = User.objects.order_by('pk').values_list('pk', flat=True)
+    last_id = 0
+    while True:
+        user_ids = list(users.filter(pk__gt=last_id)[:USER_BATCH_SIZE])
+        if not user_ids:
+            break
+        last_id = user_ids[-1]
+        rollups = {}
+        for model, counts in ((Task, task_counts), (Event, event_counts)):
+            rows = (
+                model.objects.filter(user_id__in=user_ids)
+                .values('user_id', 'created_date')
+                .annotate(**counts)
+                .order_by()
+            )
+            for row in rows:
+                rollup = rollups.setdefault((row['user_id'], row['created_date']), {})
+                for name in counts:
+                    rollup[name[2:]] = row[name]
+        now = timezone.now()
+        DailyRollup.objects.bulk_create([
+            DailyRollup(user_id=user_id, date=day, updated_at=now, **counts)
+            for (user_id, day), counts in rollups.items()
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_generator', '0009_llmcall'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日期')),
+                ('tasks_created', models.IntegerField(default=0, verbose_name='新建任务')),
+                ('tasks_completed', models.IntegerField(default=0, verbose_name='已完成任务')),
+                ('tasks_high', models.IntegerField(default=0, verbose_name='高优先级任务')),
+                ('tasks_medium', models.IntegerField(default=0, verbose_name='中优先级任务')),
+                ('tasks_low', models.IntegerField(default=0, verbose_name='低优先级任务')),
+                ('tasks_willingness_very_low', models.IntegerField(default=0, verbose_name='很不情愿的任务')),
+                ('tasks_willingness_low', models.IntegerField(default=0, verbose_name='不太情愿的任务')),
+                ('tasks_willingness_neutral', models.IntegerField(default=0, verbose_name='意愿一般的任务')),
+                ('tasks_willingness_high', models.IntegerField(default=0, verbose_name='比较愿意的任务')),
+                ('tasks_willingness_very_high', models.IntegerField(default=0, verbose_name='很愿意的任务')),
+                ('events_created', models.IntegerField(default=0, verbose_name='新建事件')),
+                ('events_with_images', models.IntegerField(default=0, verbose_name='带图片的事件')),
+                ('events_happy', models.IntegerField(default=0, verbose_name='开心')),
+                ('events_sad', models.IntegerField(default=0, verbose_name='悲伤')),
+                ('events_angry', models.IntegerField(default=0, verbose_name='愤怒')),
+                ('events_surprised', models.IntegerField(default=0, verbose_name='惊讶')),
+                ('events_sleepy', models.IntegerField(default=0, verbose_name='困倦')),
+                ('events_excited', models.IntegerField(default=0, verbose_name='兴奋')),
+                ('events_thinking', models.IntegerField(default=0, verbose_name='思考')),
+                ('events_cool', models.IntegerField(default=0, verbose_name='酷')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='更新时间')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to=settings.AUTH_USER_MODEL, verbose_name='用户')),
+            ],
+            options={
+                'verbose_name': '每日汇总',
+                'verbose_name_plural': '每日汇总',
+                'ordering': ['date'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'date'), name='rollup_user_date_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
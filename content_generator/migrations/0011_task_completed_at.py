@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:27
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_completed_at(apps, schema_editor):
+    """
+    已完成任务没有记录完成时间，以最后修改时间近似
+    """
+    Task = apps.get_model('content_generator', 'Task')
+    Task.objects.filter(completed=True, completed_at__isnull=True).update(completed_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_generator', '0010_dailyrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='完成时间'),
+        ),
+        migrations.RunPython(backfill_completed_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+from django.db import migrations
+
+# 各类记录：(类型, 表名, 标题表达式, 正文表达式)，与 search.SOURCES 一致
+SOURCES = [
+    ('task', 'content_generator_task', 'title', "coalesce(description, '')"),
+    ('event', 'content_generator_event', 'title', 'content'),
+    ('summary', 'content_generator_dailysummary', 'CAST(date AS TEXT)', "summary || ' ' || coalesce(work_evaluation, '')"),
+]
+
+# PostgreSQL 下GIN索引的文档表达式，与 search.POSTGRES_DOCUMENTS 一致
+POSTGRES_DOCUMENTS = {
+    'task': "title || ' ' || coalesce(description, '')",
+    'event': "title || ' ' || content",
+    'summary': "summary || ' ' || coalesce(work_evaluation, '')",
+}
+
+
+def create_search_index(apps, schema_editor):
+    """
+    SQLite：创建 FTS5 虚拟表并写入现有数据；PostgreSQL：在各表上创建 tsvector GIN 索引
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE content_generator_search USING fts5('
+            "title, body, kind UNINDEXED, object_id UNINDEXED, user_id UNINDEXED, tokenize='trigram')"
+        )
+        for index, (kind, table, title, body) in enumerate(SOURCES):
+            schema_editor.execute(
+                'INSERT INTO content_generator_search (rowid, title, body, kind, object_id, user_id) '
+                f"SELECT id * {len(SOURCES)} + {index}, {title}, {body}, '{kind}', id, user_id FROM {table}"
+            )
+    elif vendor == 'postgresql':
+        for kind, table, _, _ in SOURCES:
+            schema_editor.execute(
+                f'CREATE INDEX {kind}_search_idx ON {table} '
+                f"USING GIN (to_tsvector('simple', {POSTGRES_DOCUMENTS[kind]}))"
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    """
+    回滚：删除虚拟表或GIN索引
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS content_generator_search')
+    elif vendor == 'postgresql':
+        for kind, _, _, _ in SOURCES:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {kind}_search_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_generator', '0011_task_completed_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_generator', '0012_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='图片缩略图'),
+        ),
+    ]
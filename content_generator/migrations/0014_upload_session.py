@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:46
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_generator', '0013_event_image_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255, verbose_name='文件名')),
+                ('size', models.PositiveBigIntegerField(verbose_name='文件大小')),
+                ('offset', models.PositiveBigIntegerField(default=0, verbose_name='已接收字节数')),
+                ('result_name', models.CharField(blank=True, default='', max_length=255, verbose_name='处理后的文件名')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('expires_at', models.DateTimeField(verbose_name='过期时间')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to=settings.AUTH_USER_MODEL, verbose_name='用户')),
+            ],
+            options={
+                'verbose_name': '图片上传会话',
+                'verbose_name_plural': '图片上传会话',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['expires_at'], name='upload_expires_idx'), models.Index(fields=['user', 'expires_at'], name='upload_user_expires_idx')],
+            },
+        ),
+    ]
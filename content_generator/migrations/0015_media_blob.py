@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:51
+
+import content_generator.storage
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_existing_images(apps, schema_editor):
+    """
+    为已有的事件图片建立引用计数（升级前上传的文件不按内容寻址，每个文件通常只有一个引用）
+    """
+    Event = apps.get_model('content_generator', 'Event')
+    MediaBlob = apps.get_model('content_generator', 'MediaBlob')
+    counts = (
+        Event.objects.exclude(image='').exclude(image__isnull=True)
+        .values('image').annotate(refs=Count('id')).values_list('image', 'refs')
+    )
+    MediaBlob.objects.bulk_create(
+        [MediaBlob(name=name, ref_count=refs) for name, refs in counts.iterator()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_generator', '0014_upload_session'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='event',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=content_generator.storage.event_image_storage, upload_to='events/', verbose_name='图片'),
+        ),
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='文件名')),
+                ('size', models.PositiveBigIntegerField(default=0, verbose_name='文件大小')),
+                ('ref_count', models.IntegerField(default=0, verbose_name='引用数')),
+                ('variants', models.JSONField(blank=True, default=dict, verbose_name='缩略图')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '图片文件',
+                'verbose_name_plural': '图片文件',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['ref_count', 'updated_at'], name='mediablob_refs_updated_idx')],
+            },
+        ),
+        migrations.RunPython(count_existing_images, migrations.RunPython.noop),
+    ]
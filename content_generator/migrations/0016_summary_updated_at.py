@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_generator', '0015_media_blob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailysummary',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='更新时间'),
+        ),
+        migrations.AddIndex(
+            model_name='dailysummary',
+            index=models.Index(fields=['user', 'updated_at'], name='summary_user_updated_idx'),
+        ),
+    ]
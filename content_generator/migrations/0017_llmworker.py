@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:08
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_generator', '0016_summary_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMWorker',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('worker_id', models.CharField(max_length=100, unique=True, verbose_name='执行者')),
+                ('started_at', models.DateTimeField(auto_now_add=True, verbose_name='启动时间')),
+                ('last_seen', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='最后心跳')),
+            ],
+            options={
+                'verbose_name': 'LLM执行者',
+                'verbose_name_plural': 'LLM执行者',
+                'ordering': ['-last_seen'],
+            },
+        ),
+    ]
@@ -0,0 +1,72 @@
+import importlib
+
+from django.db import migrations
+
+# 各类记录：(类型, 表名, 标题表达式, 正文表达式)，rowid 为 id * 3 + 序号，与迁移时的 search.SOURCES 一致
+SOURCES = [
+    ('task', 'content_generator_task', 'title', "coalesce(description, '')"),
+    ('event', 'content_generator_event', 'title', 'content'),
+    ('summary', 'content_generator_dailysummary', 'CAST(date AS TEXT)', "summary || ' ' || coalesce(work_evaluation, '')"),
+]
+
+# 每批写入短词索引的行数
+BATCH_SIZE = 500
+
+
+def create_search_tables(apps, schema_editor):
+    """
+    SQLite：重建 FTS5 虚拟表，所属用户改为可索引的 owner 列（<u用户ID>），
+    并新增逐字以空格分隔、unicode61 分词的短词索引表，两张表都写入现有数据
+
+    owner 列只用于限定用户，bm25 中权重为0，不影响排序。PostgreSQL 的GIN索引不变。
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS content_generator_search')
+    for table, tokenize in (
+        ('content_generator_search', 'trigram'),
+        ('content_generator_search_short', 'unicode61'),
+    ):
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {table} USING fts5('
+            f"title, body, owner, kind UNINDEXED, object_id UNINDEXED, tokenize='{tokenize}')"
+        )
+        schema_editor.execute(f"INSERT INTO {table} ({table}, rank) VALUES ('rank', 'bm25(1.0, 1.0, 0.0)')")
+
+    for index, (kind, table, title, body) in enumerate(SOURCES):
+        schema_editor.execute(
+            'INSERT INTO content_generator_search (rowid, title, body, owner, kind, object_id) '
+            f"SELECT id * {len(SOURCES)} + {index}, {title}, {body}, '<u' || user_id || '>', '{kind}', id FROM {table}"
+        )
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT rowid, title, body, owner, kind, object_id FROM content_generator_search')
+        while rows := cursor.fetchmany(BATCH_SIZE):
+            with schema_editor.connection.cursor() as insert_cursor:
+                insert_cursor.executemany(
+                    'INSERT INTO content_generator_search_short (rowid, title, body, owner, kind, object_id) '
+                    'VALUES (%s, %s, %s, %s, %s, %s)',
+                    [(rowid, ' '.join(title), ' '.join(body), owner, kind, object_id)
+                     for rowid, title, body, owner, kind, object_id in rows],
+                )
+
+
+def drop_search_tables(apps, schema_editor):
+    """
+    回滚：删除两张表，按迁移 0012 的结构重建原来的虚拟表
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS content_generator_search_short')
+    schema_editor.execute('DROP TABLE IF EXISTS content_generator_search')
+    importlib.import_module('content_generator.migrations.0012_search_index').create_search_index(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_generator', '0017_llmworker'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_tables, drop_search_tables),
+    ]
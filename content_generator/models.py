@@ -1,9 +1,53 @@
+import uuid
+from datetime import datetime
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MaxLengthValidator
+from django.urls import reverse
+from django.utils import timezone
+
+from .storage import event_image_storage
+
+class CreatedDateQuerySet(models.QuerySet):
+    """
+    批量写入时维护 created_date 的查询集
+
+    bulk_create() 按每个对象的 created_at 填入 created_date；
+    update() 把 created_at 改为具体时间时同时更新 created_date，改为表达式（F() 等）时必须同时给出 created_date。
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            if obj.created_date is None and obj.created_at is not None:
+                obj.created_date = timezone.localdate(obj.created_at)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def update(self, **kwargs):
+        if 'created_at' in kwargs and 'created_date' not in kwargs:
+            if not isinstance(kwargs['created_at'], datetime):
+                raise ValueError('以表达式修改 created_at 时需要同时更新 created_date')
+            kwargs['created_date'] = timezone.localdate(kwargs['created_at'])
+        return super().update(**kwargs)
+
+
+class CreatedDateMixin:
+    """
+    保存时按 TIME_ZONE 由 created_at 计算 created_date
+
+    save() 和 objects 上的 bulk_create()/update() 都会维护 created_date；
+    原始SQL写入不经过这里，必须自行写入 created_date（列为 NOT NULL，没有数据库默认值）。
+    """
+
+    def save(self, *args, **kwargs):
+        if self.created_at is not None:
+            self.created_date = timezone.localdate(self.created_at)
+        super().save(*args, **kwargs)
+
 
 # 任务模型
-class Task(models.Model):
+class Task(CreatedDateMixin, models.Model):
     PRIORITY_CHOICES = [
         ('high', '♛♛♛'),
         ('medium', '♛♛'),
@@ -25,19 +69,35 @@ class Task(models.Model):
     willingness = models.CharField(max_length=2, choices=WILLINGNESS_CHOICES, default='😐', verbose_name='意愿度')
     due_date = models.DateTimeField(blank=True, null=True, verbose_name='截止时间')
     completed = models.BooleanField(default=False, verbose_name='已完成')
-    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    # 完成时间由 pre_save 信号维护，用于统计是否按时完成
+    completed_at = models.DateTimeField(blank=True, null=True, editable=False, verbose_name='完成时间')
+    # 创建时间在实例化时确定，保存前据此计算 created_date
+    created_at = models.DateTimeField(default=timezone.now, editable=False, verbose_name='创建时间')
+    # TIME_ZONE 下的创建日期，由 save() 和 objects 的批量方法维护（见 CreatedDateMixin），供按日/周/月筛选走索引
+    created_date = models.DateField(editable=False, verbose_name='创建日期')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
     
+    objects = CreatedDateQuerySet.as_manager()
+    
     class Meta:
         verbose_name = '任务'
         verbose_name_plural = '任务'
         ordering = ['-created_at']
+        indexes = [
+            # 列表游标分页
+            models.Index(fields=['user', '-created_at', '-id'], name='task_user_created_idx'),
+            # 按日/周/月筛选
+            models.Index(fields=['user', 'created_date'], name='task_user_created_date_idx'),
+            # 逾期统计
+            models.Index(fields=['user', 'completed', 'due_date'], name='task_user_completed_due_idx'),
+            models.Index(fields=['user', 'priority'], name='task_user_priority_idx'),
+        ]
     
     def __str__(self):
         return self.title
 
 # 事件记录模型
-class Event(models.Model):
+class Event(CreatedDateMixin, models.Model):
     MOOD_CHOICES = [
         ('😄', '开心'),
         ('😢', '悲伤'),
@@ -53,16 +113,86 @@ class Event(models.Model):
     title = models.CharField(max_length=200, verbose_name='事件标题')
     content = models.TextField(verbose_name='事件内容')
     mood = models.CharField(max_length=2, choices=MOOD_CHOICES, default='😄', verbose_name='心情')
-    image = models.ImageField(upload_to='events/', blank=True, null=True, verbose_name='图片')
-    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    # 按内容寻址存储（见 storage.py），相同的图片共用一个文件，引用计数见 MediaBlob
+    image = models.ImageField(upload_to='events/', storage=event_image_storage, blank=True, null=True, verbose_name='图片')
+    # 图片的缩略图信息，由后台生成（见 images.py）：
+    # {'source': 原图名, 'width': 宽, 'height': 高, 'variants': [{'width', 'height', 'format', 'name'}]}
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name='图片缩略图')
+    # 创建时间在实例化时确定，保存前据此计算 created_date
+    created_at = models.DateTimeField(default=timezone.now, editable=False, verbose_name='创建时间')
+    # TIME_ZONE 下的创建日期，由 save() 和 objects 的批量方法维护（见 CreatedDateMixin），供按日/周/月筛选走索引
+    created_date = models.DateField(editable=False, verbose_name='创建日期')
+    
+    objects = CreatedDateQuerySet.as_manager()
     
     class Meta:
         verbose_name = '事件记录'
         verbose_name_plural = '事件记录'
         ordering = ['-created_at']
+        indexes = [
+            # 列表游标分页
+            models.Index(fields=['user', '-created_at', '-id'], name='event_user_created_idx'),
+            # 按日/周/月筛选
+            models.Index(fields=['user', 'created_date'], name='event_user_created_date_idx'),
+            models.Index(fields=['user', 'mood'], name='event_user_mood_idx'),
+        ]
     
     def __str__(self):
         return self.title
+    
+    def current_variants(self):
+        """
+        当前图片已生成的缩略图，图片更换后旧的缩略图不再返回
+        """
+        info = self.image_variants or {}
+        if not self.image or info.get('source') != self.image.name:
+            return []
+        return info.get('variants', [])
+    
+    def variant_srcset(self, image_format):
+        """
+        指定格式缩略图的 srcset
+        """
+        return ', '.join(
+            f"{self.image.storage.url(variant['name'])} {variant['width']}w"
+            for variant in self.current_variants()
+            if variant['format'] == image_format
+        )
+    
+    @property
+    def webp_srcset(self):
+        return self.variant_srcset('webp')
+    
+    @property
+    def jpeg_srcset(self):
+        return self.variant_srcset('jpeg')
+    
+    @property
+    def image_display_url(self):
+        """
+        列表中显示的图片地址：有缩略图时用最小的 JPEG，还没生成时按需缩放
+        """
+        jpegs = [variant for variant in self.current_variants() if variant['format'] == 'jpeg']
+        if jpegs:
+            return self.image.storage.url(min(jpegs, key=lambda variant: variant['width'])['name'])
+        return self.resized_url(640)
+    
+    def resized_url(self, width, image_format='jpeg'):
+        """
+        按需缩放的图片地址（宽度和格式需在 IMAGE_RESIZE 的白名单中，见 resize.py）
+        """
+        from .resize import image_version
+        return reverse(
+            'content_generator:resized_image',
+            args=[self.pk, image_version(self.image.name), width, image_format],
+        )
+    
+    @property
+    def lightbox_url(self):
+        """
+        查看大图的地址
+        """
+        return self.resized_url(1920, 'webp')
 
 # 日总结模型
 class DailySummary(models.Model):
@@ -71,12 +201,17 @@ class DailySummary(models.Model):
     summary = models.TextField(verbose_name='总结内容')
     work_evaluation = models.TextField(blank=True, null=True, verbose_name='工作评估')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
     
     class Meta:
         verbose_name = '日总结'
         verbose_name_plural = '日总结'
         unique_together = ('user', 'date')
         ordering = ['-date']
+        indexes = [
+            # 连续天数缓存的版本（见 stats.summary_streaks_version）
+            models.Index(fields=['user', 'updated_at'], name='summary_user_updated_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.date}"
@@ -99,6 +234,231 @@ class LLMAdvice(models.Model):
         verbose_name = 'LLM建议'
         verbose_name_plural = 'LLM建议'
         ordering = ['-created_at']
+        constraints = [
+            # 每个对象只保留一条建议，并发生成时由数据库拒绝重复写入
+            models.UniqueConstraint(fields=['user', 'advice_type', 'related_id'], name='advice_user_type_related_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_advice_type_display()} - {self.created_at}"
+
+# 用户统计模型（物化计数，由信号增量维护）
+class UserStats(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats', verbose_name='用户')
+    total_tasks = models.IntegerField(default=0, verbose_name='任务总数')
+    completed_tasks = models.IntegerField(default=0, verbose_name='已完成任务')
+    high_priority_tasks = models.IntegerField(default=0, verbose_name='高优先级任务')
+    medium_priority_tasks = models.IntegerField(default=0, verbose_name='中优先级任务')
+    low_priority_tasks = models.IntegerField(default=0, verbose_name='低优先级任务')
+    total_events = models.IntegerField(default=0, verbose_name='事件总数')
+    events_with_images = models.IntegerField(default=0, verbose_name='带图片事件')
+    happy_events = models.IntegerField(default=0, verbose_name='开心事件')
+    total_summaries = models.IntegerField(default=0, verbose_name='总结总数')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+    
+    class Meta:
+        verbose_name = '用户统计'
+        verbose_name_plural = '用户统计'
+    
+    def __str__(self):
+        return f"{self.user.username} - 统计"
+
+
+# LLM生成任务队列模型
+class LLMJob(models.Model):
+    STATUS_CHOICES = [
+        ('pending', '等待中'),
+        ('running', '执行中'),
+        ('done', '已完成'),
+        ('failed', '失败'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='用户')
+    advice_type = models.CharField(max_length=10, choices=LLMAdvice.ADVICE_TYPE_CHOICES, verbose_name='建议类型')
+    related_id = models.IntegerField(verbose_name='关联ID')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name='状态')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='尝试次数')
+    available_at = models.DateTimeField(default=timezone.now, verbose_name='可执行时间')
+    locked_by = models.CharField(max_length=100, blank=True, default='', verbose_name='执行者')
+    locked_until = models.DateTimeField(blank=True, null=True, verbose_name='租约到期时间')
+    advice = models.ForeignKey(LLMAdvice, on_delete=models.SET_NULL, blank=True, null=True, verbose_name='生成结果')
+    error = models.TextField(blank=True, default='', verbose_name='错误信息')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+    
+    class Meta:
+        verbose_name = 'LLM生成任务'
+        verbose_name_plural = 'LLM生成任务'
+        ordering = ['created_at']
+        indexes = [
+            # 执行者领取任务
+            models.Index(fields=['status', 'available_at'], name='llmjob_status_available_idx'),
+            models.Index(fields=['user', 'advice_type', 'related_id'], name='llmjob_user_type_related_idx'),
+        ]
+        constraints = [
+            # 同一对象同时只能有一个未完成的任务，重复排队的请求共享这个任务
+            models.UniqueConstraint(
+                fields=['user', 'advice_type', 'related_id'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='llmjob_active_uniq',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_advice_type_display()} #{self.related_id} - {self.get_status_display()}"
+
+# LLM生成任务执行者的心跳（没有存活的执行者时视图直接在请求中生成，见 jobs.submit_advice_job）
+class LLMWorker(models.Model):
+    worker_id = models.CharField(max_length=100, unique=True, verbose_name='执行者')
+    started_at = models.DateTimeField(auto_now_add=True, verbose_name='启动时间')
+    last_seen = models.DateTimeField(default=timezone.now, db_index=True, verbose_name='最后心跳')
+    
+    class Meta:
+        verbose_name = 'LLM执行者'
+        verbose_name_plural = 'LLM执行者'
+        ordering = ['-last_seen']
+    
+    def __str__(self):
+        return self.worker_id
+
+# 用户每日汇总（按创建日期物化的任务/事件计数，由信号增量维护）
+class DailyRollup(models.Model):
+    # 意愿度和心情对应的计数字段
+    WILLINGNESS_FIELDS = {
+        '😭': 'tasks_willingness_very_low',
+        '😕': 'tasks_willingness_low',
+        '😐': 'tasks_willingness_neutral',
+        '🙂': 'tasks_willingness_high',
+        '😄': 'tasks_willingness_very_high',
+    }
+    
+    MOOD_FIELDS = {
+        '😄': 'events_happy',
+        '😢': 'events_sad',
+        '😠': 'events_angry',
+        '😲': 'events_surprised',
+        '😴': 'events_sleepy',
+        '😍': 'events_excited',
+        '🤔': 'events_thinking',
+        '😎': 'events_cool',
+    }
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_rollups', verbose_name='用户')
+    date = models.DateField(verbose_name='日期')
+    tasks_created = models.IntegerField(default=0, verbose_name='新建任务')
+    tasks_completed = models.IntegerField(default=0, verbose_name='已完成任务')
+    tasks_high = models.IntegerField(default=0, verbose_name='高优先级任务')
+    tasks_medium = models.IntegerField(default=0, verbose_name='中优先级任务')
+    tasks_low = models.IntegerField(default=0, verbose_name='低优先级任务')
+    tasks_willingness_very_low = models.IntegerField(default=0, verbose_name='很不情愿的任务')
+    tasks_willingness_low = models.IntegerField(default=0, verbose_name='不太情愿的任务')
+    tasks_willingness_neutral = models.IntegerField(default=0, verbose_name='意愿一般的任务')
+    tasks_willingness_high = models.IntegerField(default=0, verbose_name='比较愿意的任务')
+    tasks_willingness_very_high = models.IntegerField(default=0, verbose_name='很愿意的任务')
+    events_created = models.IntegerField(default=0, verbose_name='新建事件')
+    events_with_images = models.IntegerField(default=0, verbose_name='带图片的事件')
+    events_happy = models.IntegerField(default=0, verbose_name='开心')
+    events_sad = models.IntegerField(default=0, verbose_name='悲伤')
+    events_angry = models.IntegerField(default=0, verbose_name='愤怒')
+    events_surprised = models.IntegerField(default=0, verbose_name='惊讶')
+    events_sleepy = models.IntegerField(default=0, verbose_name='困倦')
+    events_excited = models.IntegerField(default=0, verbose_name='兴奋')
+    events_thinking = models.IntegerField(default=0, verbose_name='思考')
+    events_cool = models.IntegerField(default=0, verbose_name='酷')
+    updated_at = models.DateTimeField(default=timezone.now, verbose_name='更新时间')
+    
+    class Meta:
+        verbose_name = '每日汇总'
+        verbose_name_plural = '每日汇总'
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='rollup_user_date_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.date}"
+
+# LLM调用记录（每次生成一行，用于统计各类生成的延迟和用量）
+class LLMCall(models.Model):
+    CALL_TYPE_CHOICES = [
+        ('task', '任务建议'),
+        ('event', '事件分享'),
+        ('summary', '日总结'),
+        ('evaluation', '工作评估'),
+    ]
+    
+    SOURCE_CHOICES = [
+        ('backend', '后端'),
+        ('cache', '缓存'),
+        ('template', '模板'),
+    ]
+    
+    call_type = models.CharField(max_length=10, choices=CALL_TYPE_CHOICES, verbose_name='生成类型')
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES, verbose_name='结果来源')
+    latency_ms = models.PositiveIntegerField(verbose_name='耗时(毫秒)')
+    first_token_ms = models.PositiveIntegerField(blank=True, null=True, verbose_name='首字耗时(毫秒)')
+    prompt_chars = models.PositiveIntegerField(default=0, verbose_name='提示词长度')
+    response_chars = models.PositiveIntegerField(default=0, verbose_name='回复长度')
+    prompt_tokens = models.PositiveIntegerField(blank=True, null=True, verbose_name='提示词token数')
+    completion_tokens = models.PositiveIntegerField(blank=True, null=True, verbose_name='回复token数')
+    batch_size = models.PositiveSmallIntegerField(default=1, verbose_name='批大小')
+    error = models.CharField(max_length=200, blank=True, default='', verbose_name='错误信息')
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='调用时间')
+    
+    class Meta:
+        verbose_name = 'LLM调用记录'
+        verbose_name_plural = 'LLM调用记录'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['call_type', 'created_at'], name='llmcall_type_created_idx'),
+            models.Index(fields=['created_at'], name='llmcall_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_call_type_display()} {self.latency_ms}ms ({self.get_source_display()})"
+
+# 断点续传的图片上传会话（分片暂存在本地目录，见 resumable.py）
+class UploadSession(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions', verbose_name='用户')
+    filename = models.CharField(max_length=255, verbose_name='文件名')
+    size = models.PositiveBigIntegerField(verbose_name='文件大小')
+    offset = models.PositiveBigIntegerField(default=0, verbose_name='已接收字节数')
+    # 完成后重新编码得到的文件名，为空表示还未完成
+    result_name = models.CharField(max_length=255, blank=True, default='', verbose_name='处理后的文件名')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    expires_at = models.DateTimeField(verbose_name='过期时间')
+    
+    class Meta:
+        verbose_name = '图片上传会话'
+        verbose_name_plural = '图片上传会话'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['expires_at'], name='upload_expires_idx'),
+            models.Index(fields=['user', 'expires_at'], name='upload_user_expires_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
+
+# 事件图片文件的引用计数（文件按内容寻址，多个事件可能引用同一个文件，见 blobs.py）
+class MediaBlob(models.Model):
+    name = models.CharField(max_length=255, unique=True, verbose_name='文件名')
+    size = models.PositiveBigIntegerField(default=0, verbose_name='文件大小')
+    ref_count = models.IntegerField(default=0, verbose_name='引用数')
+    # 这张图片的缩略图信息（与 Event.image_variants 格式相同），引用同一文件的事件共用
+    variants = models.JSONField(default=dict, blank=True, verbose_name='缩略图')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    # 引用数最后变化的时间，垃圾回收只删除在宽限期内没有变化的文件
+    updated_at = models.DateTimeField(default=timezone.now, verbose_name='更新时间')
+    
+    class Meta:
+        verbose_name = '图片文件'
+        verbose_name_plural = '图片文件'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['ref_count', 'updated_at'], name='mediablob_refs_updated_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.get_advice_type_display()} - {self.created_at}"
\ No newline at end of file
+        return f"{self.name} ({self.ref_count})"
@@ -0,0 +1,68 @@
+"""
+游标（keyset）分页
+
+按 (created_at, id) 倒序翻页，下一页的条件直接落在索引上，
+每页的代价与历史记录的多少无关，不会像 OFFSET 那样越翻越慢。
+"""
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+
+# 每页默认条数
+DEFAULT_PAGE_SIZE = 20
+
+
+def encode_cursor(obj):
+    """
+    把一条记录的位置编码为URL安全的游标字符串
+    """
+    payload = json.dumps([obj.created_at.isoformat(), obj.pk])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    解析游标字符串
+
+    Returns:
+        tuple | None: (created_at, id)，游标无效时返回None
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, TypeError):
+        return None
+
+
+def paginate_by_cursor(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    按 (created_at, id) 倒序取出游标之后的一页记录
+
+    Args:
+        queryset: 待分页的查询集
+        cursor (str, optional): 上一页返回的游标，为空时取第一页
+        page_size (int): 每页条数
+
+    Returns:
+        tuple: (本页记录列表, 下一页游标)，没有更多记录时游标为None
+    """
+    queryset = queryset.order_by('-created_at', '-id')
+    position = decode_cursor(cursor)
+    if position is not None:
+        created_at, pk = position
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+
+    # 多取一条用于判断是否还有下一页
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor(items[-1])
+    return items, next_cursor
@@ -0,0 +1,279 @@
+"""
+按需缩放事件图片
+
+除了固定尺寸的缩略图（images.py），卡片、大图浏览和分享预览需要其他尺寸：
+events/<id>/image/<版本>/<宽度>.<格式> 按白名单中的宽度和格式缩放事件图片。
+
+- 地址中的版本由图片文件名计算，图片更换后地址随之改变，因此响应可以标记为 immutable；
+- ETag 由文件名、宽度、格式和质量决定（强校验），If-None-Match 命中时直接返回304；
+- 结果缓存在本地目录，总大小超过 MAX_CACHE_BYTES 时按最近访问时间淘汰到上限的90%；
+- 对同一尺寸的并发请求只缩放一次：在缓存目录中以 O_CREAT|O_EXCL 创建该键的锁文件，
+  创建成功的请求负责缩放，其余请求（包括其他 worker 进程中的）轮询最终文件。
+
+配置（均可省略）：
+
+    IMAGE_RESIZE = {'WIDTHS': [160, 320, 480, 640, 960, 1280, 1920], 'FORMATS': ['webp', 'jpeg'],
+                    'QUALITY': 80, 'CACHE_DIR': BASE_DIR / 'image_cache', 'MAX_CACHE_BYTES': 256 * 1024 * 1024}
+"""
+import hashlib
+import os
+import threading
+import time
+import uuid
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from PIL import Image
+
+from .images import open_image
+
+DEFAULTS = {
+    'WIDTHS': [160, 320, 480, 640, 960, 1280, 1920],
+    'FORMATS': ['webp', 'jpeg'],
+    'QUALITY': 80,
+    'CACHE_DIR': None,
+    'MAX_CACHE_BYTES': 256 * 1024 * 1024,
+}
+
+# 输出格式：格式名 -> (Pillow 格式, 内容类型, 扩展名)
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', 'webp'),
+    'jpeg': ('JPEG', 'image/jpeg', 'jpg'),
+}
+
+# 地址带版本，浏览器可以缓存一年
+CACHE_MAX_AGE = 365 * 24 * 60 * 60
+
+# 等待其他请求缩放同一尺寸的最长时间（秒）
+FLIGHT_WAIT_SECONDS = 30
+
+# 锁文件存在超过这个时间（秒）视为领头者已退出，由下一个请求接手。
+# 缩放在请求中进行，受 gunicorn 的 worker 超时（默认30秒）限制，超时的 worker 被杀掉后留下锁文件；
+# 这个阈值必须明显长于任何一次缩放，否则仍在进行的缩放会被接手、重复生成
+FLIGHT_STALE_SECONDS = 5 * 60
+
+# 等待时检查结果文件的间隔（秒）
+FLIGHT_POLL_SECONDS = 0.05
+
+# 淘汰时删除到上限的这个比例，避免每次写入都扫描目录
+EVICT_TARGET = 0.9
+
+
+class ResizeUnavailable(Exception):
+    """
+    结果暂时无法生成：等待其他请求缩放超时，或重试后缓存文件仍不存在
+    """
+
+
+def resize_config():
+    """
+    合并默认值后的缩放配置
+    """
+    return {**DEFAULTS, **(getattr(settings, 'IMAGE_RESIZE', None) or {})}
+
+
+def image_version(source_name):
+    """
+    图片地址中的版本，由文件名计算
+    """
+    return hashlib.sha1(source_name.encode('utf-8')).hexdigest()[:12]
+
+
+def resize_key(source_name, width, image_format, quality):
+    """
+    缩放结果的缓存键，同时用作强 ETag
+    """
+    return hashlib.sha256(f'{source_name}\0{width}\0{image_format}\0{quality}'.encode('utf-8')).hexdigest()
+
+
+def render_resized(source, width, image_format, quality):
+    """
+    把图片缩放到不超过 width 的宽度（不放大）并编码
+
+    Returns:
+        bytes: 编码后的图片
+    """
+    image = open_image(source, width)
+    if image.width > width:
+        height = max(1, round(image.height * width / image.width))
+        image = image.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+    buffer = BytesIO()
+    image.save(buffer, FORMATS[image_format][0], quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+class ResizeCache:
+    """
+    按最近访问时间淘汰的缩放结果磁盘缓存
+
+    命中时刷新文件的修改时间，淘汰时删除修改时间最早的文件。
+    进程内记录缓存总大小，超过上限时扫描目录重新计算并淘汰；
+    多个进程共用目录时各自的记录可能偏小，但每次淘汰都以实际扫描结果为准。
+
+    Args:
+        directory: 缓存目录
+        max_bytes (int): 缓存总大小上限
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._size = None
+        self._lock = threading.Lock()
+
+    def path(self, key, extension):
+        """
+        缓存文件路径
+        """
+        return self.directory / key[:2] / f'{key}.{extension}'
+
+    def open(self, key, extension, render):
+        """
+        打开缓存的结果，不存在时调用 render() 生成并写入
+
+        同一个键的并发请求（跨进程）只有一个调用 render()；
+        打开前文件恰好被淘汰、或等待的领头者失败时重新尝试一次。
+
+        Returns:
+            file: 以二进制模式打开的缓存文件
+
+        Raises:
+            ResizeUnavailable: 等待超时或重试后仍没有结果
+        """
+        path = self.path(key, extension)
+        for attempt in range(3):
+            try:
+                f = open(path, 'rb')
+            except FileNotFoundError:
+                if attempt == 2:
+                    break
+                self.fill(key, path, render)
+                continue
+            os.utime(path)
+            return f
+        raise ResizeUnavailable(f'缩放结果不存在: {path.name}')
+
+    def fill(self, key, path, render):
+        """
+        生成并写入一个结果
+
+        以 O_CREAT|O_EXCL 创建锁文件成功的请求是领头者，负责生成，完成或失败后删除锁文件；
+        其他请求轮询结果文件，直到文件出现、锁文件消失或超时。
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        lock_path = path.with_name(f'.{key}.lock')
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            self.wait(path, lock_path)
+            return
+        try:
+            # 上一个领头者可能刚写完并删除了锁文件
+            if not path.exists():
+                self.write(path, render())
+        finally:
+            lock_path.unlink(missing_ok=True)
+
+    def wait(self, path, lock_path):
+        """
+        等待领头者写入结果文件
+
+        领头者失败时锁文件被删除，返回后由调用方重新尝试；
+        锁文件存在超过 FLIGHT_STALE_SECONDS（领头者进程已退出）时删除它，由调用方接手。
+        """
+        deadline = time.monotonic() + FLIGHT_WAIT_SECONDS
+        while not path.exists():
+            try:
+                locked_at = lock_path.stat().st_mtime
+            except FileNotFoundError:
+                return
+            if time.time() - locked_at > FLIGHT_STALE_SECONDS:
+                lock_path.unlink(missing_ok=True)
+                return
+            if time.monotonic() > deadline:
+                raise ResizeUnavailable(f'等待缩放结果超时: {path.name}')
+            time.sleep(FLIGHT_POLL_SECONDS)
+
+    def write(self, path, data):
+        """
+        先写临时文件再替换，读者看到的总是完整的文件
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f'.{uuid.uuid4().hex}.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            if self._size is None:
+                self._size = self.scan()[1]
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._size = self.evict(int(self.max_bytes * EVICT_TARGET))
+
+    def scan(self):
+        """
+        列出缓存中的全部文件
+
+        Returns:
+            tuple: ([(修改时间, 大小, 路径)], 总大小)
+        """
+        entries = []
+        if self.directory.is_dir():
+            for path in self.directory.rglob('*'):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                # 跳过其他线程正在写入的临时文件
+                if path.is_file() and not path.name.startswith('.'):
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        return entries, sum(size for _, size, _ in entries)
+
+    def evict(self, target):
+        """
+        按修改时间从早到晚删除文件，直到总大小不超过 target（调用方持有锁）
+
+        Returns:
+            int: 淘汰后的总大小
+        """
+        entries, total = self.scan()
+        entries.sort()
+        for _, size, path in entries:
+            if total <= target:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+        return total
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_resize_cache():
+    """
+    按 settings.IMAGE_RESIZE 创建并返回进程内共享的缩放缓存
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                config = resize_config()
+                directory = config['CACHE_DIR'] or Path(settings.BASE_DIR) / 'image_cache'
+                _cache = ResizeCache(directory, config['MAX_CACHE_BYTES'])
+    return _cache
+
+
+@receiver(setting_changed)
+def reset_resize_cache(setting, **kwargs):
+    """
+    IMAGE_RESIZE 变化时丢弃缓存对象（缓存目录中的文件保留）
+    """
+    global _cache
+    if setting == 'IMAGE_RESIZE':
+        with _cache_lock:
+            _cache = None
@@ -0,0 +1,261 @@
+"""
+断点续传的图片上传
+
+移动网络不稳定时，整张照片随表单一次提交，连接一断就要从头再传。
+这里把上传拆成三步，客户端断线后查询已接收的字节数，从断点继续：
+
+1. POST uploads/ 创建会话（文件名和总大小），返回会话ID和分片大小；
+2. PUT uploads/<id>/ 依次上传分片，请求头 Content-Range: bytes 起点-终点/总大小，
+   起点必须等于服务端已接收的字节数，否则返回409和当前的 offset；
+   GET uploads/<id>/ 查询 offset；
+3. POST uploads/<id>/finalize/ 收齐后校验并重新编码（与表单上传相同，见 uploads.py）。
+
+之后提交事件表单时用 upload_id 代替文件字段，图片从暂存目录保存到事件上。
+
+分片暂存在 RESUMABLE_UPLOADS['DIR'] 下，每个会话一个文件；会话在 EXPIRY 秒内没有新的分片即过期，
+过期的会话不再接受请求，由 purge_uploads 命令删除。配置（均可省略）：
+
+    RESUMABLE_UPLOADS = {'DIR': BASE_DIR / 'upload_staging', 'CHUNK_SIZE': 1024 * 1024,
+                         'EXPIRY': 86400, 'MAX_SESSIONS': 10}
+
+文件大小和图片校验的上限沿用 IMAGE_UPLOADS。
+"""
+import os
+import posixpath
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+from .models import UploadSession
+from .uploads import ImageRejected, MAX_HEADER_BYTES, probe_header, process_image, upload_config
+
+DEFAULTS = {
+    'DIR': None,
+    'CHUNK_SIZE': 1024 * 1024,
+    'EXPIRY': 24 * 60 * 60,
+    'MAX_SESSIONS': 10,
+}
+
+
+class UploadConflict(Exception):
+    """
+    分片起点与服务端已接收的字节数不一致，或会话状态不允许当前操作
+
+    Args:
+        offset (int): 服务端已接收的字节数
+    """
+
+    def __init__(self, offset):
+        super().__init__(f'当前已接收 {offset} 字节')
+        self.offset = offset
+
+
+def resumable_config():
+    """
+    合并默认值后的断点续传配置
+    """
+    return {**DEFAULTS, **(getattr(settings, 'RESUMABLE_UPLOADS', None) or {})}
+
+
+def staging_dir():
+    """
+    分片暂存目录
+    """
+    return Path(resumable_config()['DIR'] or Path(settings.BASE_DIR) / 'upload_staging')
+
+
+def part_path(session):
+    """
+    会话接收中的原始数据
+    """
+    return staging_dir() / f'{session.pk}.part'
+
+
+def result_path(session):
+    """
+    会话完成后重新编码得到的图片
+    """
+    return staging_dir() / f'{session.pk}.done'
+
+
+def expiry_time():
+    """
+    从现在起算的过期时间
+    """
+    return timezone.now() + timedelta(seconds=resumable_config()['EXPIRY'])
+
+
+def session_payload(session):
+    """
+    返回给客户端的会话状态
+    """
+    return {
+        'id': str(session.pk),
+        'size': session.size,
+        'offset': session.offset,
+        'chunk_size': resumable_config()['CHUNK_SIZE'],
+        'finalized': bool(session.result_name),
+        'expires_at': session.expires_at.isoformat(),
+    }
+
+
+def create_session(user, filename, size):
+    """
+    创建上传会话并建立空的暂存文件
+
+    Raises:
+        ImageRejected: 文件大小不合法或用户未完成的会话过多
+    """
+    max_bytes = upload_config()['MAX_BYTES']
+    if not 0 < size <= max_bytes:
+        raise ImageRejected(f'图片不能超过 {max_bytes // (1024 * 1024)}MB')
+    active = UploadSession.objects.filter(user=user, expires_at__gt=timezone.now()).count()
+    if active >= resumable_config()['MAX_SESSIONS']:
+        raise ImageRejected('未完成的上传过多，请稍后再试')
+
+    session = UploadSession.objects.create(
+        user=user,
+        filename=posixpath.basename(filename.replace('\\', '/'))[:255] or 'image',
+        size=size,
+        expires_at=expiry_time(),
+    )
+    staging_dir().mkdir(parents=True, exist_ok=True)
+    part_path(session).touch()
+    return session
+
+
+def get_session(user, upload_id):
+    """
+    取出用户未过期的上传会话，不存在时返回 None
+    """
+    try:
+        upload_id = uuid.UUID(str(upload_id))
+    except ValueError:
+        return None
+    return UploadSession.objects.filter(pk=upload_id, user=user, expires_at__gt=timezone.now()).first()
+
+
+def write_chunk(session, start, total, data):
+    """
+    把一个分片写入暂存文件
+
+    先以 offset 为条件把会话推进到分片终点（占住这段范围），再写文件；
+    同一分片的并发重试只有一个能占住，其余得到 UploadConflict。写文件失败时退回 offset。
+
+    Raises:
+        UploadConflict: 起点与已接收的字节数不一致，或会话已完成
+        ImageRejected: 分片不合法，或第一个分片不是支持的图片（会话随之删除）
+    """
+    if session.result_name:
+        raise UploadConflict(session.offset)
+    if total != session.size or start + len(data) > session.size:
+        raise ImageRejected('分片超出文件大小')
+    if len(data) > resumable_config()['CHUNK_SIZE']:
+        raise ImageRejected('分片过大')
+    if start != session.offset:
+        raise UploadConflict(session.offset)
+    if start == 0:
+        # 第一个分片就检查魔数和尺寸，不是图片的文件不必传完
+        try:
+            probe_header(data[:MAX_HEADER_BYTES], upload_config(), complete=len(data) == session.size)
+        except ImageRejected:
+            discard_session(session)
+            raise
+
+    end = start + len(data)
+    claimed = UploadSession.objects.filter(pk=session.pk, offset=start, result_name='').update(
+        offset=end, expires_at=expiry_time(),
+    )
+    if not claimed:
+        session.refresh_from_db()
+        raise UploadConflict(session.offset)
+    try:
+        with open(part_path(session), 'r+b') as f:
+            f.seek(start)
+            f.write(data)
+            f.truncate()
+    except OSError:
+        UploadSession.objects.filter(pk=session.pk, offset=end).update(offset=start)
+        raise
+    session.offset = end
+
+
+def finalize_session(session):
+    """
+    收齐全部数据后校验并重新编码图片，已完成的会话直接返回
+
+    Raises:
+        UploadConflict: 数据还没有收齐
+        ImageRejected: 图片不合格（会话随之删除）
+    """
+    if session.result_name:
+        return
+    if session.offset != session.size:
+        raise UploadConflict(session.offset)
+
+    config = upload_config()
+    done_path = result_path(session)
+    tmp_path = done_path.with_suffix(f'.tmp{os.getpid()}')
+    try:
+        with open(part_path(session), 'rb') as source:
+            probe_header(source.read(MAX_HEADER_BYTES), config)
+            source.seek(0)
+            with open(tmp_path, 'wb') as destination:
+                extension, _, _, _ = process_image(source, destination, config)
+    except ImageRejected:
+        tmp_path.unlink(missing_ok=True)
+        discard_session(session)
+        raise
+    os.replace(tmp_path, done_path)
+    part_path(session).unlink(missing_ok=True)
+
+    stem = posixpath.splitext(session.filename)[0] or 'image'
+    session.result_name = f'{stem}.{extension}'
+    session.save(update_fields=['result_name'])
+
+
+def attach_upload(event, session):
+    """
+    把已完成会话的图片保存为事件的图片（不保存事件本身）
+    """
+    with open(result_path(session), 'rb') as f:
+        event.image.save(session.result_name, File(f), save=False)
+
+
+def discard_session(session):
+    """
+    删除会话和它的暂存文件
+    """
+    part_path(session).unlink(missing_ok=True)
+    result_path(session).unlink(missing_ok=True)
+    UploadSession.objects.filter(pk=session.pk).delete()
+
+
+def purge_expired(now=None):
+    """
+    删除过期的会话，以及暂存目录中没有对应会话的文件
+
+    Returns:
+        tuple: (删除的会话数, 删除的文件数)
+    """
+    now = now or timezone.now()
+    sessions = 0
+    for session in UploadSession.objects.filter(expires_at__lte=now).iterator():
+        discard_session(session)
+        sessions += 1
+
+    files = 0
+    directory = staging_dir()
+    if directory.is_dir():
+        live = {str(pk) for pk in UploadSession.objects.values_list('pk', flat=True)}
+        # 刚创建的会话可能还没提交，只删除超过有效期的孤立文件
+        cutoff = (now - timedelta(seconds=resumable_config()['EXPIRY'])).timestamp()
+        for path in directory.iterdir():
+            if path.name.split('.', 1)[0] not in live and path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+                files += 1
+    return sessions, files
@@ -0,0 +1,327 @@
+"""
+全文搜索
+
+SQLite 下任务、事件和日总结的标题和正文写入 FTS5 虚拟表 content_generator_search
+（trigram 分词，中文无需分词即可按子串匹配），由保存/删除信号同步，
+搜索按 bm25 排序并用 snippet() 截取高亮片段。
+trigram 无法匹配少于3个字符的词，同一份文本再逐字以空格分隔写入
+content_generator_search_short（unicode61 分词，每个字一个词），短词按相邻字的短语匹配。
+两张表都把所属用户写成可索引的 owner 列并放进 MATCH 条件，只在该用户的文档中查找和排序。
+绕过信号的批量写入后运行 rebuild_search_index 命令重建。
+
+PostgreSQL 下不使用虚拟表，改为在各表上建立 tsvector 表达式的 GIN 索引（见迁移 0012），
+由数据库自动维护，搜索使用 ts_rank 排序、ts_headline 高亮。
+"""
+import html
+import re
+
+from django.db import connection, transaction
+from .models import Task, Event, DailySummary
+
+SEARCH_TABLE = 'content_generator_search'
+SHORT_SEARCH_TABLE = 'content_generator_search_short'
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 50
+
+# trigram 分词只能匹配至少3个字符的词
+MIN_TERM_LENGTH = 3
+
+# 重建时每批写入索引的行数
+REBUILD_BATCH_SIZE = 500
+
+# 高亮标记先用控制字符占位，转义后再替换为 <mark>，避免用户内容中的HTML被渲染
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+# 各类记录：(模型, 标题的SQL表达式, 正文的SQL表达式)
+SOURCES = {
+    'task': (Task, 'title', "coalesce(description, '')"),
+    'event': (Event, 'title', 'content'),
+    'summary': (DailySummary, 'CAST(date AS TEXT)', "summary || ' ' || coalesce(work_evaluation, '')"),
+}
+KINDS = list(SOURCES)
+# PostgreSQL 下建立GIN索引的文档表达式（索引表达式必须是 IMMUTABLE，日期转文本不满足，日总结只索引正文）
+POSTGRES_DOCUMENTS = {
+    'task': "title || ' ' || coalesce(description, '')",
+    'event': "title || ' ' || content",
+    'summary': "summary || ' ' || coalesce(work_evaluation, '')",
+}
+MODEL_KINDS = {model: kind for kind, (model, _, _) in SOURCES.items()}
+
+
+def uses_fts():
+    """
+    当前数据库是否使用 FTS5 虚拟表
+    """
+    return connection.vendor == 'sqlite'
+
+
+def search_rowid(kind, pk):
+    """
+    记录在虚拟表中的 rowid，按主键直接定位，删除时无需扫描
+    """
+    return pk * len(KINDS) + KINDS.index(kind)
+
+
+def owner_token(user_id):
+    """
+    owner 列中的用户标记，两侧加上分隔符，trigram 子串匹配时 <u1> 不会命中 <u12>
+    """
+    return f'<u{user_id}>'
+
+
+def spaced(text):
+    """
+    逐字以空格分隔，写入短词索引后每个字是一个词
+    """
+    return ' '.join(text)
+
+
+def phrase(text):
+    """
+    FTS5 查询中的短语，转义双引号
+    """
+    return '"{}"'.format(text.replace('"', '""'))
+
+
+def owner_match(user_id, terms):
+    """
+    MATCH 表达式：限定 owner 列为该用户，每个词在标题或正文中按短语匹配，多个词之间为 AND
+    """
+    return ' AND '.join(
+        [f'owner : {phrase(owner_token(user_id))}']
+        + [f'{{title body}} : {phrase(term)}' for term in terms]
+    )
+
+
+def document_of(instance):
+    """
+    取出记录的类型、标题和正文，与 SOURCES 中的SQL表达式一致
+    """
+    kind = MODEL_KINDS[type(instance)]
+    if kind == 'task':
+        return kind, instance.title, instance.description or ''
+    if kind == 'event':
+        return kind, instance.title, instance.content
+    return kind, str(instance.date), f"{instance.summary} {instance.work_evaluation or ''}"
+
+
+def index_object(instance):
+    """
+    写入或更新一条记录的索引
+    """
+    if not uses_fts():
+        return
+    kind, title, body = document_of(instance)
+    rowid = search_rowid(kind, instance.pk)
+    owner = owner_token(instance.user_id)
+    with connection.cursor() as cursor:
+        for table in (SEARCH_TABLE, SHORT_SEARCH_TABLE):
+            cursor.execute(f'DELETE FROM {table} WHERE rowid = %s', [rowid])
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, title, body, owner, kind, object_id) '
+            'VALUES (%s, %s, %s, %s, %s, %s)',
+            [rowid, title, body, owner, kind, instance.pk],
+        )
+        cursor.execute(
+            f'INSERT INTO {SHORT_SEARCH_TABLE} (rowid, title, body, owner, kind, object_id) '
+            'VALUES (%s, %s, %s, %s, %s, %s)',
+            [rowid, spaced(title), spaced(body), owner, kind, instance.pk],
+        )
+
+
+def remove_object(instance):
+    """
+    删除一条记录的索引
+    """
+    if not uses_fts():
+        return
+    kind = MODEL_KINDS[type(instance)]
+    with connection.cursor() as cursor:
+        for table in (SEARCH_TABLE, SHORT_SEARCH_TABLE):
+            cursor.execute(f'DELETE FROM {table} WHERE rowid = %s', [search_rowid(kind, instance.pk)])
+
+
+def rebuild_search_index(user_ids=None):
+    """
+    从原始表重建索引
+
+    Args:
+        user_ids (list, optional): 只重建这些用户，默认全部
+
+    Returns:
+        int: 索引中的记录数
+    """
+    if not uses_fts():
+        return 0
+    source_filter = ''
+    params = []
+    if user_ids is not None:
+        source_filter = f" WHERE user_id IN ({', '.join(['%s'] * len(user_ids))})"
+        params = list(user_ids)
+
+    count = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        for table in (SEARCH_TABLE, SHORT_SEARCH_TABLE):
+            if user_ids is None:
+                cursor.execute(f'DELETE FROM {table}')
+            elif user_ids:
+                # 按 owner 列匹配，走全文索引而不是逐行比较
+                owners = ' OR '.join(phrase(owner_token(user_id)) for user_id in user_ids)
+                cursor.execute(f'DELETE FROM {table} WHERE {table} MATCH %s', [f'owner : ({owners})'])
+        for index, (kind, (model, title, body)) in enumerate(SOURCES.items()):
+            cursor.execute(
+                f'SELECT id * {len(KINDS)} + {index}, {title}, {body}, user_id, id '
+                f'FROM {model._meta.db_table}{source_filter}',
+                params,
+            )
+            while rows := cursor.fetchmany(REBUILD_BATCH_SIZE):
+                with connection.cursor() as insert_cursor:
+                    insert_cursor.executemany(
+                        f'INSERT INTO {SEARCH_TABLE} (rowid, title, body, owner, kind, object_id) '
+                        'VALUES (%s, %s, %s, %s, %s, %s)',
+                        [(rowid, row_title, row_body, owner_token(user_id), kind, object_id)
+                         for rowid, row_title, row_body, user_id, object_id in rows],
+                    )
+                    insert_cursor.executemany(
+                        f'INSERT INTO {SHORT_SEARCH_TABLE} (rowid, title, body, owner, kind, object_id) '
+                        'VALUES (%s, %s, %s, %s, %s, %s)',
+                        [(rowid, spaced(row_title), spaced(row_body), owner_token(user_id), kind, object_id)
+                         for rowid, row_title, row_body, user_id, object_id in rows],
+                    )
+                count += len(rows)
+    return count
+
+
+def split_terms(query):
+    """
+    把搜索词按空白拆分，去掉空词
+    """
+    return [term for term in query.split() if term]
+
+
+def render_snippet(snippet):
+    """
+    转义片段中的HTML，并把高亮占位符替换为 <mark>
+    """
+    return (
+        html.escape(snippet)
+        .replace(HIGHLIGHT_START, '<mark>')
+        .replace(HIGHLIGHT_END, '</mark>')
+    )
+
+
+def fts_search(user, terms, limit):
+    """
+    FTS5 搜索，每个词按短语匹配，多个词之间为 AND；用户条件也在 MATCH 中，只对该用户的文档排序
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT kind, object_id, title, '
+            f"snippet({SEARCH_TABLE}, -1, %s, %s, '…', 24) "
+            f'FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s '
+            'ORDER BY rank LIMIT %s',
+            [HIGHLIGHT_START, HIGHLIGHT_END, owner_match(user.pk, terms), limit],
+        )
+        return [
+            {'kind': kind, 'id': object_id, 'title': title, 'snippet': render_snippet(snippet)}
+            for kind, object_id, title, snippet in cursor.fetchall()
+        ]
+
+
+def highlight(text, terms, width=24):
+    """
+    在Python中截取第一个匹配词附近的片段并高亮所有匹配词
+    """
+    pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+    found = pattern.search(text)
+    start = max(found.start() - width, 0) if found else 0
+    end = min(start + width * 2 + (found.end() - found.start() if found else 0), len(text))
+    fragment = pattern.sub(lambda m: f'{HIGHLIGHT_START}{m.group(0)}{HIGHLIGHT_END}', text[start:end])
+    return render_snippet(('…' if start else '') + fragment + ('…' if end < len(text) else ''))
+
+
+def short_search(user, terms, limit):
+    """
+    短词搜索（trigram 无法匹配少于3个字符的词）：在逐字分词的索引中把每个词按相邻字的短语匹配
+
+    索引中的文本是逐字分隔的，片段改为取出原记录后在Python中截取和高亮。
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT kind, object_id FROM {SHORT_SEARCH_TABLE} WHERE {SHORT_SEARCH_TABLE} MATCH %s '
+            'ORDER BY rank LIMIT %s',
+            [owner_match(user.pk, [spaced(term) for term in terms]), limit],
+        )
+        matches = cursor.fetchall()
+
+    instances = {}
+    for kind, (model, _, _) in SOURCES.items():
+        object_ids = [object_id for match_kind, object_id in matches if match_kind == kind]
+        if object_ids:
+            instances[kind] = model.objects.filter(user=user).in_bulk(object_ids)
+    results = []
+    for kind, object_id in matches:
+        instance = instances[kind].get(object_id)
+        if instance is None:
+            continue
+        _, title, body = document_of(instance)
+        results.append({
+            'kind': kind,
+            'id': object_id,
+            'title': title,
+            'snippet': highlight(f'{title} {body}', terms),
+        })
+    return results
+
+
+def postgres_search(user, query, limit):
+    """
+    PostgreSQL 搜索，表达式与迁移中的GIN索引一致，按 ts_rank 合并排序
+    """
+    results = []
+    with connection.cursor() as cursor:
+        for kind, (model, title, body) in SOURCES.items():
+            document = POSTGRES_DOCUMENTS[kind]
+            cursor.execute(
+                f'SELECT id, {title}, '
+                f"ts_headline('simple', {document}, query, %s), "
+                f"ts_rank(to_tsvector('simple', {document}), query) AS score "
+                f"FROM {model._meta.db_table}, plainto_tsquery('simple', %s) query "
+                f"WHERE user_id = %s AND to_tsvector('simple', {document}) @@ query "
+                'ORDER BY score DESC LIMIT %s',
+                [f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxFragments=1',
+                 query, user.pk, limit],
+            )
+            for object_id, object_title, snippet, score in cursor.fetchall():
+                results.append((score, {
+                    'kind': kind,
+                    'id': object_id,
+                    'title': object_title,
+                    'snippet': render_snippet(snippet),
+                }))
+    results.sort(key=lambda item: item[0], reverse=True)
+    return [result for _, result in results[:limit]]
+
+
+def search(user, query, limit=DEFAULT_LIMIT):
+    """
+    搜索用户的任务、事件和日总结
+
+    Args:
+        user: 当前用户
+        query (str): 搜索词，多个词以空白分隔
+        limit (int): 最多返回的结果数
+
+    Returns:
+        list: 按相关度排序的结果，每项包含 kind、id、title 和已转义的高亮片段 snippet
+    """
+    terms = split_terms(query)
+    if not terms:
+        return []
+    if not uses_fts():
+        return postgres_search(user, ' '.join(terms), limit)
+    if min(len(term) for term in terms) < MIN_TERM_LENGTH:
+        return short_search(user, terms, limit)
+    return fts_search(user, terms, limit)
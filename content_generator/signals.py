@@ -1,10 +1,20 @@
 """
 内容生成器信号处理器
 """
-from django.db.models.signals import post_save
+from django.db.models.signals import post_init, pre_save, post_save, post_delete
+from django.db import transaction
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import DailySummary
+from django.utils import timezone
+from .models import Task, Event, DailySummary
+from . import blobs, images, search, stats
+from .typeahead import get_typeahead_index
+
+# 相似回忆的向量索引依赖 NumPy，未安装时不维护，事件的保存不受影响
+try:
+    from . import similar
+except ImportError:
+    similar = None
 
 # 创建用户时自动创建日总结记录
 @receiver(post_save, sender=User)
@@ -14,4 +24,171 @@ def create_daily_summary(sender, instance, created, **kwargs):
     """
     if created:
         # 这里可以添加一些初始化逻辑
-        pass
\ No newline at end of file
+        pass
+
+# 保存前维护完成时间
+@receiver(pre_save, sender=Task)
+def set_completed_at(sender, instance, raw=False, **kwargs):
+    """
+    任务标记完成时记录完成时间，取消完成时清空
+    """
+    if raw:
+        return
+    if not instance.completed:
+        instance.completed_at = None
+    elif instance.completed_at is None:
+        instance.completed_at = timezone.now()
+
+# 记录从数据库加载时的计数字段，用于保存时计算增量
+@receiver(post_init, sender=Task)
+@receiver(post_init, sender=Event)
+@receiver(post_init, sender=DailySummary)
+def remember_stats_state(sender, instance, **kwargs):
+    """
+    实例初始化后记录参与统计的字段值
+    """
+    instance._stats_state = stats.snapshot(instance) if instance.pk else None
+
+# 保存后增量更新用户统计
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=DailySummary)
+def update_stats_on_save(sender, instance, created, raw=False, **kwargs):
+    """
+    任务、事件或日总结保存后更新 UserStats 和 DailyRollup
+    """
+    if raw:
+        return
+    new_state = stats.snapshot(instance)
+    old_state = None if created else getattr(instance, '_stats_state', None)
+    if new_state is None or (not created and old_state is None):
+        # 无法确定变更前的状态，直接重建
+        stats.rebuild_user_stats(instance.user_id)
+        if sender is not DailySummary:
+            stats.rebuild_daily_rollups([instance.user_id], instance.created_date, instance.created_date)
+    else:
+        stats.record_change(sender, old_state, new_state)
+    instance._stats_state = new_state
+
+# 删除后增量更新用户统计
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=DailySummary)
+def update_stats_on_delete(sender, instance, **kwargs):
+    """
+    任务、事件或日总结删除后更新 UserStats 和 DailyRollup
+    """
+    old_state = getattr(instance, '_stats_state', None) or stats.snapshot(instance)
+    if old_state is not None:
+        stats.record_change(sender, old_state, None)
+
+
+# 保存/删除后同步全文搜索索引
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=DailySummary)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    """
+    任务、事件或日总结保存后更新搜索索引
+    """
+    if raw:
+        return
+    search.index_object(instance)
+
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=DailySummary)
+def remove_from_search_index(sender, instance, **kwargs):
+    """
+    任务、事件或日总结删除后移除搜索索引
+    """
+    search.remove_object(instance)
+
+# 保存/删除后更新进程内的标题联想索引
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=Event)
+def update_typeahead_index(sender, instance, raw=False, **kwargs):
+    """
+    任务或事件保存后更新标题联想索引
+    """
+    if raw:
+        return
+    get_typeahead_index().update(instance)
+
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Event)
+def remove_from_typeahead_index(sender, instance, **kwargs):
+    """
+    任务或事件删除后移除标题联想
+    """
+    get_typeahead_index().remove(instance)
+
+# 事件保存/删除后更新相似回忆的向量
+@receiver(post_save, sender=Event)
+def update_event_vectors(sender, instance, raw=False, **kwargs):
+    """
+    事件保存后追加新向量
+    """
+    if raw or similar is None:
+        return
+    similar.index_event(instance)
+
+@receiver(post_delete, sender=Event)
+def remove_event_vectors(sender, instance, **kwargs):
+    """
+    事件删除后标记向量为删除
+    """
+    if similar is not None:
+        similar.remove_event(instance)
+
+# 维护事件图片文件的引用数
+def stored_image_name(instance):
+    """
+    实例上图片字段的文件名；字段被延迟加载时返回 None，不触发查询
+    """
+    if 'image' not in instance.__dict__:
+        return None
+    value = instance.__dict__['image']
+    return getattr(value, 'name', value) or ''
+
+@receiver(post_init, sender=Event)
+def remember_image_name(sender, instance, **kwargs):
+    """
+    记录从数据库加载时的图片文件名
+    """
+    instance._image_name = stored_image_name(instance) if instance.pk else ''
+
+@receiver(post_save, sender=Event)
+def update_image_refs(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    事件的图片变化后调整新旧文件的引用数
+    """
+    if raw or (update_fields is not None and 'image' not in update_fields):
+        return
+    new_name = stored_image_name(instance)
+    old_name = getattr(instance, '_image_name', None)
+    if new_name is None or old_name is None:
+        # 图片字段没有加载，保存时不会修改它
+        return
+    blobs.image_changed(old_name, new_name)
+    instance._image_name = new_name
+
+@receiver(post_delete, sender=Event)
+def release_image_refs(sender, instance, **kwargs):
+    """
+    事件删除后释放图片文件的引用
+    """
+    name = stored_image_name(instance)
+    if name:
+        blobs.change_refs(name, -1)
+
+# 事件图片变化后在后台生成缩略图
+@receiver(post_save, sender=Event)
+def schedule_image_variants(sender, instance, raw=False, **kwargs):
+    """
+    事务提交后把缩略图生成任务交给线程池
+    """
+    if raw or not images.needs_variants(instance):
+        return
+    event_id, source_name = instance.pk, instance.image.name
+    transaction.on_commit(lambda: images.get_variant_pool().submit(event_id, source_name))
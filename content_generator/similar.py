@@ -0,0 +1,401 @@
+"""
+相似回忆
+
+事件的标题和正文经嵌入器转换为单位长度的 float32 向量，按用户存放在
+EVENT_VECTORS_DIR 下的一个定长记录文件中（每条记录为事件ID + 向量），
+查询时以 numpy.memmap 映射整个文件，一次矩阵乘法算出余弦相似度，再取 top-k。
+
+- 文件在第一次查询某用户时从数据库全量构建；
+- 事件保存时追加一条新记录，并把该事件的旧记录标记为删除（ID 置为 -1），
+  事件删除时同样只做标记；
+- 已删除记录超过有效记录数时自动压缩（重写文件），
+  也可以通过 compact_event_vectors 命令定期压缩或重建。
+
+嵌入器由 settings.EVENT_EMBEDDER 配置，默认是无需外部服务的特征哈希嵌入器：
+
+    EVENT_EMBEDDER = {
+        'BACKEND': 'content_generator.similar.HashingEmbedder',
+        'OPTIONS': {'dim': 512},
+    }
+
+文件名中带有嵌入器签名，更换嵌入器或维度后会自动构建新文件。
+写入前对同目录下该用户的 .lock 文件加 fcntl.flock 排他锁，多个进程（如 gunicorn 的各个 worker）
+不会同时修改同一用户的文件；没有 fcntl 的平台退化为进程内锁。
+追加写到一半中断时文件末尾会留下不完整的记录，读取时忽略，下次追加前截掉。
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import unicodedata
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+import numpy as np
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .models import Event
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDER = {'BACKEND': 'content_generator.similar.HashingEmbedder', 'OPTIONS': {}}
+
+DEFAULT_K = 5
+MAX_K = 20
+
+# 构建文件时每批嵌入的事件数
+BUILD_BATCH_SIZE = 256
+
+# 已删除记录少于这个数时不压缩
+COMPACT_MIN_DEAD = 64
+
+_WORD_RE = re.compile(r'[a-z0-9]+')
+_SPACE_RE = re.compile(r'\s+')
+
+
+class BaseEmbedder:
+    """
+    嵌入器基类，子类实现 embed()
+    """
+
+    dim = None
+
+    def embed(self, texts):
+        """
+        把文本转换为向量
+
+        Args:
+            texts (list): 文本列表
+
+        Returns:
+            numpy.ndarray: 形状为 (len(texts), dim) 的 float32 矩阵，每行长度为1（空文本为0向量）
+        """
+        raise NotImplementedError
+
+    def signature(self):
+        """
+        嵌入器签名，不同嵌入器或参数生成的向量不能混用
+        """
+        return f'{type(self).__module__}.{type(self).__qualname__}:{self.dim}'
+
+
+class HashingEmbedder(BaseEmbedder):
+    """
+    特征哈希嵌入器（离线、无需训练）
+
+    特征为字符 n-gram（中文无需分词）和英文/数字单词，
+    通过 CRC32 哈希到 dim 个桶并带符号累加，词频取 log(1 + tf) 抑制高频特征。
+    """
+
+    def __init__(self, dim=512, ngram_range=(1, 2)):
+        self.dim = dim
+        self.ngram_range = tuple(ngram_range)
+
+    def signature(self):
+        return f'{super().signature()}:{self.ngram_range[0]}-{self.ngram_range[1]}'
+
+    def features(self, text):
+        """
+        提取文本特征
+        """
+        text = _SPACE_RE.sub(' ', unicodedata.normalize('NFKC', text).casefold()).strip()
+        features = Counter(_WORD_RE.findall(text))
+        chars = text.replace(' ', '')
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            features.update(chars[i:i + n] for i in range(len(chars) - n + 1))
+        return features
+
+    def embed(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            features = self.features(text)
+            if not features:
+                continue
+            hashes = np.fromiter(
+                (zlib.crc32(feature.encode('utf-8')) for feature in features),
+                dtype=np.uint32, count=len(features),
+            )
+            weights = np.log1p(np.fromiter(features.values(), dtype=np.float32, count=len(features)))
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(matrix[row], hashes % self.dim, signs * weights)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms > 0, norms, 1)
+
+
+def event_text(title, content):
+    """
+    参与嵌入的事件文本
+    """
+    return f'{title}\n{content}'
+
+
+class VectorStore:
+    """
+    按用户存放事件向量的记录文件
+
+    Args:
+        directory: 存放文件的目录
+        embedder (BaseEmbedder): 嵌入器
+    """
+
+    def __init__(self, directory, embedder):
+        self.directory = Path(directory)
+        self.embedder = embedder
+        self.dtype = np.dtype([('id', '<i8'), ('vector', '<f4', (embedder.dim,))])
+        self.signature = hashlib.sha1(embedder.signature().encode('utf-8')).hexdigest()[:12]
+        self._lock = threading.Lock()
+
+    def path(self, user_id):
+        """
+        用户的向量文件路径
+        """
+        return self.directory / f'{user_id}.{self.signature}.vec'
+
+    @contextmanager
+    def lock(self, user_id):
+        """
+        修改用户的向量文件期间持有的跨进程排他锁
+        """
+        if fcntl is None:
+            with self._lock:
+                yield
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.path(user_id).with_suffix('.lock'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def records(self, user_id, mode='r'):
+        """
+        以 memmap 映射用户的全部完整记录，忽略末尾不完整的记录，文件为空时返回空数组
+        """
+        path = self.path(user_id)
+        count = path.stat().st_size // self.dtype.itemsize
+        if not count:
+            return np.zeros(0, dtype=self.dtype)
+        return np.memmap(path, dtype=self.dtype, mode=mode, shape=(count,))
+
+    def truncate_partial(self, user_id):
+        """
+        截掉末尾中断的追加留下的不完整记录，新记录才能对齐（调用方持有锁）
+        """
+        path = self.path(user_id)
+        size = path.stat().st_size
+        if size % self.dtype.itemsize:
+            logger.warning(f"向量文件 {path} 末尾有不完整的记录，已截掉")
+            os.truncate(path, size - size % self.dtype.itemsize)
+
+    def write(self, user_id, records):
+        """
+        先写临时文件再替换，读者看到的总是完整的文件
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path(user_id)
+        tmp_path = path.with_suffix(f'.tmp{os.getpid()}')
+        with open(tmp_path, 'wb') as f:
+            records.tofile(f)
+        os.replace(tmp_path, path)
+
+    def build(self, user_id):
+        """
+        从数据库全量构建用户的向量文件
+
+        Returns:
+            int: 记录数
+        """
+        chunks = []
+        rows = Event.objects.filter(user_id=user_id).order_by('pk').values_list('pk', 'title', 'content')
+        batch = []
+        for row in rows.iterator(chunk_size=BUILD_BATCH_SIZE):
+            batch.append(row)
+            if len(batch) == BUILD_BATCH_SIZE:
+                chunks.append(self.encode(batch))
+                batch = []
+        if batch:
+            chunks.append(self.encode(batch))
+        records = np.concatenate(chunks) if chunks else np.zeros(0, dtype=self.dtype)
+        with self.lock(user_id):
+            self.write(user_id, records)
+        return len(records)
+
+    def encode(self, rows):
+        """
+        把 (ID, 标题, 正文) 列表转换为记录数组
+        """
+        records = np.zeros(len(rows), dtype=self.dtype)
+        records['id'] = [pk for pk, _, _ in rows]
+        records['vector'] = self.embedder.embed([event_text(title, content) for _, title, content in rows])
+        return records
+
+    def add(self, event):
+        """
+        事件保存后追加新向量，并标记该事件的旧记录为删除
+
+        用户的文件还不存在时什么也不做，第一次查询时会全量构建。
+        """
+        if not self.path(event.user_id).exists():
+            return
+        record = self.encode([(event.pk, event.title, event.content)])
+        with self.lock(event.user_id):
+            self.truncate_partial(event.user_id)
+            self.tombstone(event.user_id, event.pk)
+            with open(self.path(event.user_id), 'ab') as f:
+                record.tofile(f)
+            self.compact_if_needed(event.user_id)
+
+    def remove(self, user_id, event_id):
+        """
+        事件删除后标记其记录为删除
+        """
+        if not self.path(user_id).exists():
+            return
+        with self.lock(user_id):
+            self.tombstone(user_id, event_id)
+            self.compact_if_needed(user_id)
+
+    def tombstone(self, user_id, event_id):
+        """
+        把事件的现有记录标记为删除（调用方持有锁）
+        """
+        records = self.records(user_id, mode='r+')
+        rows = np.flatnonzero(records['id'] == event_id)
+        if len(rows):
+            records['id'][rows] = -1
+            records.flush()
+
+    def compact_if_needed(self, user_id):
+        """
+        已删除记录多于有效记录时压缩（调用方持有锁）
+        """
+        ids = self.records(user_id)['id']
+        dead = int(np.count_nonzero(ids < 0))
+        if dead >= COMPACT_MIN_DEAD and dead > len(ids) - dead:
+            self.compact_locked(user_id)
+
+    def compact_locked(self, user_id):
+        """
+        去掉已删除的记录并重写文件（调用方持有锁）
+
+        Returns:
+            int: 去掉的记录数
+        """
+        records = self.records(user_id)
+        live = records[records['id'] >= 0]
+        removed = len(records) - len(live)
+        if removed:
+            self.write(user_id, np.array(live))
+        return removed
+
+    def compact(self, user_id):
+        """
+        压缩用户的向量文件，文件不存在时返回0
+        """
+        if not self.path(user_id).exists():
+            return 0
+        with self.lock(user_id):
+            return self.compact_locked(user_id)
+
+    def similar(self, event, k=DEFAULT_K):
+        """
+        查找与事件最相似的其他事件
+
+        Returns:
+            list: (事件ID, 余弦相似度) 列表，按相似度从高到低
+        """
+        if not self.path(event.user_id).exists():
+            self.build(event.user_id)
+        records = self.records(event.user_id)
+        if not len(records):
+            return []
+        ids = np.asarray(records['id'])
+        vectors = records['vector']
+
+        own_rows = np.flatnonzero(ids == event.pk)
+        if len(own_rows):
+            query = np.asarray(vectors[own_rows[-1]])
+        else:
+            query = self.embedder.embed([event_text(event.title, event.content)])[0]
+
+        scores = vectors @ query
+        scores[(ids < 0) | (ids == event.pk)] = -np.inf
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[row]), float(scores[row])) for row in top if np.isfinite(scores[row]) and scores[row] > 0]
+
+
+def similar_events(event, k=DEFAULT_K):
+    """
+    查找相似回忆
+
+    Returns:
+        list: (事件, 相似度) 列表，按相似度从高到低
+    """
+    matches = get_vector_store().similar(event, k)
+    events = Event.objects.in_bulk([event_id for event_id, _ in matches])
+    return [(events[event_id], score) for event_id, score in matches if event_id in events]
+
+
+def index_event(event):
+    """
+    事件保存后更新向量，写文件失败或文件损坏只记录日志
+    """
+    try:
+        get_vector_store().add(event)
+    except (OSError, ValueError) as e:
+        logger.error(f"更新事件 {event.pk} 的向量失败: {str(e)}")
+
+
+def remove_event(event):
+    """
+    事件删除后移除向量，写文件失败或文件损坏只记录日志
+    """
+    try:
+        get_vector_store().remove(event.user_id, event.pk)
+    except (OSError, ValueError) as e:
+        logger.error(f"移除事件 {event.pk} 的向量失败: {str(e)}")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_vector_store():
+    """
+    按 settings.EVENT_EMBEDDER 和 EVENT_VECTORS_DIR 创建并返回进程内共享的向量存储
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                config = getattr(settings, 'EVENT_EMBEDDER', None) or DEFAULT_EMBEDDER
+                embedder = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+                directory = getattr(settings, 'EVENT_VECTORS_DIR', None) or Path(settings.BASE_DIR) / 'vectors'
+                _store = VectorStore(directory, embedder)
+    return _store
+
+
+@receiver(setting_changed)
+def reset_vector_store(setting, **kwargs):
+    """
+    EVENT_EMBEDDER 或 EVENT_VECTORS_DIR 变化时丢弃向量存储
+    """
+    global _store
+    if setting in ('EVENT_EMBEDDER', 'EVENT_VECTORS_DIR'):
+        with _store_lock:
+            _store = None
@@ -0,0 +1,567 @@
+"""
+统计服务模块
+
+页面上的各项计数集中在这里计算，视图只负责把结果放进模板上下文。
+与时间无关的计数物化在 UserStats 中，由信号增量维护，读取时只需一次主键查询；
+按日期的计数物化在 DailyRollup（每个用户每天一行）中，同样由信号增量维护，
+今日/本周/本月等按日期范围的统计只需汇总几十行；逾期等与当前时间相关的计数仍按需查询。
+"""
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Task, Event, DailySummary, DailyRollup, UserStats
+
+# 连续记录天数的缓存键与有效期（键中的版本由日总结表计算，其他进程写入后自动换键）
+STREAK_CACHE_KEY = 'summary_streaks:{user_id}:{version}:{date}'
+STREAK_CACHE_TIMEOUT = 24 * 60 * 60
+
+# 各模型参与计数的字段，用于在保存/删除时计算增量
+TRACKED_FIELDS = {
+    Task: ('user_id', 'created_date', 'priority', 'willingness', 'completed'),
+    Event: ('user_id', 'created_date', 'mood', 'image'),
+    DailySummary: ('user_id',),
+}
+
+
+def _percent(part, whole):
+    """
+    计算百分比并四舍五入为整数，分母为0时返回0
+    """
+    return round(part / whole * 100) if whole > 0 else 0
+
+
+def snapshot(instance):
+    """
+    记录实例中参与计数的字段值
+
+    只读取已加载到实例中的值，不会触发延迟字段的查询；
+    如果有字段被延迟加载则返回None，调用方应退回到全量重建。
+    """
+    state = {}
+    for field in TRACKED_FIELDS[type(instance)]:
+        if field not in instance.__dict__:
+            return None
+        value = instance.__dict__[field]
+        if field == 'image':
+            value = bool(getattr(value, 'name', value))
+        state[field] = value
+    return state
+
+
+def counter_contributions(model, state):
+    """
+    计算一条记录对 UserStats 各计数字段的贡献
+
+    Args:
+        model: Task、Event 或 DailySummary
+        state (dict): snapshot() 返回的字段值
+
+    Returns:
+        dict: 计数字段名到贡献值的映射
+    """
+    if model is Task:
+        return {
+            'total_tasks': 1,
+            'completed_tasks': int(bool(state['completed'])),
+            f"{state['priority']}_priority_tasks": 1,
+        }
+    if model is Event:
+        return {
+            'total_events': 1,
+            'events_with_images': int(bool(state['image'])),
+            'happy_events': int(state['mood'] == '😄'),
+        }
+    return {'total_summaries': 1}
+
+
+def rollup_contributions(model, state):
+    """
+    计算一条记录对其创建日期 DailyRollup 各计数字段的贡献
+
+    Returns:
+        dict: 计数字段名到贡献值的映射，日总结不参与每日汇总
+    """
+    if model is Task:
+        contributions = {
+            'tasks_created': 1,
+            'tasks_completed': int(bool(state['completed'])),
+            f"tasks_{state['priority']}": 1,
+        }
+        willingness_field = DailyRollup.WILLINGNESS_FIELDS.get(state['willingness'])
+        if willingness_field:
+            contributions[willingness_field] = 1
+        return contributions
+    if model is Event:
+        contributions = {
+            'events_created': 1,
+            'events_with_images': int(bool(state['image'])),
+        }
+        mood_field = DailyRollup.MOOD_FIELDS.get(state['mood'])
+        if mood_field:
+            contributions[mood_field] = 1
+        return contributions
+    return {}
+
+
+def apply_rollup_delta(user_id, day, delta):
+    """
+    把增量应用到用户某天的汇总行，行不存在时新建
+    """
+    valid_fields = {field.attname for field in DailyRollup._meta.concrete_fields}
+    delta = {field: value for field, value in delta.items() if value and field in valid_fields}
+    if not delta:
+        return
+    now = timezone.now()
+    rollups = DailyRollup.objects.filter(user_id=user_id, date=day)
+    updates = {field: F(field) + value for field, value in delta.items()}
+    if rollups.update(updated_at=now, **updates):
+        return
+
+    # 当天还没有汇总行（只有新增才需要建行）
+    initial = {field: value for field, value in delta.items() if value > 0}
+    if not initial:
+        return
+    try:
+        with transaction.atomic():
+            DailyRollup.objects.create(user_id=user_id, date=day, updated_at=now, **initial)
+    except IntegrityError:
+        # 并发请求已经建好了这一行
+        rollups.update(updated_at=now, **updates)
+
+
+def apply_stats_delta(user_id, delta):
+    """
+    以原子的 F() 表达式把增量应用到用户统计行
+
+    统计行尚不存在时不做任何事，首次读取时会全量重建。
+    """
+    valid_fields = {field.attname for field in UserStats._meta.concrete_fields}
+    updates = {
+        field: F(field) + value
+        for field, value in delta.items()
+        if value and field in valid_fields
+    }
+    if updates:
+        UserStats.objects.filter(user_id=user_id).update(**updates)
+
+
+def record_change(model, old_state, new_state):
+    """
+    根据变更前后的状态更新统计
+
+    Args:
+        model: 发生变更的模型
+        old_state (dict | None): 变更前的状态，新建时为None
+        new_state (dict | None): 变更后的状态，删除时为None
+    """
+    deltas = {}
+    rollup_deltas = {}
+    for state, sign in ((old_state, -1), (new_state, 1)):
+        if state is None:
+            continue
+        user_delta = deltas.setdefault(state['user_id'], {})
+        for field, value in counter_contributions(model, state).items():
+            user_delta[field] = user_delta.get(field, 0) + sign * value
+        contributions = rollup_contributions(model, state)
+        if contributions:
+            day_delta = rollup_deltas.setdefault((state['user_id'], state['created_date']), {})
+            for field, value in contributions.items():
+                day_delta[field] = day_delta.get(field, 0) + sign * value
+    for user_id, delta in deltas.items():
+        apply_stats_delta(user_id, delta)
+    for (user_id, day), delta in rollup_deltas.items():
+        apply_rollup_delta(user_id, day, delta)
+
+
+def compute_user_stats(user):
+    """
+    从原始数据全量计算用户统计
+
+    Args:
+        user: 用户对象或用户ID
+
+    Returns:
+        dict: UserStats 各计数字段的值
+    """
+    user_id = getattr(user, 'pk', user)
+    task_counts = Task.objects.filter(user_id=user_id).aggregate(
+        total_tasks=Count('id'),
+        completed_tasks=Count('id', filter=Q(completed=True)),
+        high_priority_tasks=Count('id', filter=Q(priority='high')),
+        medium_priority_tasks=Count('id', filter=Q(priority='medium')),
+        low_priority_tasks=Count('id', filter=Q(priority='low')),
+    )
+    event_counts = Event.objects.filter(user_id=user_id).aggregate(
+        total_events=Count('id'),
+        events_with_images=Count('id', filter=Q(image__isnull=False) & ~Q(image='')),
+        happy_events=Count('id', filter=Q(mood='😄')),
+    )
+    total_summaries = DailySummary.objects.filter(user_id=user_id).count()
+    return {**task_counts, **event_counts, 'total_summaries': total_summaries}
+
+
+def rebuild_user_stats(user):
+    """
+    全量重建用户统计行
+
+    Args:
+        user: 用户对象或用户ID
+    """
+    stats, _ = UserStats.objects.update_or_create(
+        user_id=getattr(user, 'pk', user),
+        defaults=compute_user_stats(user),
+    )
+    return stats
+
+
+def compute_daily_rollups(user_ids, since=None, until=None):
+    """
+    从原始数据计算多个用户的每日汇总
+
+    任务和事件各一次按 (用户, 创建日期) 分组的聚合查询。
+
+    Args:
+        user_ids (list): 用户ID列表
+        since (date, optional): 起始日期（含）
+        until (date, optional): 结束日期（含）
+
+    Returns:
+        dict: (用户ID, 日期) -> 计数字段字典
+    """
+    date_filter = Q()
+    if since is not None:
+        date_filter &= Q(created_date__gte=since)
+    if until is not None:
+        date_filter &= Q(created_date__lte=until)
+
+    # 注解名使用 n_ 前缀，避免与 completed 等字段同名
+    task_counts = {
+        'n_tasks_created': Count('id'),
+        'n_tasks_completed': Count('id', filter=Q(completed=True)),
+        **{f'n_tasks_{priority}': Count('id', filter=Q(priority=priority)) for priority, _ in Task.PRIORITY_CHOICES},
+        **{f'n_{field}': Count('id', filter=Q(willingness=value)) for value, field in DailyRollup.WILLINGNESS_FIELDS.items()},
+    }
+    event_counts = {
+        'n_events_created': Count('id'),
+        'n_events_with_images': Count('id', filter=Q(image__isnull=False) & ~Q(image='')),
+        **{f'n_{field}': Count('id', filter=Q(mood=value)) for value, field in DailyRollup.MOOD_FIELDS.items()},
+    }
+
+    rollups = {}
+    for model, counts in ((Task, task_counts), (Event, event_counts)):
+        rows = (
+            model.objects.filter(date_filter, user_id__in=user_ids)
+            .values('user_id', 'created_date')
+            .annotate(**counts)
+            .order_by()
+        )
+        for row in rows:
+            rollup = rollups.setdefault((row['user_id'], row['created_date']), {})
+            for name in counts:
+                rollup[name[2:]] = row[name]
+    return rollups
+
+
+def rebuild_daily_rollups(user_ids, since=None, until=None):
+    """
+    全量重建多个用户在日期范围内的每日汇总行
+
+    锁住这些用户并先删除旧的汇总行，再在同一事务中读取原始数据并写入：
+    删除会锁住旧行（SQLite 上取得数据库写锁），期间到达的信号增量要等提交后才能写入，
+    随即应用到新行上，不会落在删除和重建之间被丢掉。
+
+    Returns:
+        int: 写入的汇总行数
+    """
+    existing = DailyRollup.objects.filter(user_id__in=user_ids)
+    if since is not None:
+        existing = existing.filter(date__gte=since)
+    if until is not None:
+        existing = existing.filter(date__lte=until)
+    with transaction.atomic():
+        list(User.objects.select_for_update().filter(pk__in=user_ids).values_list('pk', flat=True))
+        existing.delete()
+        rollups = compute_daily_rollups(user_ids, since, until)
+        now = timezone.now()
+        DailyRollup.objects.bulk_create([
+            DailyRollup(user_id=user_id, date=day, updated_at=now, **counts)
+            for (user_id, day), counts in rollups.items()
+        ])
+    return len(rollups)
+
+
+def get_user_stats(user):
+    """
+    获取用户统计行，不存在时全量重建
+    """
+    try:
+        return UserStats.objects.get(user=user)
+    except UserStats.DoesNotExist:
+        return rebuild_user_stats(user)
+
+
+def get_task_stats(user, now=None):
+    """
+    获取用户的任务统计信息
+
+    总数、已完成和三个优先级的计数来自 UserStats，逾期数依赖当前时间，
+    单独做一次计数查询；百分比在内存中计算。
+
+    Args:
+        user: 当前用户
+        now (datetime, optional): 判断逾期的参考时间，默认为当前时间
+
+    Returns:
+        dict: 可直接合并进模板上下文的统计数据
+    """
+    if now is None:
+        now = timezone.now()
+
+    stats = get_user_stats(user)
+    overdue_tasks = Task.objects.filter(user=user, completed=False, due_date__lt=now).count()
+
+    total_tasks = stats.total_tasks
+    completed_tasks = stats.completed_tasks
+    high = stats.high_priority_tasks
+    medium = stats.medium_priority_tasks
+    low = stats.low_priority_tasks
+
+    # 图表百分比以最大值为100%
+    max_count = max(high, medium, low)
+
+    return {
+        'total_tasks': total_tasks,
+        'completed_tasks': completed_tasks,
+        'pending_tasks': total_tasks - completed_tasks,
+        'overdue_tasks': overdue_tasks,
+        'completion_rate': _percent(completed_tasks, total_tasks),
+        'high_priority_count': high,
+        'medium_priority_count': medium,
+        'low_priority_count': low,
+        'high_priority_percent': _percent(high, max_count),
+        'medium_priority_percent': _percent(medium, max_count),
+        'low_priority_percent': _percent(low, max_count),
+    }
+
+
+def get_event_stats(user, today):
+    """
+    获取用户的事件统计信息
+
+    总数、带图片和开心事件来自 UserStats，今日/本周/本月汇总自 DailyRollup。
+
+    Args:
+        user: 当前用户
+        today (date): TIME_ZONE 下的当前日期
+
+    Returns:
+        dict: 可直接合并进模板上下文的统计数据
+    """
+    stats = get_user_stats(user)
+    week_start = today - timedelta(days=today.weekday())
+    month_start = today.replace(day=1)
+
+    recent = DailyRollup.objects.filter(
+        user=user,
+        date__gte=min(week_start, month_start),
+    ).aggregate(
+        today_events=Coalesce(Sum('events_created', filter=Q(date=today)), 0),
+        this_week_events=Coalesce(Sum('events_created', filter=Q(date__gte=week_start)), 0),
+        this_month_events=Coalesce(Sum('events_created', filter=Q(date__gte=month_start)), 0),
+    )
+
+    return {
+        'total_events': stats.total_events,
+        'events_with_images': stats.events_with_images,
+        'happy_events': stats.happy_events,
+        **recent,
+    }
+
+
+def mood_calendar_version(user, start, end):
+    """
+    日期范围内每日汇总的版本，用作心情日历的 ETag
+
+    行数和最后更新时间任一变化都会改变版本；一次聚合查询，不读取汇总行本身。
+    """
+    version = DailyRollup.objects.filter(user=user, date__gte=start, date__lte=end).aggregate(
+        rows=Count('id'),
+        updated_at=Max('updated_at'),
+    )
+    updated_at = version['updated_at'].timestamp() if version['updated_at'] else 0
+    return f"{user.pk}-{start.isoformat()}-{end.isoformat()}-{version['rows']}-{updated_at:.6f}"
+
+
+def get_mood_calendar(user, start, end):
+    """
+    获取日期范围内每天的心情分布，用于日历热力图和心情时间线
+
+    数据来自每日汇总，只返回有事件的日期。
+
+    Returns:
+        dict: moods 为心情列表，days 为 日期 -> 与 moods 顺序对应的计数列表
+    """
+    fields = list(DailyRollup.MOOD_FIELDS.values())
+    rows = (
+        DailyRollup.objects.filter(user=user, date__gte=start, date__lte=end, events_created__gt=0)
+        .order_by('date')
+        .values_list('date', *fields)
+    )
+    labels = dict(Event.MOOD_CHOICES)
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'moods': [{'value': mood, 'label': labels[mood]} for mood in DailyRollup.MOOD_FIELDS],
+        'days': {row[0].isoformat(): list(row[1:]) for row in rows},
+    }
+
+
+def get_summary_stats(user, today):
+    """
+    获取用户的日总结统计信息
+
+    总数来自 UserStats，本周/本月通过一次条件聚合得到。
+
+    Args:
+        user: 当前用户
+        today (date): TIME_ZONE 下的当前日期
+
+    Returns:
+        dict: 可直接合并进模板上下文的统计数据
+    """
+    stats = get_user_stats(user)
+    week_start = today - timedelta(days=today.weekday())
+    month_start = today.replace(day=1)
+
+    recent = DailySummary.objects.filter(
+        user=user,
+        date__gte=min(week_start, month_start),
+    ).aggregate(
+        this_week_summaries=Count('id', filter=Q(date__gte=week_start)),
+        this_month_summaries=Count('id', filter=Q(date__gte=month_start)),
+    )
+
+    return {
+        'total_summaries': stats.total_summaries,
+        **recent,
+    }
+
+
+# 没有任务时的日任务计数
+EMPTY_DAILY_COUNTS = {'total': 0, 'completed': 0, 'high_total': 0, 'high_completed': 0}
+
+
+def get_daily_task_counts(user_ids, day):
+    """
+    通过一次分组聚合获取多个用户某天创建的任务计数
+
+    Args:
+        user_ids (list): 用户ID列表
+        day (date): TIME_ZONE 下的日期
+
+    Returns:
+        dict: 用户ID -> {'total', 'completed', 'high_total', 'high_completed'}，
+              没有任务的用户计数为0
+    """
+    counts = {user_id: dict(EMPTY_DAILY_COUNTS) for user_id in user_ids}
+    # 注解名不能与字段同名（如 completed），否则过滤条件会引用到注解本身
+    rows = Task.objects.filter(user_id__in=user_ids, created_date=day).values('user_id').annotate(
+        total_count=Count('id'),
+        completed_count=Count('id', filter=Q(completed=True)),
+        high_count=Count('id', filter=Q(priority='high')),
+        high_completed_count=Count('id', filter=Q(priority='high', completed=True)),
+    ).order_by()
+    for row in rows:
+        counts[row['user_id']] = {
+            'total': row['total_count'],
+            'completed': row['completed_count'],
+            'high_total': row['high_count'],
+            'high_completed': row['high_completed_count'],
+        }
+    return counts
+
+
+def compute_streaks(dates):
+    """
+    一次扫描按日期倒序排列的日期序列，通过相邻日期的间隔计算连续天数
+
+    Args:
+        dates: 倒序排列、不重复的日期序列
+
+    Returns:
+        dict: latest_date 最近一条记录的日期，latest_streak 以该日期结尾的连续天数，
+              longest_streak 历史最长连续天数
+    """
+    latest_streak = 0
+    longest_streak = 0
+    run = 0
+    in_latest_run = True
+    previous = None
+    for current in dates:
+        if previous is not None and previous - current == timedelta(days=1):
+            run += 1
+        else:
+            if previous is not None:
+                in_latest_run = False
+            run = 1
+        if in_latest_run:
+            latest_streak = run
+        longest_streak = max(longest_streak, run)
+        previous = current
+    return {
+        'latest_date': dates[0] if dates else None,
+        'latest_streak': latest_streak,
+        'longest_streak': longest_streak,
+    }
+
+
+def summary_streaks_version(user):
+    """
+    用户日总结的版本：条数和最后写入时间
+
+    新建和修改会更新 updated_at，删除会改变条数；
+    缓存是进程内的，版本从数据库读取，其他进程（命令、LLM执行者）写入的日总结也能立即生效。
+
+    Returns:
+        str: 版本字符串
+    """
+    result = DailySummary.objects.filter(user=user).aggregate(count=Count('id'), version=Max('updated_at'))
+    if not result['count']:
+        return '0'
+    return f"{result['count']}-{int(result['version'].timestamp() * 1_000_000)}"
+
+
+def get_summary_streaks(user, today):
+    """
+    获取日总结的当前连续天数和最长连续天数
+
+    只做一次按日期倒序的扫描，结果按用户、日总结版本和日期缓存。
+
+    Args:
+        user: 当前用户
+        today (date): TIME_ZONE 下的当前日期
+
+    Returns:
+        dict: 可直接合并进模板上下文的 streak_days 和 longest_streak
+    """
+    key = STREAK_CACHE_KEY.format(user_id=user.pk, version=summary_streaks_version(user), date=today.isoformat())
+    streaks = cache.get(key)
+    if streaks is None:
+        dates = list(
+            DailySummary.objects.filter(user=user, date__lte=today)
+            .order_by('-date')
+            .values_list('date', flat=True)
+        )
+        streaks = compute_streaks(dates)
+        cache.set(key, streaks, STREAK_CACHE_TIMEOUT)
+
+    return {
+        'streak_days': streaks['latest_streak'] if streaks['latest_date'] == today else 0,
+        'longest_streak': streaks['longest_streak'],
+    }
@@ -0,0 +1,67 @@
+"""
+按内容寻址的文件存储
+
+文件名由内容的 SHA-256 决定：events/photo.jpg 保存为 events/<前两位>/<sha256>.jpg。
+同样的内容只写一次，之后的保存直接返回已有的文件名（并刷新修改时间，
+避免正在被引用的文件被垃圾回收删除，见 blobs.py）。
+
+新文件先写入同目录下的临时名字再原子替换，读者不会看到写了一半的文件；
+两个请求同时保存相同内容时，后替换的文件与先写的完全相同。
+"""
+import hashlib
+import os
+import posixpath
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def content_hash(content):
+    """
+    计算文件内容的 SHA-256，读取后回到文件开头
+    """
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk if isinstance(chunk, bytes) else chunk.encode('utf-8'))
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+def blob_name(name, digest):
+    """
+    内容对应的文件名：保留原目录和小写的扩展名
+    """
+    directory = posixpath.dirname(name)
+    extension = posixpath.splitext(name)[1].lower()
+    return posixpath.join(directory, digest[:2], f'{digest}{extension}')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    以 SHA-256 命名文件的本地存储，相同内容共用一个文件
+    """
+
+    def _save(self, name, content):
+        target = blob_name(name, content_hash(content))
+        if self.exists(target):
+            os.utime(self.path(target))
+            return target
+        tmp_name = posixpath.join(posixpath.dirname(target), f'.{uuid.uuid4().hex}.tmp')
+        tmp_name = super()._save(tmp_name, content)
+        os.replace(self.path(tmp_name), self.path(target))
+        return target
+
+
+_event_image_storage = ContentAddressedStorage()
+
+
+def event_image_storage():
+    """
+    Event.image 使用的存储（供模型字段的 storage 参数引用，迁移中只记录这个函数）
+    """
+    return _event_image_storage
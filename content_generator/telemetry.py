@@ -0,0 +1,197 @@
+"""
+LLM调用遥测
+
+llm.py 的每次生成（模板、缓存命中或后端调用）都会写入一行 LLMCall，
+记录耗时、提示词/回复长度、token用量和错误信息；
+后台的“LLM调用记录”页面按生成类型汇总 p50/p95/p99 延迟和用量
+（计数和合计用SQL聚合，分位数按耗时排序后取对应位置的一行，不把记录读进内存；
+没有按日期筛选时只汇总最近 SUMMARY_DAYS 天）。
+
+记录保留 LLM_CALL_RETENTION_DAYS 天，更早的由 purge_llm_calls 命令删除。
+估算费用的单价（每千token）在 settings 中配置，未配置时不显示费用：
+
+    LLM_PRICING = {'PROMPT': 0.001, 'COMPLETION': 0.002}
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import LLMCall
+
+logger = logging.getLogger(__name__)
+
+# 错误信息字段长度
+ERROR_MAX_LENGTH = 200
+
+# 后台汇总默认覆盖的天数（没有按日期筛选时）
+SUMMARY_DAYS = 7
+
+# 调用记录默认保留的天数
+DEFAULT_RETENTION_DAYS = 30
+
+# 每次删除的记录数
+PURGE_BATCH_SIZE = 5000
+
+
+def percentile_index(count, q):
+    """
+    最近秩法的分位数在升序序列中的位置
+    """
+    return min(count - 1, max(0, round(q / 100 * count) - 1))
+
+
+def percentile(sorted_values, q):
+    """
+    计算已排序序列的分位数（最近秩法）
+    """
+    if not sorted_values:
+        return 0.0
+    return sorted_values[percentile_index(len(sorted_values), q)]
+
+
+def elapsed_ms(started, finished=None):
+    """
+    从 time.perf_counter() 的起点计算耗时（毫秒）
+    """
+    finished = time.perf_counter() if finished is None else finished
+    return max(0, round((finished - started) * 1000))
+
+
+def build_call(call_type, source, started, prompt, content='', error='', usage=None,
+               first_token_at=None, batch_size=1):
+    """
+    构造一条调用记录（不保存）
+
+    Args:
+        call_type (str): 生成类型，取值见 LLMCall.CALL_TYPE_CHOICES
+        source (str): 结果来源，取值见 LLMCall.SOURCE_CHOICES
+        started (float): 调用开始时的 time.perf_counter()
+        prompt (str): 提示词
+        content (str): 生成的文本
+        error: 后端错误（异常或字符串）
+        usage (dict, optional): 后端返回的 usage（prompt_tokens/completion_tokens）
+        first_token_at (float, optional): 流式生成收到第一个片段时的 time.perf_counter()
+        batch_size (int): 同一次后端调用中的提示词数
+    """
+    usage = usage or {}
+    return LLMCall(
+        call_type=call_type,
+        source=source,
+        latency_ms=elapsed_ms(started),
+        first_token_ms=elapsed_ms(started, first_token_at) if first_token_at is not None else None,
+        prompt_chars=len(prompt),
+        response_chars=len(content or ''),
+        prompt_tokens=usage.get('prompt_tokens'),
+        completion_tokens=usage.get('completion_tokens'),
+        batch_size=batch_size,
+        error=str(error)[:ERROR_MAX_LENGTH] if error else '',
+    )
+
+
+def save_calls(calls):
+    """
+    保存调用记录，写入失败只记录日志，不影响生成结果
+    """
+    if not calls:
+        return
+    try:
+        LLMCall.objects.bulk_create(calls)
+    except DatabaseError as e:
+        logger.error(f"保存LLM调用记录失败: {str(e)}")
+
+
+def record_call(*args, **kwargs):
+    """
+    构造并保存一条调用记录，参数同 build_call()
+    """
+    save_calls([build_call(*args, **kwargs)])
+
+
+def token_prices():
+    """
+    每千token单价 (提示词, 回复)，未配置时为 (0, 0)
+    """
+    pricing = getattr(settings, 'LLM_PRICING', None) or {}
+    return float(pricing.get('PROMPT', 0)), float(pricing.get('COMPLETION', 0))
+
+
+def recent_calls(queryset, days=SUMMARY_DAYS, now=None):
+    """
+    只保留最近 days 天的调用记录
+    """
+    return queryset.filter(created_at__gte=(now or timezone.now()) - timedelta(days=days))
+
+
+def summarize_calls(queryset):
+    """
+    按生成类型汇总调用记录
+
+    计数、比例和合计由一次分组聚合得到；每个分位数按耗时排序后用 OFFSET 取一行。
+
+    Returns:
+        list: 每种类型一个字典，包含 count、缓存命中率、错误率、
+              p50/p95/p99 延迟、平均长度、token合计和估算费用
+    """
+    prompt_price, completion_price = token_prices()
+    groups = (
+        queryset.order_by().values('call_type').annotate(
+            count=Count('id'),
+            cache_hits=Count('id', filter=Q(source='cache')),
+            errors=Count('id', filter=~Q(error='')),
+            prompt_chars=Coalesce(Sum('prompt_chars'), 0),
+            response_chars=Coalesce(Sum('response_chars'), 0),
+            prompt_tokens=Coalesce(Sum('prompt_tokens'), 0),
+            completion_tokens=Coalesce(Sum('completion_tokens'), 0),
+        ).order_by('call_type')
+    )
+
+    labels = dict(LLMCall.CALL_TYPE_CHOICES)
+    summary = []
+    for group in groups:
+        call_type, count = group['call_type'], group['count']
+        latencies = queryset.filter(call_type=call_type).order_by('latency_ms').values_list('latency_ms', flat=True)
+        summary.append({
+            'call_type': call_type,
+            'label': labels.get(call_type, call_type),
+            'count': count,
+            'cache_hit_rate': group['cache_hits'] / count,
+            'error_rate': group['errors'] / count,
+            'p50': latencies[percentile_index(count, 50)],
+            'p95': latencies[percentile_index(count, 95)],
+            'p99': latencies[percentile_index(count, 99)],
+            'avg_prompt_chars': group['prompt_chars'] / count,
+            'avg_response_chars': group['response_chars'] / count,
+            'prompt_tokens': group['prompt_tokens'],
+            'completion_tokens': group['completion_tokens'],
+            'cost': (group['prompt_tokens'] * prompt_price + group['completion_tokens'] * completion_price) / 1000,
+        })
+    return summary
+
+
+def retention_days():
+    """
+    调用记录保留的天数
+    """
+    return getattr(settings, 'LLM_CALL_RETENTION_DAYS', DEFAULT_RETENTION_DAYS)
+
+
+def purge_calls(days=None, now=None):
+    """
+    分批删除早于保留期的调用记录
+
+    Returns:
+        int: 删除的记录数
+    """
+    cutoff = (now or timezone.now()) - timedelta(days=retention_days() if days is None else days)
+    deleted = 0
+    while True:
+        ids = list(LLMCall.objects.filter(created_at__lt=cutoff).values_list('id', flat=True)[:PURGE_BATCH_SIZE])
+        if not ids:
+            return deleted
+        deleted += LLMCall.objects.filter(id__in=ids).delete()[0]
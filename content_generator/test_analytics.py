@@ -0,0 +1,122 @@
+import importlib.util
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from .models import Task
+
+HAS_NUMPY = importlib.util.find_spec('numpy') is not None
+
+
+class CompletedAtTest(TestCase):
+    """
+    完成时间字段测试
+    """
+
+    def setUp(self):
+        """
+        测试前的准备工作
+        """
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+
+    def test_completed_at_follows_completed(self):
+        """
+        测试标记完成时记录完成时间，取消完成时清空
+        """
+        task = Task.objects.create(user=self.user, title='任务')
+        self.assertIsNone(task.completed_at)
+
+        task.completed = True
+        task.save()
+        completed_at = Task.objects.get(pk=task.pk).completed_at
+        self.assertIsNotNone(completed_at)
+
+        # 再次保存不改变完成时间
+        task.title = '新标题'
+        task.save()
+        self.assertEqual(Task.objects.get(pk=task.pk).completed_at, completed_at)
+
+        task.completed = False
+        task.save()
+        self.assertIsNone(Task.objects.get(pk=task.pk).completed_at)
+
+
+@skipUnless(HAS_NUMPY, '需要安装 numpy')
+class TaskAnalyticsTest(TestCase):
+    """
+    任务效率分析测试
+    """
+
+    def setUp(self):
+        """
+        测试前的准备工作
+        """
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+        now = timezone.now()
+        # 高优先级：按时完成一个，逾期2小时完成一个
+        Task.objects.create(user=self.user, title='按时', priority='high', willingness='😄',
+                            due_date=now + timedelta(hours=1), completed=True)
+        late = Task.objects.create(user=self.user, title='逾期', priority='high', willingness='😭',
+                                   due_date=now - timedelta(hours=3), completed=True)
+        Task.objects.filter(pk=late.pk).update(completed_at=now - timedelta(hours=1))
+        # 未到截止时间的未完成任务不参与逾期统计
+        Task.objects.create(user=self.user, title='未到期', priority='low', due_date=now + timedelta(days=1))
+        Task.objects.create(user=self.user, title='无截止时间')
+
+    def get_analytics(self, **params):
+        """
+        请求分析接口
+        """
+        response = self.client.get(reverse('content_generator:task_analytics'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_trend_and_deadline_stats(self):
+        """
+        测试完成率趋势、意愿度和逾期统计
+        """
+        data = self.get_analytics(days=7, window=3)
+        trend = data['completion_trend']
+        self.assertEqual(len(trend['dates']), 7)
+        self.assertEqual(trend['created'][-1], 4)
+        self.assertEqual(trend['completed'][-1], 2)
+        self.assertEqual(trend['rolling_rate'][-1], 0.5)
+        self.assertIsNone(trend['rolling_rate'][0])
+
+        levels = {level['value']: level for level in data['willingness']['levels']}
+        self.assertEqual(levels['😄']['on_time_rate'], 1.0)
+        self.assertEqual(levels['😭']['on_time_rate'], 0.0)
+        self.assertIsNone(levels['😐']['on_time_rate'])
+        self.assertAlmostEqual(data['willingness']['correlation'], 1.0)
+
+        lateness = {row['priority']: row for row in data['lateness_by_priority']}
+        self.assertEqual(lateness['high']['tasks'], 2)
+        self.assertEqual(lateness['high']['late_tasks'], 1)
+        self.assertAlmostEqual(lateness['high']['avg_lateness_hours'], 1.0, places=1)
+        self.assertEqual(lateness['low']['tasks'], 0)
+
+    def test_cached_until_next_write(self):
+        """
+        测试结果按最后写入时间缓存
+        """
+        first = self.get_analytics()
+        self.assertEqual(self.get_analytics()['version'], first['version'])
+
+        Task.objects.create(user=self.user, title='新任务')
+        second = self.get_analytics()
+        self.assertNotEqual(second['version'], first['version'])
+        self.assertEqual(second['completion_trend']['created'][-1], 5)
+
+    def test_invalid_params(self):
+        """
+        测试非法参数返回400
+        """
+        url = reverse('content_generator:task_analytics')
+        self.assertEqual(self.client.get(url, {'days': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'days': 7, 'window': 8}).status_code, 400)
@@ -0,0 +1,150 @@
+import os
+import posixpath
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from .models import Event, MediaBlob
+from .storage import event_image_storage
+from .test_images import MediaTestCase, make_jpeg
+from . import blobs, images
+
+
+class ContentAddressedStorageTest(MediaTestCase):
+    """
+    按内容寻址存储测试
+    """
+
+    def test_same_content_same_file(self):
+        """
+        测试相同内容只保存一份，不同内容各自保存
+        """
+        storage = event_image_storage()
+        first = storage.save('events/a.JPG', ContentFile(b'same'))
+        second = storage.save('events/b.jpg', ContentFile(b'same'))
+        third = storage.save('events/c.jpg', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, third)
+        self.assertRegex(first, r'^events/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        _, files = storage.listdir(first.rsplit('/', 1)[0])
+        self.assertEqual(files, [first.rsplit('/', 1)[1]])
+
+
+class MediaBlobTest(MediaTestCase):
+    """
+    图片引用计数和垃圾回收测试
+    """
+
+    def create_event(self, data):
+        """
+        创建带图片的事件并执行提交后的回调
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            event = Event.objects.create(
+                user=self.user, title='事件', content='内容',
+                image=SimpleUploadedFile('photo.jpg', data, content_type='image/jpeg'),
+            )
+        event.refresh_from_db()
+        return event
+
+    def gc(self, *args):
+        """
+        运行垃圾回收命令
+        """
+        out = StringIO()
+        call_command('gc_media', *args, stdout=out)
+        return out.getvalue()
+
+    def test_duplicates_share_file_and_variants(self):
+        """
+        测试同一张图片的多个事件共用文件和缩略图，缩略图只生成一次
+        """
+        data = make_jpeg(800, 600)
+        with mock.patch.object(images, 'render_variants', wraps=images.render_variants) as render:
+            first = self.create_event(data)
+            second = self.create_event(data)
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(second.image_variants, first.image_variants)
+        blob = MediaBlob.objects.get()
+        self.assertEqual((blob.name, blob.ref_count), (first.image.name, 2))
+        self.assertEqual(blob.size, len(data))
+
+        # 更换图片后旧文件的引用减少
+        second.image = SimpleUploadedFile('other.jpg', make_jpeg(400, 300, color='blue'), content_type='image/jpeg')
+        second.save()
+        self.assertEqual(MediaBlob.objects.get(name=first.image.name).ref_count, 1)
+        self.assertEqual(MediaBlob.objects.get(name=second.image.name).ref_count, 1)
+
+    def test_gc_deletes_unreferenced_files(self):
+        """
+        测试引用数为0的文件在宽限期后连同缩略图被删除
+        """
+        data = make_jpeg(800, 600)
+        first = self.create_event(data)
+        second = self.create_event(data)
+        storage = event_image_storage()
+        names = [first.image.name] + [variant['name'] for variant in first.image_variants['variants']]
+
+        first.delete()
+        self.assertIn('已删除 0 个文件', self.gc('--grace-hours', '0'))
+        second.delete()
+        self.assertEqual(MediaBlob.objects.get().ref_count, 0)
+
+        # 宽限期内不删除
+        self.assertIn('已删除 0 个文件', self.gc())
+        self.assertIn(f'可删除 {len(names)} 个文件', self.gc('--grace-hours', '0', '--dry-run'))
+        self.assertTrue(all(storage.exists(name) for name in names))
+
+        self.assertIn(f'已删除 {len(names)} 个文件', self.gc('--grace-hours', '0'))
+        self.assertFalse(any(storage.exists(name) for name in names))
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_reupload_during_grace_keeps_file(self):
+        """
+        测试引用数降为0后又被重新上传的文件不会被删除
+        """
+        data = make_jpeg(200, 100)
+        self.create_event(data).delete()
+        MediaBlob.objects.update(updated_at=MediaBlob.objects.get().updated_at - timedelta(days=2))
+        event = self.create_event(data)
+        self.gc()
+        self.assertTrue(event.image.storage.exists(event.image.name))
+        self.assertEqual(MediaBlob.objects.get().ref_count, 1)
+
+    def test_reference_during_gc_keeps_file(self):
+        """
+        测试删除记录后、删除文件前被重新引用的文件改回原名保留
+        """
+        data = make_jpeg(200, 100)
+        name = self.create_event(data).image.name
+        Event.objects.all().delete()
+        rename = os.rename
+
+        def rename_then_reference(src, dst):
+            rename(src, dst)
+            if dst.endswith('.deleted') and not MediaBlob.objects.exists():
+                MediaBlob.objects.create(name=name, size=len(data), ref_count=1)
+
+        with mock.patch.object(blobs.os, 'rename', side_effect=rename_then_reference):
+            self.gc('--grace-hours', '0')
+        storage = event_image_storage()
+        self.assertTrue(storage.exists(name))
+        self.assertFalse([file for file in storage.listdir(posixpath.dirname(name))[1] if file.endswith('.deleted')])
+
+    def test_recount_and_sweep(self):
+        """
+        测试重新计数修正绕过信号的修改，扫描删除无引用的文件
+        """
+        event = self.create_event(make_jpeg(200, 100))
+        Event.objects.filter(pk=event.pk).update(image='')
+        orphan = event_image_storage().save('events/legacy.jpg', ContentFile(b'legacy'))
+
+        output = self.gc('--recount', '--sweep', '--grace-hours', '0')
+        self.assertIn('已修正 1 个文件的引用数', output)
+        storage = event_image_storage()
+        self.assertFalse(storage.exists(event.image.name))
+        self.assertFalse(storage.exists(orphan))
@@ -0,0 +1,122 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+from PIL import Image
+from .models import Event
+
+
+def make_jpeg(width, height, orientation=None, color='red'):
+    """
+    生成测试用的 JPEG 图片
+    """
+    buffer = BytesIO()
+    image = Image.new('RGB', (width, height), color)
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    image.save(buffer, 'JPEG', exif=exif)
+    return buffer.getvalue()
+
+
+class MediaTestCase(TestCase):
+    """
+    使用临时 MEDIA_ROOT 的测试基类
+    """
+
+    def setUp(self):
+        """
+        测试前的准备工作
+        """
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root,
+            IMAGE_VARIANTS={'WIDTHS': [320, 640, 1280], 'QUALITY': 80, 'WORKERS': 0, 'MAX_PENDING': 4},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+
+
+class ImageVariantsTest(MediaTestCase):
+    """
+    图片缩略图测试
+    """
+
+    def create_event(self, data, name='photo.jpg'):
+        """
+        创建带图片的事件并执行提交后的回调
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            event = Event.objects.create(
+                user=self.user, title='事件', content='内容',
+                image=SimpleUploadedFile(name, data, content_type='image/jpeg'),
+            )
+        event.refresh_from_db()
+        return event
+
+    def test_variants_generated_after_save(self):
+        """
+        测试保存后生成不超过原图宽度的 WebP/JPEG 缩略图
+        """
+        event = self.create_event(make_jpeg(800, 600))
+        info = event.image_variants
+        self.assertEqual(info['source'], event.image.name)
+        self.assertEqual((info['width'], info['height']), (800, 600))
+        self.assertEqual(
+            sorted((variant['format'], variant['width']) for variant in info['variants']),
+            [('jpeg', 320), ('jpeg', 640), ('webp', 320), ('webp', 640)],
+        )
+        self.assertIn('320w', event.webp_srcset)
+        smallest_jpeg = next(v for v in info['variants'] if (v['format'], v['width']) == ('jpeg', 320))
+        self.assertTrue(event.image_display_url.endswith(smallest_jpeg['name']))
+        with event.image.storage.open(info['variants'][0]['name']) as f:
+            self.assertEqual(Image.open(f).size, (320, 240))
+
+    def test_exif_rotation(self):
+        """
+        测试按 EXIF 方向旋转后计算尺寸
+        """
+        event = self.create_event(make_jpeg(800, 600, orientation=6))
+        self.assertEqual((event.image_variants['width'], event.image_variants['height']), (600, 800))
+        variant = next(v for v in event.image_variants['variants'] if v['width'] == 320)
+        self.assertEqual(variant['height'], 427)
+
+    def test_replaced_image_hides_stale_variants(self):
+        """
+        测试更换图片后旧的缩略图不再使用，并为新图片重新生成
+        """
+        event = self.create_event(make_jpeg(800, 600))
+        event.image = SimpleUploadedFile('new.jpg', make_jpeg(400, 300), content_type='image/jpeg')
+        self.assertEqual(event.current_variants(), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            event.save()
+        event.refresh_from_db()
+        self.assertEqual({v['width'] for v in event.current_variants()}, {320})
+
+    def test_list_uses_thumbnails(self):
+        """
+        测试列表页输出 srcset 和懒加载
+        """
+        event = self.create_event(make_jpeg(800, 600))
+        response = self.client.get(reverse('content_generator:event_list'))
+        self.assertContains(response, 'srcset=')
+        self.assertContains(response, 'loading="lazy"')
+        self.assertNotContains(response, f'src="{event.image.url}"')
+
+    def test_command_fills_missing_variants(self):
+        """
+        测试命令为缺少缩略图的图片补齐缩略图
+        """
+        event = self.create_event(make_jpeg(800, 600))
+        Event.objects.filter(pk=event.pk).update(image_variants={})
+        call_command('generate_image_variants', stdout=StringIO())
+        event.refresh_from_db()
+        self.assertEqual(event.image_variants['source'], event.image.name)
@@ -0,0 +1,321 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.db.models import QuerySet
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from .models import Task, Event, LLMAdvice, LLMJob, LLMWorker
+from .jobs import (
+    enqueue_advice_job, claim_jobs, claim_batch, complete_job, heartbeat, run_job, run_jobs, submit_advice_job, workers_available,
+    MAX_ATTEMPTS, WORKER_TIMEOUT,
+)
+
+
+class LLMJobQueueTest(TestCase):
+    """
+    LLM生成任务队列测试
+    """
+
+    def setUp(self):
+        """
+        测试前的准备工作
+        """
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.task = Task.objects.create(user=self.user, title='任务', priority='high', willingness='😭')
+
+    def test_enqueue_deduplicates_open_jobs(self):
+        """
+        测试同一对象未完成的任务不会重复排队
+        """
+        first = enqueue_advice_job(self.user, 'task', self.task.id)
+        second = enqueue_advice_job(self.user, 'task', self.task.id)
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(LLMJob.objects.count(), 1)
+
+    def test_one_active_job_per_object(self):
+        """
+        测试数据库只允许同一对象有一个未完成的任务，完成后可以重新排队
+        """
+        job = LLMJob.objects.create(user=self.user, advice_type='task', related_id=self.task.id)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            LLMJob.objects.create(user=self.user, advice_type='task', related_id=self.task.id)
+        LLMJob.objects.filter(pk=job.pk).update(status='done')
+        LLMJob.objects.create(user=self.user, advice_type='task', related_id=self.task.id)
+
+    def test_enqueue_race_shares_job(self):
+        """
+        测试并发排队时后到的请求返回先到者创建的任务
+        """
+        job = LLMJob.objects.create(user=self.user, advice_type='task', related_id=self.task.id)
+        real_first = QuerySet.first
+        calls = []
+
+        def first(queryset):
+            # 第一次读取模拟另一个请求尚未提交任务时的情形
+            calls.append(queryset)
+            return None if len(calls) == 1 else real_first(queryset)
+
+        with mock.patch.object(QuerySet, 'first', first):
+            self.assertEqual(enqueue_advice_job(self.user, 'task', self.task.id).pk, job.pk)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(LLMJob.objects.count(), 1)
+
+    def test_rerun_overwrites_advice(self):
+        """
+        测试重新生成时覆盖已有建议而不是新增一条
+        """
+        LLMAdvice.objects.create(user=self.user, content='旧建议', advice_type='task', related_id=self.task.id)
+        enqueue_advice_job(self.user, 'task', self.task.id)
+        self.assertTrue(run_job(claim_jobs('worker-a')[0], 'worker-a'))
+        advice = LLMAdvice.objects.get(user=self.user, advice_type='task', related_id=self.task.id)
+        self.assertIn('高优先级', advice.content)
+
+    def test_claim_and_run(self):
+        """
+        测试领取任务后生成建议并标记完成
+        """
+        job = enqueue_advice_job(self.user, 'task', self.task.id)
+        claimed = claim_jobs('worker-a')
+        self.assertEqual([j.pk for j in claimed], [job.pk])
+        # 租约未到期时其他执行者领取不到
+        self.assertEqual(claim_jobs('worker-b'), [])
+
+        self.assertTrue(run_job(claimed[0], 'worker-a'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.advice.related_id, self.task.id)
+        self.assertIn('高优先级', job.advice.content)
+
+    def test_expired_lease_is_reclaimed(self):
+        """
+        测试执行者失联后任务可被重新领取，旧执行者的结果被丢弃
+        """
+        job = enqueue_advice_job(self.user, 'task', self.task.id)
+        stale = claim_jobs('worker-a')[0]
+        LLMJob.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+
+        fresh = claim_jobs('worker-b')
+        self.assertEqual([j.pk for j in fresh], [job.pk])
+        self.assertFalse(run_job(stale, 'worker-a'))
+        self.assertTrue(run_job(fresh[0], 'worker-b'))
+        self.assertEqual(LLMAdvice.objects.filter(related_id=self.task.id).count(), 1)
+
+    def test_crashed_attempts_are_counted(self):
+        """
+        测试租约到期被重新领取也计为一次尝试，反复导致执行者失联的任务最终标记为失败
+        """
+        job = enqueue_advice_job(self.user, 'task', self.task.id)
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            self.assertEqual([j.pk for j in claim_jobs(f'worker-{attempt}')], [job.pk])
+            job.refresh_from_db()
+            self.assertEqual(job.attempts, attempt)
+            # 执行者崩溃，租约到期
+            LLMJob.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(claim_jobs('worker-last'), [])
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+
+    def test_failure_retries_with_backoff(self):
+        """
+        测试生成失败后退避重试，超过次数后标记失败
+        """
+        job = enqueue_advice_job(self.user, 'task', self.task.id)
+        with mock.patch('content_generator.jobs.complete_batch', side_effect=RuntimeError('boom')), \
+                self.assertLogs('content_generator.jobs', level='ERROR'):
+            for attempt in range(1, MAX_ATTEMPTS + 1):
+                LLMJob.objects.filter(pk=job.pk).update(available_at=timezone.now())
+                self.assertFalse(run_job(claim_jobs('worker-a')[0], 'worker-a'))
+                job.refresh_from_db()
+                self.assertEqual(job.attempts, attempt)
+
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.error, 'boom')
+
+    def test_claim_batch_waits_for_stragglers(self):
+        """
+        测试未凑满一批时在窗口内继续领取，没有任务时立即返回
+        """
+        with mock.patch('content_generator.jobs.claim_jobs', side_effect=[['a'], [], ['b']]) as claim:
+            self.assertEqual(claim_batch('worker-a', 2, window=5, poll=0), ['a', 'b'])
+        self.assertEqual(claim.call_count, 3)
+
+        with mock.patch('content_generator.jobs.claim_jobs', return_value=[]) as claim:
+            self.assertEqual(claim_batch('worker-a', 2, window=5), [])
+        self.assertEqual(claim.call_count, 1)
+
+    def test_run_jobs_isolates_failures(self):
+        """
+        测试一批任务中关联对象已删除的任务单独失败，其余任务正常完成
+        """
+        event = Event.objects.create(user=self.user, title='事件', content='内容')
+        enqueue_advice_job(self.user, 'task', self.task.id)
+        enqueue_advice_job(self.user, 'event', event.id)
+        enqueue_advice_job(self.user, 'task', 999)
+        jobs = claim_jobs('worker-a', 3)
+        self.assertEqual(run_jobs(jobs, 'worker-a'), [True, True, False])
+        self.assertEqual(LLMJob.objects.get(related_id=999).error, '关联对象不存在')
+        self.assertEqual(LLMAdvice.objects.count(), 2)
+
+    def test_worker_command(self):
+        """
+        测试执行者命令处理完排队任务后退出
+        """
+        event = Event.objects.create(user=self.user, title='事件', content='内容')
+        enqueue_advice_job(self.user, 'task', self.task.id)
+        enqueue_advice_job(self.user, 'event', event.id)
+        call_command('run_llm_worker', '--once', stdout=StringIO())
+        self.assertFalse(LLMJob.objects.exclude(status='done').exists())
+        self.assertEqual(LLMAdvice.objects.count(), 2)
+        # 退出时删除心跳
+        self.assertFalse(LLMWorker.objects.exists())
+
+    def test_workers_available(self):
+        """
+        测试只有最近写过心跳的执行者视为存活
+        """
+        self.assertFalse(workers_available())
+        heartbeat('worker-a')
+        self.assertTrue(workers_available())
+        LLMWorker.objects.update(last_seen=timezone.now() - timedelta(seconds=WORKER_TIMEOUT + 1))
+        self.assertFalse(workers_available())
+
+    def test_submit_runs_inline_without_workers(self):
+        """
+        测试没有存活的执行者时在请求中执行，有执行者时只排队
+        """
+        job = submit_advice_job(self.user, 'task', self.task.id)
+        self.assertEqual(job.status, 'done')
+        self.assertIn('高优先级', job.advice.content)
+
+        heartbeat('worker-a')
+        event = Event.objects.create(user=self.user, title='事件', content='内容')
+        self.assertEqual(submit_advice_job(self.user, 'event', event.id).status, 'pending')
+
+
+class LLMJobViewsTest(TestCase):
+    """
+    LLM生成任务视图测试
+    """
+
+    def setUp(self):
+        """
+        测试前的准备工作
+        """
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+
+    def test_add_task_enqueues_without_generating(self):
+        """
+        测试有执行者运行时添加任务只排队，不在请求中生成建议
+        """
+        heartbeat('worker-a')
+        self.client.post(reverse('content_generator:add_task'), {
+            'title': '新任务',
+            'priority': 'medium',
+            'willingness': '😐',
+        })
+        self.assertEqual(LLMJob.objects.filter(status='pending').count(), 1)
+        self.assertFalse(LLMAdvice.objects.exists())
+
+    def test_generate_content_poll(self):
+        """
+        测试生成分享文案返回任务，执行完成后轮询得到内容
+        """
+        heartbeat('worker-a')
+        event = Event.objects.create(user=self.user, title='事件', content='内容')
+        data = self.client.post(reverse('content_generator:generate_content', args=[event.id])).json()
+        self.assertTrue(data['pending'])
+        self.assertEqual(self.client.get(data['poll_url']).json()['status'], 'pending')
+
+        call_command('run_llm_worker', '--once', stdout=StringIO())
+        result = self.client.get(data['poll_url']).json()
+        self.assertEqual(result['status'], 'done')
+        self.assertIn('事件', result['content'])
+
+    def test_advice_generated_inline_without_workers(self):
+        """
+        测试没有执行者时获取建议直接返回生成结果
+        """
+        task = Task.objects.create(user=self.user, title='任务', priority='high')
+        data = self.client.get(reverse('content_generator:get_llm_advice', args=[task.id])).json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['advice'], LLMAdvice.objects.get(user=self.user, related_id=task.id).content)
+
+    def test_content_generated_inline_without_workers(self):
+        """
+        测试没有执行者时生成分享文案直接返回内容，不要求客户端轮询
+        """
+        event = Event.objects.create(user=self.user, title='事件', content='内容')
+        data = self.client.post(reverse('content_generator:generate_content', args=[event.id])).json()
+        advice = LLMAdvice.objects.get(user=self.user, advice_type='event', related_id=event.id)
+        self.assertNotIn('pending', data)
+        self.assertEqual((data['content'], data['advice_id']), (advice.content, advice.id))
+
+    def test_stream_waits_for_job_held_elsewhere(self):
+        """
+        测试同一事件的任务已被其他进程领取时，流式请求轮询任务结果而不调用模型
+        """
+        event = Event.objects.create(user=self.user, title='事件', content='内容')
+        job = enqueue_advice_job(self.user, 'event', event.id)
+        holder = claim_jobs('other-process', job_ids=[job.id])[0]
+
+        def finish_elsewhere(seconds):
+            complete_job(holder, 'other-process', '别处生成的文案')
+
+        with mock.patch('content_generator.views.stream_content_with_llm') as stream, \
+                mock.patch('content_generator.views.time.sleep', side_effect=finish_elsewhere):
+            response = self.client.post(reverse('content_generator:stream_content', args=[event.id]))
+            body = b''.join(response.streaming_content).decode('utf-8')
+
+        stream.assert_not_called()
+        self.assertIn('event: done', body)
+        self.assertIn('别处生成的文案', body)
+
+    def test_stream_hands_slow_job_to_polling(self):
+        """
+        测试其他进程的生成超过等待时间时发送 pending，客户端改为轮询，不再占用连接
+        """
+        event = Event.objects.create(user=self.user, title='事件', content='内容')
+        job = enqueue_advice_job(self.user, 'event', event.id)
+        claim_jobs('other-process', job_ids=[job.id])
+
+        with mock.patch('content_generator.views.stream_content_with_llm') as stream, \
+                mock.patch('content_generator.views.FLIGHT_WAIT_SECONDS', 0), \
+                mock.patch('content_generator.views.time.sleep'):
+            response = self.client.post(reverse('content_generator:stream_content', args=[event.id]))
+            body = b''.join(response.streaming_content).decode('utf-8')
+
+        stream.assert_not_called()
+        self.assertIn('event: pending', body)
+        self.assertIn(reverse('content_generator:llm_job_status', args=[job.id]), body)
+        self.assertEqual(LLMJob.objects.get(pk=job.pk).status, 'running')
+
+    def test_stream_disconnect_fails_job(self):
+        """
+        测试客户端中途断开时任务标记为失败，等待者不会一直等下去
+        """
+        event = Event.objects.create(user=self.user, title='事件', content='内容')
+        with mock.patch('content_generator.views.stream_content_with_llm', return_value=iter(['一', '二'])):
+            response = self.client.post(reverse('content_generator:stream_content', args=[event.id]))
+            stream = iter(response.streaming_content)
+            self.assertIn(b'event: token', next(stream))
+            response.close()
+        job = LLMJob.objects.get(related_id=event.id)
+        self.assertEqual(job.status, 'failed')
+        self.assertFalse(LLMAdvice.objects.exists())
+
+    def test_job_status_is_private(self):
+        """
+        测试不能查询其他用户的任务
+        """
+        other = User.objects.create_user(username='other')
+        job = LLMJob.objects.create(user=other, advice_type='task', related_id=1)
+        response = self.client.get(reverse('content_generator:llm_job_status', args=[job.id]))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,328 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.contrib.auth.models import User
+from .models import Task, Event, LLMAdvice
+from .llm import complete_batch, generate_task_advice_with_llm
+from .llm_backends import HTTPBackend, LLMError, get_backend
+from .llm_cache import ResponseCache, get_response_cache, prompt_fingerprint
+from .jobs import enqueue_advice_job, claim_jobs, renew_lease, run_jobs
+from .llm_stub import BATCH_PATH, start_stub_server, stub_reply
+
+
+class StubServerMixin:
+    """
+    在测试类范围内启动本地LLM模拟服务
+    """
+
+    stub_options = {'latency': 0}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server, cls.url = start_stub_server(**cls.stub_options)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        self.server.config.error_rate = 0
+        self.server.config.latency = 0
+
+
+class HTTPBackendTest(StubServerMixin, SimpleTestCase):
+    """
+    HTTP后端测试
+    """
+
+    def test_complete_reuses_connections(self):
+        """
+        测试连续调用复用同一条长连接
+        """
+        backend = HTTPBackend(self.url, pool_size=2)
+        self.assertIn('[模拟回复]', backend.complete('你好'))
+        conn = backend.pool.acquire()
+        backend.pool.release(conn)
+        backend.complete('再来一次')
+        self.assertIs(backend.pool.acquire(), conn)
+        backend.close()
+
+    def test_stream(self):
+        """
+        测试流式生成逐字返回，拼接结果与非流式一致，连接读完后放回池中
+        """
+        backend = HTTPBackend(self.url, pool_size=2)
+        pieces = list(backend.stream('你好'))
+        self.assertGreater(len(pieces), 1)
+        self.assertEqual(''.join(pieces), backend.complete('你好'))
+        conn = backend.pool.acquire()
+        self.assertIsNotNone(conn.sock)
+        backend.close()
+
+    def test_stream_abandoned_connection_discarded(self):
+        """
+        测试提前停止读取的流不会把半读的连接放回池中
+        """
+        backend = HTTPBackend(self.url, pool_size=2)
+        stream = backend.stream('你好')
+        next(stream)
+        stream.close()
+        self.assertIsNone(backend.pool.acquire().sock)
+        self.assertIn('[模拟回复]', backend.complete('你好'))
+        backend.close()
+
+    def test_complete_batch(self):
+        """
+        测试配置批量接口后多个提示词合并为一次请求，按 max_batch_size 分批
+        """
+        backend = HTTPBackend(self.url, batch_path=BATCH_PATH, max_batch_size=3)
+        prompts = [f'提示词{i}' for i in range(5)]
+        before = self.server.config.requests
+        self.assertEqual(backend.complete_batch(prompts), [stub_reply(prompt) for prompt in prompts])
+        self.assertEqual(self.server.config.requests - before, 2)
+        backend.close()
+
+    def test_complete_batch_without_batch_path(self):
+        """
+        测试未配置批量接口时逐个请求，结果与批量一致
+        """
+        backend = HTTPBackend(self.url)
+        before = self.server.config.requests
+        self.assertEqual(backend.complete_batch(['甲', '乙']), [stub_reply('甲'), stub_reply('乙')])
+        self.assertEqual(self.server.config.requests - before, 2)
+        backend.close()
+
+    def test_complete_batch_reports_progress(self):
+        """
+        测试逐个请求时每完成一个提示词报告一次进度，批量接口每批报告一次
+        """
+        progress = mock.Mock()
+        backend = HTTPBackend(self.url)
+        backend.complete_batch(['甲', '乙', '丙'], progress=progress)
+        self.assertEqual(progress.call_count, 3)
+        backend.close()
+
+        progress.reset_mock()
+        backend = HTTPBackend(self.url, batch_path=BATCH_PATH, max_batch_size=2)
+        backend.complete_batch(['甲', '乙', '丙'], progress=progress)
+        self.assertEqual(progress.call_count, 2)
+        backend.close()
+
+    def test_max_call_seconds(self):
+        """
+        测试单次调用最长耗时包含每次尝试的超时和重试前的退避
+        """
+        backend = HTTPBackend(self.url, timeout=30, max_retries=2, backoff=0.5)
+        self.assertEqual(backend.max_call_seconds(), 30 * 3 + (0.5 * 2 + 1 * 2))
+        backend.close()
+
+    def test_timeout(self):
+        """
+        测试单次调用超时后抛出 LLMError
+        """
+        self.server.config.latency = 0.5
+        backend = HTTPBackend(self.url, max_retries=0)
+        with self.assertRaises(LLMError):
+            backend.complete('你好', timeout=0.05)
+        backend.close()
+
+    def test_retries_transient_errors(self):
+        """
+        测试暂时性错误会按退避重试，重试用尽后抛出 LLMError
+        """
+        self.server.config.error_rate = 1
+        backend = HTTPBackend(self.url, max_retries=2, backoff=0.001)
+        before = self.server.config.requests
+        with self.assertRaises(LLMError):
+            backend.complete('你好')
+        self.assertEqual(self.server.config.requests - before, 3)
+        backend.close()
+
+    def test_benchmark_command(self):
+        """
+        测试压测命令输出吞吐量和分位数
+        """
+        out = StringIO()
+        call_command('llm_benchmark', '--url', self.url, '--requests', '8', '--concurrency', '4', stdout=out)
+        self.assertIn('失败: 0', out.getvalue())
+        self.assertIn('p95', out.getvalue())
+
+
+class ResponseCacheTest(SimpleTestCase):
+    """
+    LLM响应缓存测试
+    """
+
+    def test_fingerprint_normalizes_whitespace(self):
+        """
+        测试仅空白不同的提示词得到相同指纹，命名空间不同则不同
+        """
+        self.assertEqual(prompt_fingerprint('你好\n 世界 '), prompt_fingerprint('你好 世界'))
+        self.assertNotEqual(prompt_fingerprint('你好', 'a'), prompt_fingerprint('你好', 'b'))
+
+    def test_lru_eviction(self):
+        """
+        测试超出容量时淘汰最久未使用的条目
+        """
+        cache = ResponseCache(max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_ttl_expiry(self):
+        """
+        测试条目过期后不再命中
+        """
+        now = [0.0]
+        cache = ResponseCache(ttl=10, clock=lambda: now[0])
+        cache.set('a', 1)
+        now[0] = 9.9
+        self.assertEqual(cache.get('a'), 1)
+        now[0] = 10
+        self.assertIsNone(cache.get('a'))
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['expirations']), (1, 1, 1))
+
+
+class ConfiguredBackendTest(StubServerMixin, TestCase):
+    """
+    通过 LLM_BACKEND 配置后端的生成测试
+    """
+
+    def test_template_without_backend(self):
+        """
+        测试未配置后端时使用内置模板
+        """
+        with self.settings(LLM_BACKEND=None):
+            self.assertIsNone(get_backend())
+            task = Task(user=User(), title='任务', priority='high', willingness='😄')
+            self.assertIn('高优先级', generate_task_advice_with_llm(task))
+
+    def test_generate_with_backend(self):
+        """
+        测试配置后端后通过HTTP生成
+        """
+        user = User.objects.create_user(username='testuser')
+        task = Task.objects.create(user=user, title='任务', priority='high')
+        config = {'BACKEND': 'content_generator.llm_backends.HTTPBackend', 'OPTIONS': {'url': self.url}}
+        with override_settings(LLM_BACKEND=config):
+            self.assertIsInstance(get_backend(), HTTPBackend)
+            self.assertTrue(generate_task_advice_with_llm(task).startswith('[模拟回复]'))
+
+    def test_repeated_prompt_served_from_cache(self):
+        """
+        测试相同提示词的任务只请求一次后端
+        """
+        user = User.objects.create_user(username='testuser')
+        first = Task.objects.create(user=user, title='写周报', priority='high', willingness='😕')
+        second = Task.objects.create(user=user, title='整理邮件', priority='high', willingness='😕')
+        config = {'BACKEND': 'content_generator.llm_backends.HTTPBackend', 'OPTIONS': {'url': self.url}}
+        with override_settings(LLM_BACKEND=config):
+            before = self.server.config.requests
+            self.assertEqual(generate_task_advice_with_llm(first), generate_task_advice_with_llm(second))
+            self.assertEqual(self.server.config.requests - before, 1)
+            self.assertEqual(get_response_cache().stats()['hits'], 1)
+
+    def test_stream_content_view(self):
+        """
+        测试流式生成接口逐段推送文案并在结束时保存LLM建议
+        """
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        event = Event.objects.create(user=user, title='散步', content='去公园散步', mood='😄')
+        self.client.login(username='testuser', password='testpass123')
+        config = {'BACKEND': 'content_generator.llm_backends.HTTPBackend', 'OPTIONS': {'url': self.url}}
+        with override_settings(LLM_BACKEND=config):
+            response = self.client.post(f'/content/generate-content/{event.id}/stream/')
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            body = b''.join(response.streaming_content).decode('utf-8')
+
+        self.assertGreater(body.count('event: token'), 1)
+        self.assertIn('event: done', body)
+        advice = LLMAdvice.objects.get(user=user, advice_type='event', related_id=event.id)
+        self.assertTrue(advice.content.startswith('[模拟回复]'))
+
+    def test_stream_content_view_error(self):
+        """
+        测试后端失败时推送 error 消息且不保存建议
+        """
+        self.server.config.error_rate = 1
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        event = Event.objects.create(user=user, title='散步', content='去公园散步', mood='😄')
+        self.client.login(username='testuser', password='testpass123')
+        config = {
+            'BACKEND': 'content_generator.llm_backends.HTTPBackend',
+            'OPTIONS': {'url': self.url, 'max_retries': 0},
+        }
+        with override_settings(LLM_BACKEND=config), self.assertLogs('content_generator.views', 'ERROR'):
+            response = self.client.post(f'/content/generate-content/{event.id}/stream/')
+            body = b''.join(response.streaming_content).decode('utf-8')
+
+        self.assertIn('event: error', body)
+        self.assertFalse(LLMAdvice.objects.filter(user=user).exists())
+
+    def test_batch_dedupes_and_caches(self):
+        """
+        测试批量生成时相同提示词只请求一次，已缓存的提示词不再请求
+        """
+        config = {
+            'BACKEND': 'content_generator.llm_backends.HTTPBackend',
+            'OPTIONS': {'url': self.url, 'batch_path': BATCH_PATH},
+        }
+        with override_settings(LLM_BACKEND=config):
+            get_backend().complete_batch = mock.Mock(wraps=get_backend().complete_batch)
+            template = lambda: '模板'
+            results = complete_batch([('task', '甲', template), ('task', '乙', template), ('task', '甲 ', template)])
+            self.assertEqual(results, [stub_reply('甲'), stub_reply('乙'), stub_reply('甲')])
+            get_backend().complete_batch.assert_called_once_with(['甲', '乙'], progress=None)
+
+            complete_batch([('task', '乙', template), ('task', '丙', template)])
+            get_backend().complete_batch.assert_called_with(['丙'], progress=None)
+
+    def test_worker_batches_jobs(self):
+        """
+        测试执行者把一批任务合并为一次后端请求并分别写回结果
+        """
+        user = User.objects.create_user(username='testuser')
+        tasks = [
+            Task.objects.create(user=user, title=f'任务{i}', priority=priority)
+            for i, priority in enumerate(['high', 'medium', 'low'])
+        ]
+        for task in tasks:
+            enqueue_advice_job(user, 'task', task.id)
+        config = {
+            'BACKEND': 'content_generator.llm_backends.HTTPBackend',
+            'OPTIONS': {'url': self.url, 'batch_path': BATCH_PATH},
+        }
+        with override_settings(LLM_BACKEND=config):
+            before = self.server.config.requests
+            self.assertEqual(run_jobs(claim_jobs('worker-a', 3), 'worker-a'), [True, True, True])
+            self.assertEqual(self.server.config.requests - before, 1)
+        self.assertEqual(LLMAdvice.objects.filter(user=user, advice_type='task').count(), 3)
+
+    def test_worker_renews_lease_between_prompts(self):
+        """
+        测试后端逐个生成一批提示词时，每完成一个就为整批任务续约
+        """
+        user = User.objects.create_user(username='testuser')
+        # 提示词各不相同，不会被去重或命中缓存
+        for priority, willingness in [('high', '😭'), ('medium', '😕'), ('low', '😄')]:
+            task = Task.objects.create(user=user, title='续约', priority=priority, willingness=willingness)
+            enqueue_advice_job(user, 'task', task.id)
+        get_response_cache().clear()
+        config = {'BACKEND': 'content_generator.llm_backends.HTTPBackend', 'OPTIONS': {'url': self.url}}
+        jobs = claim_jobs('worker-a', 3, lease_seconds=1)
+        with override_settings(LLM_BACKEND=config), \
+                mock.patch('content_generator.jobs.renew_lease', wraps=renew_lease) as renew:
+            self.assertEqual(run_jobs(jobs, 'worker-a', lease_seconds=600), [True, True, True])
+        self.assertEqual(renew.call_count, 3)
+        renew.assert_called_with(jobs, 'worker-a', 600)
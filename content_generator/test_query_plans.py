@@ -0,0 +1,228 @@
+import importlib.util
+import json
+import os
+import re
+import shutil
+import tempfile
+import unittest
+from contextlib import contextmanager
+from io import StringIO
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from .models import Task, Event, DailySummary, LLMAdvice, LLMJob
+from .test_images import make_jpeg
+
+HAS_NUMPY = importlib.util.find_spec('numpy') is not None
+
+# 只检查本应用的表
+APP_TABLE_PREFIX = 'content_generator_'
+
+# 检查查询计划的语句：读取以及带 WHERE 条件的修改都不能全表扫描
+EXPLAINED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE')
+
+# EXPLAIN QUERY PLAN 中的扫描行，例如 "SCAN content_generator_task"，
+# 以及走索引但遍历整个索引的 "SCAN content_generator_task USING INDEX ..."（按索引条件查找的是 SEARCH）
+FULL_SCAN_RE = re.compile(r'^SCAN (\w+)')
+
+# 允许的扫描：FTS5 虚拟表带 MATCH 条件（idxStr 中的 M）时由全文索引查找，
+# 按 rowid 定位（idxStr 中的 =）时直接读取一行，计划中都显示为 SCAN
+ALLOWED_SCAN_RES = [
+    re.compile(r' VIRTUAL TABLE INDEX \d+:\S*[M=]'),
+]
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', '查询计划检查基于SQLite的EXPLAIN QUERY PLAN')
+class QueryPlanTest(TestCase):
+    """
+    查询计划回归测试
+
+    依次请求每个视图（以及后台执行者领取、完成任务的路径），捕获执行的SQL，
+    对其中的 SELECT、UPDATE、DELETE 逐条运行 EXPLAIN QUERY PLAN，
+    任何一条语句对本应用的表做全表扫描都视为失败。
+    """
+
+    def setUp(self):
+        """
+        测试前的准备工作
+        """
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=os.path.join(root, 'media'),
+            IMAGE_VARIANTS={'WIDTHS': [320], 'QUALITY': 80, 'WORKERS': 0, 'MAX_PENDING': 4},
+            IMAGE_RESIZE={'WIDTHS': [200], 'FORMATS': ['webp'], 'QUALITY': 80,
+                          'CACHE_DIR': os.path.join(root, 'cache'), 'MAX_CACHE_BYTES': 1024 * 1024},
+            RESUMABLE_UPLOADS={'DIR': os.path.join(root, 'staging'), 'CHUNK_SIZE': 1024 * 1024, 'EXPIRY': 3600},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+        now = timezone.now()
+        for i in range(25):
+            Task.objects.create(user=self.user, title=f'任务{i}', due_date=now)
+            Event.objects.create(user=self.user, title=f'事件{i}', content='内容')
+        self.task = Task.objects.filter(user=self.user).first()
+        self.event = Event.objects.filter(user=self.user).first()
+        DailySummary.objects.create(user=self.user, date=now.date(), summary='总结')
+        LLMAdvice.objects.create(user=self.user, content='建议', advice_type='task', related_id=self.task.id)
+
+    def full_scans(self, captured):
+        """
+        返回捕获的查询中对本应用表做全表扫描的 (表名, SQL) 列表
+        """
+        offenders = []
+        with connection.cursor() as cursor:
+            for query in captured:
+                sql = query['sql']
+                if not sql.lstrip().upper().startswith(EXPLAINED_STATEMENTS) or APP_TABLE_PREFIX not in sql:
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                for row in cursor.fetchall():
+                    detail = row[-1]
+                    match = FULL_SCAN_RE.match(detail)
+                    if any(allowed.search(detail) for allowed in ALLOWED_SCAN_RES):
+                        continue
+                    if match and match.group(1).startswith(APP_TABLE_PREFIX):
+                        offenders.append((match.group(1), sql))
+        return offenders
+
+    def assertNoFullScan(self, method, url, **kwargs):
+        """
+        断言请求某个视图时没有全表扫描
+        """
+        with self.assertNoFullScanDuring(url):
+            response = getattr(self.client, method)(url, **kwargs)
+            # 流式响应的查询在读取内容时才执行
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400, url)
+        return response
+
+    @contextmanager
+    def assertNoFullScanDuring(self, label):
+        """
+        断言代码块执行的查询中没有全表扫描
+        """
+        with CaptureQueriesContext(connection) as captured:
+            yield
+        self.assertEqual(self.full_scans(captured.captured_queries), [], label)
+
+    def test_task_views(self):
+        """
+        测试任务相关视图的查询计划
+        """
+        first = self.assertNoFullScan('get', reverse('content_generator:task_list'))
+        self.assertNoFullScan('get', reverse('content_generator:task_list'), data={
+            'fragment': 1,
+            'cursor': first.context['next_cursor'],
+        })
+        self.assertNoFullScan('post', reverse('content_generator:add_task'), data={
+            'title': '新任务',
+            'priority': 'high',
+            'willingness': '😐',
+        })
+        self.assertNoFullScan('get', reverse('content_generator:edit_task', args=[self.task.id]))
+        self.assertNoFullScan('post', reverse('content_generator:toggle_task_completion', args=[self.task.id]))
+        self.assertNoFullScan('post', reverse('content_generator:update_willingness', args=[self.task.id]),
+                              data=json.dumps({'willingness': '😄'}), content_type='application/json')
+        self.assertNoFullScan('get', reverse('content_generator:get_llm_advice', args=[self.task.id]))
+        self.assertNoFullScan('get', reverse('content_generator:delete_task', args=[self.task.id]))
+
+    def test_event_views(self):
+        """
+        测试事件相关视图的查询计划
+        """
+        first = self.assertNoFullScan('get', reverse('content_generator:event_list'))
+        self.assertNoFullScan('get', reverse('content_generator:event_list'), data={
+            'fragment': 1,
+            'cursor': first.context['next_cursor'],
+        })
+        self.assertNoFullScan('post', reverse('content_generator:add_event'), data={
+            'title': '新事件',
+            'content': '内容',
+            'mood': '😄',
+        })
+        self.assertNoFullScan('post', reverse('content_generator:generate_content', args=[self.event.id]))
+
+    def test_summary_views(self):
+        """
+        测试日总结相关视图的查询计划
+        """
+        self.assertNoFullScan('get', reverse('content_generator:daily_summary'))
+        self.assertNoFullScan('post', reverse('content_generator:daily_summary'), data={
+            'date': timezone.now().date().isoformat(),
+            'summary': '总结',
+        })
+        self.assertNoFullScan('get', reverse('content_generator:generate_daily_summary'))
+
+    def test_search_views(self):
+        """
+        测试搜索和标题联想的查询计划
+        """
+        self.assertNoFullScan('get', reverse('content_generator:search'), data={'q': '任务'})
+        self.assertNoFullScan('get', reverse('content_generator:search'), data={'q': 'summary'})
+        self.assertNoFullScan('get', reverse('content_generator:typeahead'), data={'q': '事件'})
+
+    def test_calendar_and_job_views(self):
+        """
+        测试心情日历和LLM任务状态的查询计划
+        """
+        self.assertNoFullScan('get', reverse('content_generator:mood_calendar'))
+        job = LLMJob.objects.create(user=self.user, advice_type='task', related_id=self.task.id)
+        self.assertNoFullScan('get', reverse('content_generator:llm_job_status', args=[job.id]))
+
+    def test_stream_and_worker_paths(self):
+        """
+        测试流式生成以及后台执行者领取、续约、完成任务的查询计划
+        """
+        with mock.patch('content_generator.views.stream_content_with_llm', return_value=iter(['文案'])):
+            self.assertNoFullScan('post', reverse('content_generator:stream_content', args=[self.event.id]))
+
+        self.client.post(reverse('content_generator:add_task'), {'title': '排队', 'priority': 'low', 'willingness': '😐'})
+        with self.assertNoFullScanDuring('run_llm_worker'):
+            call_command('run_llm_worker', '--once', stdout=StringIO())
+
+    def test_media_and_upload_views(self):
+        """
+        测试按需缩放图片和断点续传上传的查询计划
+        """
+        data = make_jpeg(400, 300)
+        event = Event.objects.create(
+            user=self.user, title='图片', content='内容',
+            image=SimpleUploadedFile('photo.jpg', data, content_type='image/jpeg'),
+        )
+        self.assertNoFullScan('get', event.resized_url(200, 'webp'))
+
+        upload_id = self.assertNoFullScan(
+            'post', reverse('content_generator:create_upload'),
+            data={'filename': 'photo.jpg', 'size': len(data)}, content_type='application/json',
+        ).json()['id']
+        session_url = reverse('content_generator:upload_session', args=[upload_id])
+        self.assertNoFullScan('put', session_url, data=data, content_type='application/octet-stream',
+                              headers={'content-range': f'bytes 0-{len(data) - 1}/{len(data)}'})
+        self.assertNoFullScan('get', session_url)
+        self.assertNoFullScan('post', reverse('content_generator:finalize_upload', args=[upload_id]))
+        self.assertNoFullScan('post', reverse('content_generator:add_event'), data={
+            'title': '上传的图片', 'content': '内容', 'mood': '😄', 'upload_id': upload_id,
+        })
+        # 删除事件减少图片引用数；gc_media 会有意读取全部事件图片作为保护名单，不在此检查
+        with self.assertNoFullScanDuring('delete event'):
+            event.delete()
+
+    @unittest.skipUnless(HAS_NUMPY, '需要安装 numpy')
+    def test_numpy_views(self):
+        """
+        测试任务分析和相似回忆的查询计划
+        """
+        self.assertNoFullScan('get', reverse('content_generator:task_analytics'))
+        self.assertNoFullScan('get', reverse('content_generator:similar_events', args=[self.event.id]))
@@ -0,0 +1,253 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from PIL import Image
+from .models import Event
+from . import resize
+from .resize import ResizeCache, image_version
+from .test_images import make_jpeg
+
+
+class ResizedImageTest(TestCase):
+    """
+    按需缩放图片接口测试
+    """
+
+    def setUp(self):
+        """
+        测试前的准备工作
+        """
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=os.path.join(root, 'media'),
+            IMAGE_VARIANTS={'WIDTHS': [320], 'QUALITY': 80, 'WORKERS': 0, 'MAX_PENDING': 4},
+            IMAGE_RESIZE={'WIDTHS': [200, 1920], 'FORMATS': ['webp', 'jpeg'], 'QUALITY': 80,
+                          'CACHE_DIR': os.path.join(root, 'cache'), 'MAX_CACHE_BYTES': 1024 * 1024},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.cache_dir = os.path.join(root, 'cache')
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+        self.event = Event.objects.create(
+            user=self.user, title='事件', content='内容',
+            image=SimpleUploadedFile('photo.jpg', make_jpeg(800, 600), content_type='image/jpeg'),
+        )
+
+    def get(self, width, image_format='webp', **extra):
+        """
+        请求缩放后的图片
+        """
+        response = self.client.get(self.event.resized_url(width, image_format), **extra)
+        if response.status_code == 200:
+            self.addCleanup(response.close)
+        return response
+
+    def test_resize_and_cache_headers(self):
+        """
+        测试缩放结果、强 ETag 和 immutable 缓存头，If-None-Match 命中时返回304
+        """
+        response = self.get(200)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+        etag = response['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        image = Image.open(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual((image.format, image.size), ('WEBP', (200, 150)))
+
+        self.assertEqual(self.get(200, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertNotEqual(self.get(200, 'jpeg')['ETag'], etag)
+
+        # 不放大
+        response = self.get(1920, 'jpeg')
+        self.assertEqual(Image.open(BytesIO(b''.join(response.streaming_content))).size, (800, 600))
+
+    def test_rejects_unlisted_sizes_and_stale_versions(self):
+        """
+        测试白名单外的尺寸、格式、过期的版本和他人的事件返回404
+        """
+        self.assertEqual(self.get(300).status_code, 404)
+        self.assertEqual(self.get(200, 'png').status_code, 404)
+        old_url = self.event.resized_url(200)
+        self.event.image = SimpleUploadedFile('new.jpg', make_jpeg(400, 300, color='blue'), content_type='image/jpeg')
+        self.event.save()
+        self.assertEqual(self.client.get(old_url).status_code, 404)
+        self.assertNotEqual(self.event.resized_url(200), old_url)
+
+        User.objects.create_user(username='other', password='testpass123')
+        self.client.login(username='other', password='testpass123')
+        self.assertEqual(self.get(200).status_code, 404)
+
+    def test_rendered_once(self):
+        """
+        测试同一尺寸只缩放一次，之后从磁盘缓存读取
+        """
+        with mock.patch('content_generator.views.render_resized', wraps=resize.render_resized) as render:
+            first = b''.join(self.get(200).streaming_content)
+            second = b''.join(self.get(200).streaming_content)
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(first, second)
+
+    def test_etag_computed_once(self):
+        """
+        测试每个请求只计算一次 ETag
+        """
+        with mock.patch('content_generator.views.resize_key', wraps=resize.resize_key) as key:
+            response = self.get(200)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(key.call_count, 1)
+
+    def test_unavailable_result_is_503(self):
+        """
+        测试重试后仍没有缩放结果时返回503而不是未处理的异常
+        """
+        with mock.patch.object(ResizeCache, 'fill'):
+            response = self.get(200)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(response.json()['success'])
+
+    def test_version_follows_image(self):
+        """
+        测试地址中的版本由图片文件名决定
+        """
+        self.assertIn(f'/{image_version(self.event.image.name)}/200.webp', self.event.resized_url(200, 'webp'))
+
+
+class ResizeCacheTest(TestCase):
+    """
+    缩放结果磁盘缓存测试
+    """
+
+    def setUp(self):
+        """
+        测试前的准备工作
+        """
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def read(self, cache, key, data):
+        """
+        读取缓存，未命中时写入 data
+        """
+        with cache.open(key, 'bin', lambda: data) as f:
+            return f.read()
+
+    def test_evicts_least_recently_used(self):
+        """
+        测试超过上限时淘汰最久未访问的文件
+        """
+        cache = ResizeCache(self.directory, max_bytes=250)
+        self.read(cache, 'aa1', b'a' * 100)
+        self.read(cache, 'bb2', b'b' * 100)
+        old = time.time() - 60
+        os.utime(cache.path('aa1', 'bin'), (old, old))
+        os.utime(cache.path('bb2', 'bin'), (old - 60, old - 60))
+        # 访问 bb2 使其成为最近使用
+        self.read(cache, 'bb2', b'')
+        self.read(cache, 'cc3', b'c' * 100)
+        self.assertFalse(cache.path('aa1', 'bin').exists())
+        self.assertTrue(cache.path('bb2', 'bin').exists())
+        self.assertTrue(cache.path('cc3', 'bin').exists())
+
+    def test_concurrent_requests_coalesced(self):
+        """
+        测试同一个键的并发请求只生成一次
+        """
+        cache = ResizeCache(self.directory, max_bytes=1024)
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def render():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return b'data'
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(cache.open('key', 'bin', render).read()))
+        leader.start()
+        started.wait(5)
+        followers = [
+            threading.Thread(target=lambda: results.append(cache.open('key', 'bin', render).read()))
+            for _ in range(3)
+        ]
+        for thread in followers:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [b'data'] * 4)
+
+    def test_waits_for_other_process(self):
+        """
+        测试锁文件已被其他进程创建时不生成，等待其写入结果
+        """
+        cache = ResizeCache(self.directory, max_bytes=1024)
+        path = cache.path('key', 'bin')
+        path.parent.mkdir(parents=True)
+        lock_path = path.with_name('.key.lock')
+        lock_path.touch()
+
+        def other_process():
+            time.sleep(0.2)
+            cache.write(path, b'other')
+            lock_path.unlink()
+
+        thread = threading.Thread(target=other_process)
+        thread.start()
+        with cache.open('key', 'bin', lambda: b'self') as f:
+            self.assertEqual(f.read(), b'other')
+        thread.join(5)
+
+    def test_stale_lock_taken_over(self):
+        """
+        测试领头者退出后留下的过期锁文件被接手
+        """
+        cache = ResizeCache(self.directory, max_bytes=1024)
+        lock_path = cache.path('key', 'bin').with_name('.key.lock')
+        lock_path.parent.mkdir(parents=True)
+        lock_path.touch()
+        old = time.time() - resize.FLIGHT_STALE_SECONDS - 1
+        os.utime(lock_path, (old, old))
+        self.assertEqual(self.read(cache, 'key', b'data'), b'data')
+        self.assertFalse(lock_path.exists())
+
+    def test_slow_leader_not_taken_over(self):
+        """
+        测试超过等待时间但未过期的锁文件不会被接手，领头者完成后直接读取结果
+        """
+        cache = ResizeCache(self.directory, max_bytes=1024)
+        path = cache.path('key', 'bin')
+        path.parent.mkdir(parents=True)
+        lock_path = path.with_name('.key.lock')
+        lock_path.touch()
+        started = time.time() - resize.FLIGHT_WAIT_SECONDS - 1
+        os.utime(lock_path, (started, started))
+
+        def slow_leader():
+            time.sleep(0.2)
+            cache.write(path, b'leader')
+            lock_path.unlink()
+
+        thread = threading.Thread(target=slow_leader)
+        thread.start()
+        render = mock.Mock(return_value=b'again')
+        with cache.open('key', 'bin', render) as f:
+            self.assertEqual(f.read(), b'leader')
+        thread.join(5)
+        render.assert_not_called()
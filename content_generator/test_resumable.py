@@ -0,0 +1,171 @@
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from .models import Event, UploadSession
+from .resumable import part_path, result_path, staging_dir
+from .test_images import make_jpeg
+
+
+class ResumableUploadTest(TestCase):
+    """
+    断点续传上传测试
+    """
+
+    def setUp(self):
+        """
+        测试前的准备工作
+        """
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=os.path.join(root, 'media'),
+            RESUMABLE_UPLOADS={'DIR': os.path.join(root, 'staging'), 'CHUNK_SIZE': 1000, 'EXPIRY': 3600},
+            IMAGE_VARIANTS={'WIDTHS': [320], 'QUALITY': 80, 'WORKERS': 0, 'MAX_PENDING': 4},
+            IMAGE_UPLOADS={'MAX_BYTES': 1024 * 1024, 'MAX_PIXELS': 4_000_000, 'MAX_SIDE': 1000},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+        self.data = make_jpeg(400, 300)
+
+    def create(self, size=None, filename='photo.jpg'):
+        """
+        创建上传会话
+        """
+        response = self.client.post(
+            reverse('content_generator:create_upload'),
+            {'filename': filename, 'size': len(self.data) if size is None else size},
+            content_type='application/json',
+        )
+        return response
+
+    def put(self, upload_id, start, chunk, total=None):
+        """
+        上传一个分片
+        """
+        total = len(self.data) if total is None else total
+        return self.client.put(
+            reverse('content_generator:upload_session', args=[upload_id]),
+            chunk,
+            content_type='application/octet-stream',
+            headers={'content-range': f'bytes {start}-{start + len(chunk) - 1}/{total}'},
+        )
+
+    def finalize(self, upload_id):
+        """
+        完成上传
+        """
+        return self.client.post(reverse('content_generator:finalize_upload', args=[upload_id]))
+
+    def upload_all(self, upload_id):
+        """
+        按会话的分片大小上传全部数据
+        """
+        for start in range(0, len(self.data), 1000):
+            response = self.put(upload_id, start, self.data[start:start + 1000])
+            self.assertEqual(response.status_code, 200)
+
+    def test_upload_resume_and_attach(self):
+        """
+        测试分片上传、断点续传、完成后随事件表单保存
+        """
+        response = self.create()
+        self.assertEqual(response.status_code, 201)
+        upload_id = response.json()['id']
+        self.assertEqual(response.json()['chunk_size'], 1000)
+
+        self.assertEqual(self.put(upload_id, 0, self.data[:1000]).json()['offset'], 1000)
+        # 重发已收到的分片（客户端没收到响应）得到409和当前进度
+        response = self.put(upload_id, 0, self.data[:1000])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 1000)
+        # 还没收齐时不能完成
+        self.assertEqual(self.finalize(upload_id).status_code, 409)
+
+        status = self.client.get(reverse('content_generator:upload_session', args=[upload_id])).json()
+        for start in range(status['offset'], len(self.data), 1000):
+            self.assertEqual(self.put(upload_id, start, self.data[start:start + 1000]).status_code, 200)
+        response = self.finalize(upload_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['finalized'])
+
+        response = self.client.post(reverse('content_generator:add_event'), {
+            'title': '事件', 'content': '内容', 'mood': '😄', 'upload_id': upload_id,
+        })
+        self.assertEqual(response.status_code, 302)
+        event = Event.objects.get()
+        with event.image.open('rb') as f, Image.open(f) as image:
+            self.assertEqual(image.size, (400, 300))
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertEqual(list(staging_dir().iterdir()), [])
+
+    def test_rejects_non_image_on_first_chunk(self):
+        """
+        测试第一个分片不是图片时拒绝并删除会话
+        """
+        upload_id = self.create(size=2000).json()['id']
+        response = self.put(upload_id, 0, b'%PDF-1.7' + b'0' * 992, total=2000)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_rejects_invalid_sessions(self):
+        """
+        测试文件过大、分片过大、他人的会话
+        """
+        self.assertEqual(self.create(size=2 * 1024 * 1024).status_code, 400)
+
+        upload_id = self.create().json()['id']
+        self.assertEqual(self.put(upload_id, 0, self.data[:1001]).status_code, 413)
+
+        other = User.objects.create_user(username='other', password='testpass123')
+        self.client.force_login(other)
+        self.assertEqual(self.put(upload_id, 0, self.data[:1000]).status_code, 404)
+
+    def test_unfinished_upload_rejected_by_form(self):
+        """
+        测试未完成或不存在的会话不能用于保存事件
+        """
+        upload_id = self.create().json()['id']
+        for value in (upload_id, 'not-a-uuid'):
+            response = self.client.post(reverse('content_generator:add_event'), {
+                'title': '事件', 'content': '内容', 'mood': '😄', 'upload_id': value,
+            })
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('image', response.context['form'].errors)
+        self.assertFalse(Event.objects.exists())
+
+    def test_purge_expired(self):
+        """
+        测试清理过期会话和孤立文件
+        """
+        upload_id = self.create().json()['id']
+        self.upload_all(upload_id)
+        session = UploadSession.objects.get()
+        active_id = self.create().json()['id']
+        UploadSession.objects.filter(pk=upload_id).update(expires_at=timezone.now() - timedelta(seconds=1))
+        orphan = staging_dir() / 'orphan.part'
+        orphan.touch()
+        old = time.time() - 7200
+        os.utime(orphan, (old, old))
+
+        # 过期的会话不再接受请求
+        self.assertEqual(self.finalize(upload_id).status_code, 404)
+
+        out = StringIO()
+        call_command('purge_uploads', stdout=out)
+        self.assertIn('1 个过期会话，1 个孤立文件', out.getvalue())
+        self.assertFalse(part_path(session).exists())
+        self.assertFalse(result_path(session).exists())
+        self.assertFalse(orphan.exists())
+        self.assertEqual([str(pk) for pk in UploadSession.objects.values_list('pk', flat=True)], [active_id])
@@ -0,0 +1,113 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from .models import Task, Event, DailySummary
+from .search import search
+
+
+class SearchTest(TestCase):
+    """
+    全文搜索测试
+    """
+
+    def setUp(self):
+        """
+        测试前的准备工作
+        """
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.other = User.objects.create_user(username='other', password='testpass123')
+        self.task = Task.objects.create(user=self.user, title='整理季度报告', description='汇总销售数据和客户反馈')
+        self.event = Event.objects.create(user=self.user, title='周末爬山', content='和朋友去香山看红叶，<b>风景</b>很好')
+        DailySummary.objects.create(user=self.user, date=timezone.localdate(), summary='今天完成了季度报告的初稿')
+        Task.objects.create(user=self.other, title='别人的季度报告')
+
+    def test_ranked_results_with_snippets(self):
+        """
+        测试搜索结果只包含当前用户的记录，并带有高亮片段
+        """
+        results = search(self.user, '季度报告')
+        self.assertEqual({result['kind'] for result in results}, {'task', 'summary'})
+        task_result = next(result for result in results if result['kind'] == 'task')
+        self.assertEqual(task_result['id'], self.task.pk)
+        self.assertIn('<mark>季度报告</mark>', task_result['snippet'])
+
+    def test_snippet_is_escaped(self):
+        """
+        测试片段中的用户内容已转义
+        """
+        results = search(self.user, '看红叶')
+        self.assertEqual([(result['kind'], result['id']) for result in results], [('event', self.event.pk)])
+        self.assertIn('&lt;b&gt;', results[0]['snippet'])
+
+    def test_index_follows_changes(self):
+        """
+        测试修改和删除后索引同步
+        """
+        self.task.title = '准备年度计划'
+        self.task.save()
+        self.assertEqual([result['kind'] for result in search(self.user, '季度报告')], ['summary'])
+        self.assertEqual(search(self.user, '年度计划')[0]['id'], self.task.pk)
+
+        self.event.delete()
+        self.assertEqual(search(self.user, '看红叶'), [])
+
+    def test_short_terms(self):
+        """
+        测试少于3个字符的词也能搜索到
+        """
+        results = search(self.user, '红叶')
+        self.assertEqual([(result['kind'], result['id']) for result in results], [('event', self.event.pk)])
+        self.assertIn('<mark>红叶</mark>', results[0]['snippet'])
+
+    def test_short_terms_only_match_own_records(self):
+        """
+        测试短词搜索只匹配当前用户，且不区分大小写
+        """
+        Event.objects.create(user=self.other, title='红叶', content='别人的红叶')
+        Task.objects.create(user=self.user, title='Review PR', description='')
+        self.assertEqual([result['id'] for result in search(self.user, '红叶')], [self.event.pk])
+        self.assertIn('<mark>PR</mark>', search(self.user, 'pr')[0]['snippet'])
+
+    def test_owner_is_matched_exactly(self):
+        """
+        测试用户标记按整体匹配，用户1不会匹配到用户12的记录
+        """
+        similar = User.objects.create_user(id=self.user.pk * 10 + 2, username='similar', password='testpass123')
+        Task.objects.create(user=similar, title='相似用户的季度报告')
+        self.assertEqual({result['kind'] for result in search(self.user, '季度报告')}, {'task', 'summary'})
+        self.assertEqual(len(search(self.user, '季度')), 2)
+
+    def test_rebuild_command(self):
+        """
+        测试重建命令修复绕过信号的批量修改
+        """
+        Event.objects.filter(pk=self.event.pk).update(content='去海边看日出')
+        self.assertEqual(search(self.user, '看日出'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(search(self.user, '看日出')[0]['id'], self.event.pk)
+        self.assertEqual(search(self.user, '日出')[0]['id'], self.event.pk)
+
+    def test_rebuild_single_user(self):
+        """
+        测试只重建指定用户时不影响其他用户的索引
+        """
+        call_command('rebuild_search_index', '--user', 'other', stdout=StringIO())
+        self.assertEqual(len(search(self.user, '季度报告')), 2)
+        self.assertEqual(len(search(self.user, '红叶')), 1)
+        self.assertEqual(len(search(self.other, '季度报告')), 1)
+        self.assertEqual(len(search(self.other, '报告')), 1)
+
+    def test_search_view(self):
+        """
+        测试搜索接口
+        """
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(reverse('content_generator:search'), {'q': '季度报告', 'limit': 1})
+        data = response.json()
+        self.assertEqual(data['query'], '季度报告')
+        self.assertEqual(len(data['results']), 1)
+        self.assertEqual(self.client.get(reverse('content_generator:search')).json()['results'], [])
@@ -0,0 +1,94 @@
+import importlib.util
+import shutil
+import tempfile
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+from .models import Event
+
+HAS_NUMPY = importlib.util.find_spec('numpy') is not None
+
+
+@skipUnless(HAS_NUMPY, '需要安装 numpy')
+class SimilarEventsTest(TestCase):
+    """
+    相似回忆测试
+    """
+
+    def setUp(self):
+        """
+        测试前的准备工作
+        """
+        self.vectors_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.vectors_dir, ignore_errors=True)
+        settings_override = override_settings(EVENT_VECTORS_DIR=self.vectors_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+        self.hiking = Event.objects.create(user=self.user, title='周末爬山', content='和朋友去香山爬山看红叶')
+        self.hiking2 = Event.objects.create(user=self.user, title='又去爬山', content='秋天的香山红叶更红了')
+        self.cooking = Event.objects.create(user=self.user, title='学做饭', content='第一次做红烧肉，味道不错')
+        other = User.objects.create_user(username='other', password='testpass123')
+        Event.objects.create(user=other, title='爬山', content='香山爬山看红叶')
+
+    def similar_ids(self, event):
+        """
+        请求相似回忆接口，返回事件ID列表
+        """
+        response = self.client.get(reverse('content_generator:similar_events', args=[event.pk]))
+        self.assertEqual(response.status_code, 200)
+        return [result['id'] for result in response.json()['results']]
+
+    def test_ranked_by_similarity(self):
+        """
+        测试相似事件排在前面，不包含自身和其他用户的事件
+        """
+        ids = self.similar_ids(self.hiking)
+        self.assertEqual(ids[0], self.hiking2.pk)
+        self.assertNotIn(self.hiking.pk, ids)
+        self.assertLessEqual(set(ids), {self.hiking2.pk, self.cooking.pk})
+
+    def test_incremental_updates_and_compaction(self):
+        """
+        测试事件修改、删除后增量更新，压缩后结果不变
+        """
+        self.similar_ids(self.hiking)
+        self.cooking.title = '周末又去爬山'
+        self.cooking.content = '香山的红叶，和朋友一起爬山'
+        self.cooking.save()
+        self.hiking2.delete()
+        new_event = Event.objects.create(user=self.user, title='看电影', content='周末看了一部科幻片')
+
+        ids = self.similar_ids(self.hiking)
+        self.assertEqual(ids[0], self.cooking.pk)
+        self.assertNotIn(self.hiking2.pk, ids)
+
+        call_command('compact_event_vectors', stdout=StringIO())
+        self.assertEqual(self.similar_ids(self.hiking), ids)
+        self.assertNotIn(new_event.pk, self.similar_ids(new_event))
+
+        call_command('compact_event_vectors', rebuild=True, stdout=StringIO())
+        self.assertEqual(self.similar_ids(self.hiking), ids)
+
+    def test_torn_append_is_ignored_and_truncated(self):
+        """
+        测试追加中断留下的不完整记录在读取时被忽略，下次追加前截掉
+        """
+        from .similar import get_vector_store
+
+        ids = self.similar_ids(self.hiking)
+        store = get_vector_store()
+        path = store.path(self.user.pk)
+        with open(path, 'ab') as f:
+            f.write(b'\0' * (store.dtype.itemsize // 2))
+        self.assertEqual(self.similar_ids(self.hiking), ids)
+
+        new_event = Event.objects.create(user=self.user, title='再去爬山', content='香山红叶，和朋友爬山')
+        self.assertEqual(path.stat().st_size % store.dtype.itemsize, 0)
+        self.assertIn(new_event.pk, self.similar_ids(self.hiking))
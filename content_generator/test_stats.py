@@ -0,0 +1,459 @@
+import importlib
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import F
+from django.db.migrations.loader import MigrationLoader
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.utils import timezone
+from .models import Task, Event, DailySummary, DailyRollup, UserStats
+from .stats import (
+    get_task_stats, get_event_stats, compute_user_stats, compute_streaks, get_summary_streaks,
+    get_daily_task_counts, compute_daily_rollups, rebuild_daily_rollups,
+)
+from . import stats
+
+
+class TaskStatsTest(TestCase):
+    """
+    任务统计服务测试
+    """
+
+    def setUp(self):
+        """
+        测试前的准备工作
+        """
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.other = User.objects.create_user(username='other', password='testpass123')
+        now = timezone.now()
+
+        Task.objects.create(user=self.user, title='高-完成', priority='high', completed=True)
+        Task.objects.create(user=self.user, title='高-逾期', priority='high', due_date=now - timedelta(days=1))
+        Task.objects.create(user=self.user, title='低', priority='low', due_date=now + timedelta(days=1))
+        Task.objects.create(user=self.other, title='他人任务', priority='medium')
+
+    def test_stats_queries(self):
+        """
+        测试统计信息只需主键查询加一次逾期计数
+        """
+        get_task_stats(self.user)
+        with self.assertNumQueries(2):
+            stats = get_task_stats(self.user)
+
+        self.assertEqual(stats['total_tasks'], 3)
+        self.assertEqual(stats['completed_tasks'], 1)
+        self.assertEqual(stats['pending_tasks'], 2)
+        self.assertEqual(stats['overdue_tasks'], 1)
+        self.assertEqual(stats['completion_rate'], 33)
+        self.assertEqual(stats['high_priority_count'], 2)
+        self.assertEqual(stats['medium_priority_count'], 0)
+        self.assertEqual(stats['low_priority_count'], 1)
+        self.assertEqual(stats['high_priority_percent'], 100)
+        self.assertEqual(stats['low_priority_percent'], 50)
+
+    def test_stats_empty(self):
+        """
+        测试没有任务时的统计信息
+        """
+        stats = get_task_stats(User.objects.create_user(username='empty'))
+        self.assertEqual(stats['total_tasks'], 0)
+        self.assertEqual(stats['completion_rate'], 0)
+        self.assertEqual(stats['high_priority_percent'], 0)
+
+
+class UserStatsSignalTest(TestCase):
+    """
+    用户统计增量维护测试
+    """
+
+    def setUp(self):
+        """
+        测试前的准备工作
+        """
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        UserStats.objects.create(user=self.user)
+
+    def assertStatsConsistent(self):
+        """
+        断言增量维护的统计与全量计算一致
+        """
+        stats = UserStats.objects.get(user=self.user)
+        for field, value in compute_user_stats(self.user).items():
+            self.assertEqual(getattr(stats, field), value, field)
+
+    def test_task_changes(self):
+        """
+        测试任务新建、修改和删除后统计保持一致
+        """
+        task = Task.objects.create(user=self.user, title='任务', priority='low')
+        self.assertStatsConsistent()
+
+        task.completed = True
+        task.priority = 'high'
+        task.save()
+        self.assertStatsConsistent()
+
+        # 重新加载后修改
+        task = Task.objects.get(pk=task.pk)
+        task.completed = False
+        task.save()
+        self.assertStatsConsistent()
+
+        task.delete()
+        self.assertStatsConsistent()
+
+    def test_event_and_summary_changes(self):
+        """
+        测试事件和日总结变更后统计保持一致
+        """
+        event = Event.objects.create(user=self.user, title='事件', content='内容', mood='😄')
+        DailySummary.objects.create(user=self.user, date=timezone.now().date(), summary='总结')
+        self.assertStatsConsistent()
+
+        event.mood = '😢'
+        event.image = 'events/photo.jpg'
+        event.save()
+        self.assertStatsConsistent()
+
+        Event.objects.filter(pk=event.pk).delete()
+        DailySummary.objects.filter(user=self.user).delete()
+        self.assertStatsConsistent()
+
+    def test_rebuild_command(self):
+        """
+        测试重建命令修复绕过信号的批量修改
+        """
+        Task.objects.create(user=self.user, title='任务')
+        Task.objects.filter(user=self.user).update(completed=True)
+        call_command('rebuild_user_stats', stdout=StringIO())
+        self.assertStatsConsistent()
+
+
+class DailyRollupTest(TestCase):
+    """
+    每日汇总增量维护测试
+    """
+
+    def setUp(self):
+        """
+        测试前的准备工作
+        """
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        UserStats.objects.create(user=self.user)
+
+    def assertRollupsConsistent(self):
+        """
+        断言增量维护的每日汇总与全量计算一致（全为0的行视为不存在）
+        """
+        fields = [field.name for field in DailyRollup._meta.fields if field.name.startswith(('tasks_', 'events_'))]
+        expected = {}
+        for key, counts in compute_daily_rollups([self.user.pk]).items():
+            counts = {field: counts.get(field, 0) for field in fields}
+            if any(counts.values()):
+                expected[key] = counts
+        actual = {}
+        for rollup in DailyRollup.objects.filter(user=self.user):
+            counts = {field: getattr(rollup, field) for field in fields}
+            if any(counts.values()):
+                actual[(rollup.user_id, rollup.date)] = counts
+        self.assertEqual(actual, expected)
+
+    def test_incremental_changes(self):
+        """
+        测试任务和事件新建、修改、删除后汇总保持一致
+        """
+        task = Task.objects.create(user=self.user, title='任务', priority='low', willingness='😭')
+        event = Event.objects.create(user=self.user, title='事件', content='内容', mood='😄')
+        self.assertRollupsConsistent()
+        rollup = DailyRollup.objects.get(user=self.user, date=timezone.localdate())
+        self.assertEqual(rollup.tasks_created, 1)
+        self.assertEqual(rollup.tasks_willingness_very_low, 1)
+        self.assertEqual(rollup.events_happy, 1)
+
+        task.completed = True
+        task.priority = 'high'
+        task.willingness = '😄'
+        task.save()
+        event.mood = '😢'
+        event.image = 'events/photo.jpg'
+        event.save()
+        self.assertRollupsConsistent()
+
+        # 修改创建时间后计入新的日期
+        task = Task.objects.get(pk=task.pk)
+        task.created_at = timezone.now() - timedelta(days=3)
+        task.save()
+        self.assertRollupsConsistent()
+
+        task.delete()
+        event.delete()
+        self.assertRollupsConsistent()
+
+    def test_event_stats_from_rollups(self):
+        """
+        测试今日/本周/本月事件数来自每日汇总
+        """
+        Event.objects.create(user=self.user, title='事件', content='内容')
+        self.assertEqual(get_event_stats(self.user, timezone.localdate())['today_events'], 1)
+        DailyRollup.objects.filter(user=self.user).update(events_created=5)
+        self.assertEqual(get_event_stats(self.user, timezone.localdate())['today_events'], 5)
+
+    def test_backfill_command(self):
+        """
+        测试回填命令修复绕过信号的批量修改
+        """
+        Task.objects.create(user=self.user, title='任务')
+        Event.objects.create(user=self.user, title='事件', content='内容')
+        Task.objects.filter(user=self.user).update(completed=True, priority='high')
+        DailyRollup.objects.all().delete()
+
+        call_command('backfill_rollups', stdout=StringIO())
+        self.assertRollupsConsistent()
+        rollup = DailyRollup.objects.get(user=self.user)
+        self.assertEqual(rollup.tasks_completed, 1)
+        self.assertEqual(rollup.tasks_high, 1)
+        self.assertEqual(rollup.events_created, 1)
+
+        with self.assertRaises(CommandError):
+            call_command('backfill_rollups', since='2024-02-01', until='2024-01-01', stdout=StringIO())
+
+    def test_migration_backfills_rollups(self):
+        """
+        测试创建每日汇总表的迁移按已有数据回填
+        """
+        Task.objects.create(user=self.user, title='任务', priority='high')
+        Task.objects.create(user=self.user, title='旧任务', created_at=timezone.now() - timedelta(days=40))
+        Event.objects.create(user=self.user, title='事件', content='内容', mood='😄')
+        DailyRollup.objects.all().delete()
+
+        migration = importlib.import_module('content_generator.migrations.0010_dailyrollup')
+        state = MigrationLoader(connection).project_state(('content_generator', '0010_dailyrollup'))
+        migration.backfill_rollups(state.apps, None)
+        self.assertRollupsConsistent()
+        self.assertEqual(DailyRollup.objects.filter(user=self.user).count(), 2)
+
+    def test_rebuild_reads_after_removing_old_rows(self):
+        """
+        测试重建在删除（锁住）旧行之后才读取原始数据，期间的增量不会被覆盖
+        """
+        Task.objects.create(user=self.user, title='任务')
+        real_compute = stats.compute_daily_rollups
+
+        def compute(*args, **kwargs):
+            self.assertFalse(DailyRollup.objects.filter(user=self.user).exists())
+            return real_compute(*args, **kwargs)
+
+        with mock.patch('content_generator.stats.compute_daily_rollups', side_effect=compute) as patched:
+            self.assertEqual(rebuild_daily_rollups([self.user.pk]), 1)
+        patched.assert_called_once()
+        self.assertRollupsConsistent()
+
+
+class CreatedDateTest(TestCase):
+    """
+    创建日期字段测试
+    """
+
+    def setUp(self):
+        """
+        测试前的准备工作
+        """
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+
+    def test_created_date_uses_time_zone(self):
+        """
+        测试创建日期按 TIME_ZONE 而不是UTC计算
+        """
+        # UTC 17:00 在 Asia/Shanghai 已是次日 01:00
+        created_at = datetime(2026, 1, 1, 17, 0, tzinfo=dt_timezone.utc)
+        event = Event.objects.create(user=self.user, title='事件', content='内容', created_at=created_at)
+        task = Task.objects.create(user=self.user, title='任务', created_at=created_at)
+        self.assertEqual(event.created_date, date(2026, 1, 2))
+        self.assertEqual(Task.objects.get(pk=task.pk).created_date, date(2026, 1, 2))
+
+    def test_created_date_on_bulk_paths(self):
+        """
+        测试 bulk_create() 和 update(created_at=...) 同样维护创建日期，表达式必须同时给出创建日期
+        """
+        created_at = datetime(2026, 1, 1, 17, 0, tzinfo=dt_timezone.utc)
+        Task.objects.bulk_create([Task(user=self.user, title='批量', created_at=created_at)])
+        task = Task.objects.get(title='批量')
+        self.assertEqual(task.created_date, date(2026, 1, 2))
+
+        Task.objects.filter(pk=task.pk).update(created_at=created_at + timedelta(days=3))
+        self.assertEqual(Task.objects.get(pk=task.pk).created_date, date(2026, 1, 5))
+        with self.assertRaises(ValueError):
+            Event.objects.update(created_at=F('created_at'))
+
+    def test_event_stats_buckets(self):
+        """
+        测试今日/本周/本月事件计数
+        """
+        today = timezone.localdate()
+        Event.objects.create(user=self.user, title='今天', content='内容')
+        Event.objects.create(user=self.user, title='很久以前', content='内容',
+                             created_at=timezone.now() - timedelta(days=60))
+
+        stats = get_event_stats(self.user, today)
+        self.assertEqual(stats['total_events'], 2)
+        self.assertEqual(stats['today_events'], 1)
+        self.assertEqual(stats['this_week_events'], 1)
+        self.assertEqual(stats['this_month_events'], 1)
+
+
+class SummaryStreakTest(TestCase):
+    """
+    日总结连续天数测试
+    """
+
+    def setUp(self):
+        """
+        测试前的准备工作
+        """
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.today = timezone.localdate()
+
+    def add_summaries(self, *days_ago):
+        """
+        按距今天数创建日总结
+        """
+        for days in days_ago:
+            DailySummary.objects.create(user=self.user, date=self.today - timedelta(days=days), summary='总结')
+
+    def test_compute_streaks(self):
+        """
+        测试从倒序日期序列计算连续天数
+        """
+        d = date(2026, 3, 10)
+        dates = [d, d - timedelta(days=1), d - timedelta(days=3), d - timedelta(days=4), d - timedelta(days=5)]
+        streaks = compute_streaks(dates)
+        self.assertEqual(streaks['latest_date'], d)
+        self.assertEqual(streaks['latest_streak'], 2)
+        self.assertEqual(streaks['longest_streak'], 3)
+        self.assertEqual(compute_streaks([])['longest_streak'], 0)
+
+    def test_current_and_longest_streak(self):
+        """
+        测试当前连续天数只统计以今天结尾的一段
+        """
+        self.add_summaries(0, 1, 2, 5, 6, 7, 8)
+        self.assertEqual(get_summary_streaks(self.user, self.today), {'streak_days': 3, 'longest_streak': 4})
+
+    def test_no_summary_today(self):
+        """
+        测试今天没有总结时当前连续天数为0
+        """
+        self.add_summaries(1, 2)
+        self.assertEqual(get_summary_streaks(self.user, self.today)['streak_days'], 0)
+
+    def test_cached_until_summary_written(self):
+        """
+        测试结果被缓存（只查询版本），写入日总结后失效
+        """
+        self.add_summaries(1)
+        get_summary_streaks(self.user, self.today)
+        with self.assertNumQueries(1):
+            get_summary_streaks(self.user, self.today)
+
+        self.add_summaries(0)
+        self.assertEqual(get_summary_streaks(self.user, self.today)['streak_days'], 2)
+
+    def test_cache_follows_writes_without_signals(self):
+        """
+        测试其他进程写入或删除的日总结（本进程收不到信号）也会使缓存失效
+        """
+        self.add_summaries(1, 2)
+        self.assertEqual(get_summary_streaks(self.user, self.today)['longest_streak'], 2)
+
+        DailySummary.objects.bulk_create([DailySummary(user=self.user, date=self.today, summary='总结')])
+        self.assertEqual(get_summary_streaks(self.user, self.today)['streak_days'], 3)
+
+        DailySummary.objects.filter(user=self.user, date=self.today - timedelta(days=1))._raw_delete(connection.alias)
+        self.assertEqual(get_summary_streaks(self.user, self.today), {'streak_days': 1, 'longest_streak': 1})
+
+
+class GenerateSummariesTest(TestCase):
+    """
+    批量生成日总结测试
+    """
+
+    def setUp(self):
+        """
+        测试前的准备工作
+        """
+        self.day = timezone.localdate()
+        self.alice = User.objects.create_user(username='alice')
+        self.bob = User.objects.create_user(username='bob')
+        User.objects.create_user(username='inactive', is_active=False)
+        Task.objects.create(user=self.alice, title='写周报', priority='high', completed=True)
+        Task.objects.create(user=self.alice, title='开会', priority='high')
+        Task.objects.create(user=self.alice, title='整理', priority='low', completed=True)
+
+    def test_daily_task_counts_single_query(self):
+        """
+        测试多个用户的日任务计数通过一次查询得到
+        """
+        with self.assertNumQueries(1):
+            counts = get_daily_task_counts([self.alice.id, self.bob.id], self.day)
+        self.assertEqual(counts[self.alice.id], {'total': 3, 'completed': 2, 'high_total': 2, 'high_completed': 1})
+        self.assertEqual(counts[self.bob.id]['total'], 0)
+
+    def test_generates_for_users_active_that_day(self):
+        """
+        测试只为当天创建了任务或事件的用户生成日总结，--all-users 时为所有启用的账户生成
+        """
+        carol = User.objects.create_user(username='carol')
+        Event.objects.create(user=carol, title='散步', content='去公园散步')
+        dave = User.objects.create_user(username='dave')
+        Task.objects.create(user=dave, title='昨天的任务', created_at=timezone.now() - timedelta(days=1))
+
+        call_command('generate_summaries', '--workers', '1', stdout=StringIO())
+        summaries = DailySummary.objects.filter(date=self.day)
+        self.assertEqual(set(summaries.values_list('user__username', flat=True)), {'alice', 'carol'})
+        self.assertIn('2', summaries.get(user=self.alice).summary)
+        self.assertIn('高优先级', summaries.get(user=self.alice).work_evaluation)
+
+        call_command('generate_summaries', '--workers', '1', '--all-users', stdout=StringIO())
+        self.assertEqual(
+            set(DailySummary.objects.filter(date=self.day).values_list('user__username', flat=True)),
+            {'alice', 'bob', 'carol', 'dave'},
+        )
+
+    def test_resume_skips_existing(self):
+        """
+        测试重新运行时跳过已生成的用户，--force 时覆盖
+        """
+        DailySummary.objects.create(user=self.alice, date=self.day, summary='已有总结')
+        Task.objects.create(user=self.bob, title='买菜')
+        out = StringIO()
+        call_command('generate_summaries', '--workers', '1', '--date', self.day.isoformat(), stdout=out)
+        self.assertIn('生成 1 条', out.getvalue())
+        self.assertEqual(DailySummary.objects.get(user=self.alice, date=self.day).summary, '已有总结')
+
+        call_command('generate_summaries', '--workers', '1', '--force', stdout=StringIO())
+        self.assertNotEqual(DailySummary.objects.get(user=self.alice, date=self.day).summary, '已有总结')
+
+    def test_thread_pool(self):
+        """
+        测试使用线程池分批生成
+        """
+        for i in range(5):
+            Task.objects.create(user=User.objects.create_user(username=f'user{i}'), title='任务')
+        # 线程中的调用记录写入与本测试的事务无关，这里不记录
+        with mock.patch('content_generator.llm.record_call'):
+            call_command('generate_summaries', '--workers', '3', '--chunk-size', '2', stdout=StringIO())
+        self.assertEqual(DailySummary.objects.filter(date=self.day).count(), 6)
+
+    def test_invalid_date(self):
+        """
+        测试日期格式错误时报错
+        """
+        with self.assertRaises(CommandError):
+            call_command('generate_summaries', '--date', '2024/01/01', stdout=StringIO())
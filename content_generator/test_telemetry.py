@@ -0,0 +1,136 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from .models import Task, Event, LLMCall
+from .llm import generate_task_advice_with_llm, stream_content_with_llm
+from .llm_backends import LLMError
+from .telemetry import percentile, summarize_calls, SUMMARY_DAYS
+from .test_llm import StubServerMixin
+
+
+class TelemetryTest(StubServerMixin, TestCase):
+    """
+    LLM调用遥测测试
+    """
+
+    def setUp(self):
+        """
+        测试前的准备工作
+        """
+        super().setUp()
+        self.user = User.objects.create_user(username='testuser')
+        self.task = Task.objects.create(user=self.user, title='任务', priority='high')
+        self.backend = {
+            'BACKEND': 'content_generator.llm_backends.HTTPBackend',
+            'OPTIONS': {'url': self.url, 'max_retries': 0},
+        }
+
+    def test_records_template_call(self):
+        """
+        测试未配置后端时记录模板生成
+        """
+        with override_settings(LLM_BACKEND=None):
+            content = generate_task_advice_with_llm(self.task)
+        call = LLMCall.objects.get()
+        self.assertEqual((call.call_type, call.source), ('task', 'template'))
+        self.assertEqual(call.response_chars, len(content))
+        self.assertGreater(call.prompt_chars, 0)
+
+    def test_records_backend_cache_and_error(self):
+        """
+        测试记录后端调用的token用量、缓存命中和后端错误
+        """
+        with override_settings(LLM_BACKEND=self.backend):
+            generate_task_advice_with_llm(self.task)
+            generate_task_advice_with_llm(self.task)
+            self.server.config.error_rate = 1
+            other = Task.objects.create(user=self.user, title='另一个', priority='low')
+            with self.assertRaises(LLMError):
+                generate_task_advice_with_llm(other)
+
+        backend_call, cache_call, error_call = LLMCall.objects.order_by('id')
+        self.assertEqual(backend_call.source, 'backend')
+        self.assertEqual(backend_call.prompt_tokens, backend_call.prompt_chars)
+        self.assertIsNotNone(backend_call.completion_tokens)
+        self.assertEqual(cache_call.source, 'cache')
+        self.assertEqual(error_call.source, 'backend')
+        self.assertIn('503', error_call.error)
+
+    def test_records_stream_first_token(self):
+        """
+        测试流式生成记录首字耗时
+        """
+        event = Event.objects.create(user=self.user, title='散步', content='去公园散步')
+        with override_settings(LLM_BACKEND=self.backend):
+            content = ''.join(stream_content_with_llm(event))
+        call = LLMCall.objects.get()
+        self.assertEqual(call.call_type, 'event')
+        self.assertEqual(call.response_chars, len(content))
+        self.assertIsNotNone(call.first_token_ms)
+        self.assertLessEqual(call.first_token_ms, call.latency_ms)
+
+    def test_summary_percentiles(self):
+        """
+        测试按生成类型汇总延迟分位数和缓存命中率
+        """
+        LLMCall.objects.bulk_create(
+            [LLMCall(call_type='task', source='backend', latency_ms=ms) for ms in range(1, 101)]
+            + [LLMCall(call_type='summary', source='cache', latency_ms=1)]
+        )
+        # 一次分组聚合，每种类型再各取三个分位数
+        with self.assertNumQueries(1 + 2 * 3):
+            summary = {row['call_type']: row for row in summarize_calls(LLMCall.objects.all())}
+        self.assertEqual((summary['task']['p50'], summary['task']['p95'], summary['task']['p99']), (50, 95, 99))
+        self.assertEqual(summary['summary']['cache_hit_rate'], 1)
+        self.assertEqual(percentile([], 50), 0.0)
+        self.assertEqual(percentile(list(range(1, 101)), 95), 95)
+
+    def test_admin_changelist_shows_summary(self):
+        """
+        测试后台列表页展示汇总表
+        """
+        admin = User.objects.create_superuser(username='admin', password='testpass123')
+        self.client.force_login(admin)
+        LLMCall.objects.create(call_type='evaluation', source='backend', latency_ms=120)
+        response = self.client.get(reverse('admin:content_generator_llmcall_changelist'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['call_summary'][0]['p95'], 120)
+        self.assertContains(response, '工作评估')
+
+    def test_admin_summary_defaults_to_recent_window(self):
+        """
+        测试没有按日期筛选时只汇总最近几天，按日期筛选时汇总筛选范围
+        """
+        admin = User.objects.create_superuser(username='admin', password='testpass123')
+        self.client.force_login(admin)
+        old = timezone.now() - timedelta(days=SUMMARY_DAYS + 1)
+        LLMCall.objects.create(call_type='task', source='backend', latency_ms=100)
+        LLMCall.objects.create(call_type='task', source='backend', latency_ms=900, created_at=old)
+
+        response = self.client.get(reverse('admin:content_generator_llmcall_changelist'))
+        self.assertEqual(response.context['call_summary'][0]['count'], 1)
+        self.assertContains(response, f'最近 {SUMMARY_DAYS} 天')
+
+        response = self.client.get(reverse('admin:content_generator_llmcall_changelist'), {
+            'created_at__year': old.year,
+        })
+        self.assertIsNone(response.context['summary_days'])
+        self.assertIn(900, [row['p99'] for row in response.context['call_summary']])
+
+    def test_purge_old_calls(self):
+        """
+        测试删除早于保留期的调用记录
+        """
+        LLMCall.objects.create(call_type='task', source='backend', latency_ms=1)
+        LLMCall.objects.create(call_type='task', source='backend', latency_ms=1,
+                               created_at=timezone.now() - timedelta(days=40))
+        with override_settings(LLM_CALL_RETENTION_DAYS=30):
+            out = StringIO()
+            call_command('purge_llm_calls', stdout=out)
+        self.assertIn('已删除 1 条', out.getvalue())
+        self.assertEqual(LLMCall.objects.count(), 1)
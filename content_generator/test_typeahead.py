@@ -0,0 +1,96 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+from .models import Task, Event
+from .typeahead import TypeaheadIndex, get_typeahead_index
+
+
+class TypeaheadIndexTest(TestCase):
+    """
+    标题联想索引测试
+    """
+
+    def setUp(self):
+        """
+        测试前的准备工作
+        """
+        self.now = 0.0
+        self.index = TypeaheadIndex(max_users=2, ttl=60, clock=lambda: self.now)
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.report = Task.objects.create(user=self.user, title='整理季度报告')
+        self.plan = Task.objects.create(user=self.user, title='季度计划')
+        self.event = Event.objects.create(user=self.user, title='Weekly Review', content='内容')
+
+    def titles(self, query, user=None):
+        """
+        返回联想结果的标题
+        """
+        return [item['title'] for item in self.index.suggest((user or self.user).pk, query)]
+
+    def test_prefix_before_substring(self):
+        """
+        测试前缀匹配排在子串匹配之前，匹配不区分大小写
+        """
+        self.assertEqual(self.titles('季度'), ['季度计划', '整理季度报告'])
+        self.assertEqual(self.titles('季度报'), ['整理季度报告'])
+        self.assertEqual(self.titles('weekly re'), ['Weekly Review'])
+        self.assertEqual(self.titles('月度'), [])
+
+    def test_incremental_updates(self):
+        """
+        测试加载后的保存和删除直接更新索引
+        """
+        self.titles('季度')
+        self.report.title = '年度总结'
+        self.index.update(self.report)
+        self.plan.title = '季度会议'
+        self.index.update(self.plan)
+        self.index.remove(self.event)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.titles('季度'), ['季度会议'])
+            self.assertEqual(self.titles('年度总'), ['年度总结'])
+            self.assertEqual(self.titles('review'), [])
+
+    def test_lru_and_ttl(self):
+        """
+        测试超出用户上限时淘汰最久未使用的用户，过期后重新加载
+        """
+        others = [User.objects.create_user(username=f'user{i}', password='testpass123') for i in range(2)]
+        self.titles('季度')
+        for user in others:
+            self.titles('季度', user)
+        self.assertEqual(len(self.index), 2)
+        with self.assertNumQueries(2):
+            self.titles('季度')
+
+        Task.objects.filter(pk=self.plan.pk).update(title='季度复盘')
+        self.now += 61
+        self.assertEqual(self.titles('季度')[0], '季度复盘')
+
+
+@override_settings(TYPEAHEAD={'MAX_USERS': 10, 'TTL': 60})
+class TypeaheadViewTest(TestCase):
+    """
+    标题联想接口测试
+    """
+
+    def setUp(self):
+        """
+        测试前的准备工作
+        """
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+        Task.objects.create(user=self.user, title='整理季度报告')
+
+    def test_signals_update_loaded_index(self):
+        """
+        测试信号增量更新已加载的索引
+        """
+        url = reverse('content_generator:typeahead')
+        self.assertEqual(len(self.client.get(url, {'q': '季度'}).json()['suggestions']), 1)
+        task = Task.objects.create(user=self.user, title='季度计划')
+        self.assertEqual(get_typeahead_index().suggest(self.user.pk, '季度计划')[0]['id'], task.pk)
+        task.delete()
+        self.assertEqual(len(self.client.get(url, {'q': '季度'}).json()['suggestions']), 1)
+        self.assertEqual(self.client.get(url, {'q': ' '}).json()['suggestions'], [])
@@ -0,0 +1,186 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.files.uploadhandler import SkipFile
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+from PIL import Image
+from .models import Event
+from .test_images import make_jpeg
+from .uploads import EventImageUploadHandler, sniff_format, upload_config
+
+
+def make_png(width, height):
+    """
+    生成测试用的带透明通道的 PNG 图片
+    """
+    buffer = BytesIO()
+    Image.new('RGBA', (width, height), (255, 0, 0, 128)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class EventImageUploadTest(TestCase):
+    """
+    事件图片上传测试
+    """
+
+    def setUp(self):
+        """
+        测试前的准备工作
+        """
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root,
+            IMAGE_VARIANTS={'WIDTHS': [320], 'QUALITY': 80, 'WORKERS': 0, 'MAX_PENDING': 4},
+            IMAGE_UPLOADS={'MAX_BYTES': 1024 * 1024, 'MAX_PIXELS': 4_000_000, 'MAX_SIDE': 1000},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+
+    def upload(self, data, name='photo.jpg'):
+        """
+        提交带图片的事件表单
+        """
+        image = BytesIO(data)
+        image.name = name
+        return self.client.post(reverse('content_generator:add_event'), {
+            'title': '事件', 'content': '内容', 'mood': '😄', 'image': image,
+        })
+
+    def assertRejected(self, response, message):
+        """
+        断言图片被拒绝，表单带着错误重新显示
+        """
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(message, ' '.join(response.context['form'].errors['image']))
+        self.assertFalse(Event.objects.exists())
+
+    def test_exif_stripped_and_orientation_applied(self):
+        """
+        测试重新编码后按方向旋转、去掉 EXIF 并缩小到最长边以内
+        """
+        buffer = BytesIO()
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010f] = 'Camera'
+        Image.new('RGB', (1600, 1200), 'red').save(buffer, 'JPEG', exif=exif)
+        response = self.upload(buffer.getvalue())
+        self.assertEqual(response.status_code, 302)
+
+        event = Event.objects.get()
+        self.assertTrue(event.image.name.endswith('.jpg'))
+        with event.image.open('rb') as f, Image.open(f) as image:
+            self.assertEqual(image.size, (750, 1000))
+            self.assertEqual(dict(image.getexif()), {})
+
+    def test_transparent_png_kept_as_png(self):
+        """
+        测试带透明通道的图片保存为 PNG
+        """
+        response = self.upload(make_png(40, 30), name='icon.png')
+        self.assertEqual(response.status_code, 302)
+        event = Event.objects.get()
+        self.assertTrue(event.image.name.endswith('.png'))
+        with event.image.open('rb') as f, Image.open(f) as image:
+            self.assertEqual((image.format, image.mode), ('PNG', 'RGBA'))
+
+    def test_rejects_non_image(self):
+        """
+        测试魔数不是图片时拒绝
+        """
+        self.assertRejected(self.upload(b'%PDF-1.7\n' + b'0' * 1000, name='photo.jpg'), '只能上传')
+
+    def test_rejects_oversized_file(self):
+        """
+        测试超过字节上限时拒绝
+        """
+        data = make_jpeg(100, 100) + b'\0' * (1024 * 1024)
+        self.assertRejected(self.upload(data), '不能超过')
+
+    def test_rejects_too_many_pixels(self):
+        """
+        测试像素数超过上限时拒绝
+        """
+        self.assertRejected(self.upload(make_jpeg(3000, 2000)), '尺寸过大')
+
+    def test_rejects_truncated_image(self):
+        """
+        测试文件头完整但数据损坏时拒绝
+        """
+        self.assertRejected(self.upload(make_jpeg(200, 200)[:400]), '图片')
+
+    def test_event_without_image(self):
+        """
+        测试不带图片的表单不受影响
+        """
+        response = self.client.post(reverse('content_generator:add_event'), {
+            'title': '事件', 'content': '内容', 'mood': '😄',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Event.objects.get().image)
+
+    def test_csrf_still_enforced(self):
+        """
+        测试替换上传处理器后仍然校验 CSRF
+        """
+        self.client.handler.enforce_csrf_checks = True
+        response = self.client.post(reverse('content_generator:add_event'), {
+            'title': '事件', 'content': '内容', 'mood': '😄',
+        })
+        self.assertEqual(response.status_code, 403)
+
+
+class UploadHandlerTest(TestCase):
+    """
+    上传处理器测试
+    """
+
+    def new_handler(self, **config):
+        """
+        创建处理器并开始接收一个图片文件
+        """
+        handler = EventImageUploadHandler(config={**upload_config(), **config})
+        handler.new_file('image', 'photo.jpg', 'image/jpeg', None)
+        self.addCleanup(handler.upload_interrupted)
+        return handler
+
+    def test_sniff_format(self):
+        """
+        测试按魔数识别格式
+        """
+        self.assertEqual(sniff_format(make_jpeg(10, 10)[:12]), 'JPEG')
+        self.assertEqual(sniff_format(make_png(10, 10)[:12]), 'PNG')
+        self.assertEqual(sniff_format(b'RIFF\0\0\0\0WEBP'), 'WEBP')
+        self.assertIsNone(sniff_format(b'RIFF\0\0\0\0WAVE'))
+        self.assertIsNone(sniff_format(b'<svg xmlns='))
+
+    def test_rejects_on_first_chunk(self):
+        """
+        测试第一个数据块就能拒绝非图片和超大尺寸，不等待其余数据
+        """
+        handler = self.new_handler()
+        with self.assertRaises(SkipFile):
+            handler.receive_data_chunk(b'MZ' + b'\0' * 100, 0)
+
+        handler = self.new_handler(MAX_PIXELS=100)
+        with self.assertRaises(SkipFile):
+            handler.receive_data_chunk(make_jpeg(20, 20), 0)
+
+    def test_header_across_chunks(self):
+        """
+        测试文件头分散在多个数据块中时等到尺寸可解析再校验
+        """
+        data = make_jpeg(64, 48)
+        handler = self.new_handler()
+        for start in range(0, len(data), 10):
+            handler.receive_data_chunk(data[start:start + 10], start)
+        self.assertEqual(handler.dimensions, (64, 48))
+        upload = handler.file_complete(len(data))
+        self.addCleanup(upload.close)
+        self.assertEqual(upload.name, 'photo.jpg')
+        self.assertEqual(upload.size, len(upload.read()))
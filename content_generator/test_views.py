@@ -0,0 +1,155 @@
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.urls import reverse
+from .models import Task, Event
+from .pagination import paginate_by_cursor, decode_cursor
+
+MOBILE_UA = 'Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) Mobile Safari'
+
+
+class CursorPaginationTest(TestCase):
+    """
+    游标分页测试
+    """
+
+    def setUp(self):
+        """
+        测试前的准备工作
+        """
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        tasks = [Task.objects.create(user=self.user, title=f'任务{i}') for i in range(5)]
+        # 让部分记录共享同一创建时间，验证 id 作为次级排序键
+        Task.objects.filter(pk__in=[t.pk for t in tasks[:3]]).update(created_at=tasks[0].created_at)
+
+    def test_pages_cover_all_rows_once(self):
+        """
+        测试逐页翻完后每条记录恰好出现一次
+        """
+        queryset = Task.objects.filter(user=self.user)
+        seen = []
+        cursor = None
+        while True:
+            items, cursor = paginate_by_cursor(queryset, cursor, page_size=2)
+            seen.extend(item.pk for item in items)
+            if cursor is None:
+                break
+
+        expected = list(queryset.order_by('-created_at', '-id').values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor_returns_first_page(self):
+        """
+        测试无效游标退回第一页
+        """
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+        items, _ = paginate_by_cursor(Task.objects.filter(user=self.user), 'not-a-cursor', page_size=2)
+        self.assertEqual(len(items), 2)
+
+
+class ListViewsTest(TestCase):
+    """
+    列表页面视图测试
+    """
+
+    def setUp(self):
+        """
+        测试前的准备工作
+        """
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+        for i in range(25):
+            Task.objects.create(user=self.user, title=f'任务{i}')
+            Event.objects.create(user=self.user, title=f'事件{i}', content='内容')
+
+    def test_task_list_first_page(self):
+        """
+        测试任务列表只渲染第一页并提供下一页游标
+        """
+        response = self.client.get(reverse('content_generator:task_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['tasks']), 20)
+        self.assertIsNotNone(response.context['next_cursor'])
+        self.assertEqual(response.context['total_tasks'], 25)
+
+    def test_task_list_fragment(self):
+        """
+        测试加载更多返回剩余卡片片段
+        """
+        first = self.client.get(reverse('content_generator:task_list'))
+        response = self.client.get(reverse('content_generator:task_list'), {
+            'fragment': 1,
+            'cursor': first.context['next_cursor'],
+        })
+        data = response.json()
+        self.assertIsNone(data['next_cursor'])
+        self.assertEqual(data['html'].count('class="task-card'), 5)
+
+    def test_event_list_mobile_fragment(self):
+        """
+        测试移动端事件列表的加载更多片段
+        """
+        first = self.client.get(reverse('content_generator:event_list'), HTTP_USER_AGENT=MOBILE_UA)
+        self.assertTemplateUsed(first, 'content_generator/mobile_event_list.html')
+        response = self.client.get(reverse('content_generator:event_list'), {
+            'fragment': 1,
+            'cursor': first.context['next_cursor'],
+        }, HTTP_USER_AGENT=MOBILE_UA)
+        self.assertEqual(response.json()['html'].count('mobile-task-card'), 5)
+
+    def test_daily_summary_page(self):
+        """
+        测试日总结页面正常渲染
+        """
+        response = self.client.get(reverse('content_generator:daily_summary'))
+        self.assertEqual(response.status_code, 200)
+
+
+class MoodCalendarTest(TestCase):
+    """
+    心情日历接口测试
+    """
+
+    def setUp(self):
+        """
+        测试前的准备工作
+        """
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+        Event.objects.create(user=self.user, title='事件1', content='内容', mood='😄')
+        Event.objects.create(user=self.user, title='事件2', content='内容', mood='😄')
+        Event.objects.create(user=self.user, title='事件3', content='内容', mood='😢')
+        self.url = reverse('content_generator:mood_calendar')
+
+    def test_daily_histogram(self):
+        """
+        测试返回每天的心情分布
+        """
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        moods = [mood['value'] for mood in data['moods']]
+        counts = data['days'][data['end']]
+        self.assertEqual(counts[moods.index('😄')], 2)
+        self.assertEqual(counts[moods.index('😢')], 1)
+        self.assertEqual(len(data['days']), 1)
+
+    def test_etag_revalidation(self):
+        """
+        测试数据未变化时返回304，新增事件后ETag改变
+        """
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Event.objects.create(user=self.user, title='事件4', content='内容', mood='😎')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_invalid_range(self):
+        """
+        测试非法日期范围返回400
+        """
+        self.assertEqual(self.client.get(self.url, {'start': 'bad'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start': '2024-02-01', 'end': '2024-01-01'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start': '2020-01-01', 'end': '2024-01-01'}).status_code, 400)
@@ -0,0 +1,230 @@
+"""
+标题联想（typeahead）
+
+每个用户的任务和事件标题在进程内建立一个 n-gram（1~3个字符）倒排索引：
+第一次请求联想时从数据库加载该用户的全部标题，之后由保存/删除信号增量更新；
+最多保留 MAX_USERS 个用户的索引，超出时淘汰最久未使用的用户。
+
+索引只存在于当前进程，其他进程的写入不会通知到这里，
+因此每个用户的索引在 TTL 秒后重新加载。
+
+配置（均可省略）：
+
+    TYPEAHEAD = {'MAX_USERS': 500, 'TTL': 300}
+"""
+import heapq
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .models import Task, Event
+
+DEFAULT_MAX_USERS = 500
+DEFAULT_TTL = 300
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+
+# 索引的最长片段；中文常见2个字的查询，因此同时索引1~3个字符的片段
+MAX_GRAM = 3
+
+# 参与联想的模型
+SOURCES = {
+    'task': Task,
+    'event': Event,
+}
+MODEL_KINDS = {model: kind for kind, model in SOURCES.items()}
+
+
+def normalize_title(title):
+    """
+    规范化标题：统一Unicode形式并转为小写
+    """
+    return unicodedata.normalize('NFKC', title).casefold().strip()
+
+
+
+def ngrams(text, n):
+    """
+    文本中长度为 n 的片段集合
+    """
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def index_grams(text):
+    """
+    文本需要写入索引的全部片段
+    """
+    return set().union(*(ngrams(text, n) for n in range(1, MAX_GRAM + 1)))
+
+
+class TitleIndex:
+    """
+    单个用户的标题 n-gram 索引（非线程安全，由 TypeaheadIndex 加锁访问）
+    """
+
+    def __init__(self, loaded_at):
+        self.loaded_at = loaded_at
+        # (类型, ID) -> (原标题, 规范化标题)
+        self.titles = {}
+        # 片段 -> {(类型, ID)}
+        self.postings = {}
+
+    def add(self, key, title):
+        """
+        加入或替换一条标题
+        """
+        self.remove(key)
+        normalized = normalize_title(title)
+        self.titles[key] = (title, normalized)
+        for gram in index_grams(normalized):
+            self.postings.setdefault(gram, set()).add(key)
+
+    def remove(self, key):
+        """
+        移除一条标题
+        """
+        entry = self.titles.pop(key, None)
+        if entry is None:
+            return
+        for gram in index_grams(entry[1]):
+            keys = self.postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.postings[gram]
+
+    def suggest(self, query, limit):
+        """
+        返回包含查询文本的标题，前缀匹配优先，其次是较新的记录
+
+        先取查询中各片段倒排表的交集作为候选，再逐个确认子串匹配。
+        """
+        query = normalize_title(query)
+        if not query:
+            return []
+        grams = ngrams(query, min(len(query), MAX_GRAM))
+        postings = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+
+        matches = []
+        for key in candidates:
+            title, normalized = self.titles[key]
+            position = normalized.find(query)
+            if position >= 0:
+                matches.append((position != 0, -key[1], len(title), key, title))
+        return [
+            {'kind': key[0], 'id': key[1], 'title': title}
+            for _, _, _, key, title in heapq.nsmallest(limit, matches)
+        ]
+
+
+class TypeaheadIndex:
+    """
+    按用户懒加载、LRU 淘汰的标题索引
+
+    Args:
+        max_users (int): 最多保留索引的用户数
+        ttl (float): 用户索引的有效期（秒），过期后重新加载
+        clock: 返回当前时间（秒）的函数，测试时可替换
+    """
+
+    def __init__(self, max_users=DEFAULT_MAX_USERS, ttl=DEFAULT_TTL, clock=time.monotonic):
+        self.max_users = max_users
+        self.ttl = ttl
+        self.clock = clock
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, user_id):
+        """
+        从数据库加载一个用户的全部标题
+        """
+        index = TitleIndex(self.clock())
+        for kind, model in SOURCES.items():
+            for pk, title in model.objects.filter(user_id=user_id).values_list('pk', 'title').iterator():
+                index.add((kind, pk), title)
+        return index
+
+    def suggest(self, user_id, query, limit=DEFAULT_LIMIT):
+        """
+        返回用户标题中匹配 query 的联想结果
+        """
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is not None and index.loaded_at + self.ttl > self.clock():
+                self._users.move_to_end(user_id)
+                return index.suggest(query, limit)
+
+        # 加载时不持有锁，避免一个用户的查询阻塞其他用户
+        index = self.load(user_id)
+        with self._lock:
+            self._users[user_id] = index
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+            return index.suggest(query, limit)
+
+    def update(self, instance):
+        """
+        记录保存后更新标题；该用户的索引未加载时忽略
+        """
+        with self._lock:
+            index = self._users.get(instance.user_id)
+            if index is not None:
+                index.add((MODEL_KINDS[type(instance)], instance.pk), instance.title)
+
+    def remove(self, instance):
+        """
+        记录删除后移除标题
+        """
+        with self._lock:
+            index = self._users.get(instance.user_id)
+            if index is not None:
+                index.remove((MODEL_KINDS[type(instance)], instance.pk))
+
+    def clear(self):
+        """
+        丢弃所有用户的索引
+        """
+        with self._lock:
+            self._users.clear()
+
+    def __len__(self):
+        return len(self._users)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_typeahead_index():
+    """
+    按 settings.TYPEAHEAD 创建并返回进程内共享的联想索引
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                config = getattr(settings, 'TYPEAHEAD', None) or {}
+                _index = TypeaheadIndex(
+                    max_users=config.get('MAX_USERS', DEFAULT_MAX_USERS),
+                    ttl=config.get('TTL', DEFAULT_TTL),
+                )
+    return _index
+
+
+@receiver(setting_changed)
+def reset_typeahead_index(setting, **kwargs):
+    """
+    TYPEAHEAD 变化时丢弃索引
+    """
+    global _index
+    if setting == 'TYPEAHEAD':
+        with _index_lock:
+            _index = None
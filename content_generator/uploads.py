@@ -0,0 +1,288 @@
+"""
+事件图片上传
+
+EventImageUploadHandler 替代 Django 默认的上传处理器，在接收请求体的同时校验图片，
+不合格的文件立即丢弃剩余数据，不会先完整写入临时文件再由表单校验：
+
+- 累计字节数超过 MAX_BYTES 时拒绝；
+- 第一个数据块的魔数不是 JPEG/PNG/GIF/WebP 时拒绝；
+- 收到足够的文件头后只解析文件头得到尺寸，像素数超过 MAX_PIXELS 时拒绝；
+- 接收完成后只解码一次：按 EXIF 方向旋转、缩小到 MAX_SIDE 以内并重新编码，
+  不写回 EXIF（去掉拍摄地点等信息），结果直接写入临时文件交给表单。
+
+原始数据在 FILE_UPLOAD_MAX_MEMORY_SIZE 以内留在内存，超出后写入临时文件；
+同时重新编码的上传数不超过 MAX_CONCURRENT，每个请求的内存和磁盘占用都有上限。
+配置（均可省略）：
+
+    IMAGE_UPLOADS = {'MAX_BYTES': 15 * 1024 * 1024, 'MAX_PIXELS': 40000000, 'MAX_SIDE': 4096,
+                     'QUALITY': 90, 'MAX_CONCURRENT': 2}
+
+视图需要在 CSRF 校验读取 request.POST 之前替换上传处理器，见 views.add_event。
+"""
+import logging
+import posixpath
+import tempfile
+import threading
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'MAX_BYTES': 15 * 1024 * 1024,
+    'MAX_PIXELS': 40_000_000,
+    'MAX_SIDE': 4096,
+    'QUALITY': 90,
+    'MAX_CONCURRENT': 2,
+}
+
+# 文件头魔数：(偏移, 字节, Pillow 格式)
+SIGNATURES = [
+    (0, b'\xff\xd8\xff', 'JPEG'),
+    (0, b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (0, b'GIF87a', 'GIF'),
+    (0, b'GIF89a', 'GIF'),
+    (8, b'WEBP', 'WEBP'),
+]
+ALLOWED_FORMATS = ['JPEG', 'PNG', 'GIF', 'WEBP']
+# 判断魔数需要的字节数
+SIGNATURE_BYTES = 12
+# 在这么多字节内仍解析不出尺寸的文件视为无效（JPEG 的 EXIF 和内嵌缩略图通常不超过64KB）
+MAX_HEADER_BYTES = 256 * 1024
+
+# 等待重新编码名额的最长时间（秒）
+ENCODE_TIMEOUT = 30
+
+
+def upload_config():
+    """
+    合并默认值后的上传配置
+    """
+    return {**DEFAULTS, **(getattr(settings, 'IMAGE_UPLOADS', None) or {})}
+
+
+def sniff_format(head):
+    """
+    按魔数判断图片格式
+
+    Returns:
+        str: Pillow 格式名，不是支持的图片时返回 None
+    """
+    for offset, magic, image_format in SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            if image_format == 'WEBP' and head[:4] != b'RIFF':
+                continue
+            return image_format
+    return None
+
+
+class ImageRejected(Exception):
+    """
+    图片不符合上传要求，异常信息是显示给用户的原因
+    """
+
+
+def probe_header(head, config, complete=True):
+    """
+    根据文件开头的数据校验格式和尺寸（Image.open 只解析文件头，不解码像素）
+
+    Args:
+        head (bytes): 文件开头的数据
+        complete (bool): head 之后是否已没有更多数据，为 False 时数据不足以判断就返回 None 继续等待
+
+    Returns:
+        tuple: (Pillow 格式, (宽, 高))
+
+    Raises:
+        ImageRejected: 不是支持的图片、无法识别或尺寸过大
+    """
+    waiting = not complete and len(head) < MAX_HEADER_BYTES
+    if len(head) < SIGNATURE_BYTES and waiting:
+        return None
+    image_format = sniff_format(bytes(head[:SIGNATURE_BYTES]))
+    if image_format is None:
+        raise ImageRejected('只能上传 JPEG、PNG、GIF 或 WebP 图片')
+
+    try:
+        with Image.open(BytesIO(head), formats=[image_format]) as probe:
+            width, height = probe.size
+    except Image.DecompressionBombError:
+        raise ImageRejected('图片尺寸过大')
+    except (OSError, SyntaxError):
+        if waiting:
+            return None
+        raise ImageRejected('无法识别的图片文件')
+    if width * height > config['MAX_PIXELS']:
+        raise ImageRejected(f'图片尺寸过大（{width}×{height}）')
+    return image_format, (width, height)
+
+
+def reencode_image(source, destination, config):
+    """
+    解码图片，按 EXIF 方向旋转并缩小到 MAX_SIDE 以内，重新编码写入 destination
+
+    不传 exif 参数，输出中不含 EXIF；保留 ICC 色彩配置。
+    有透明通道的图片输出 PNG，其余输出 JPEG。
+
+    Returns:
+        tuple: (扩展名, 内容类型, 宽, 高)
+    """
+    max_side = config['MAX_SIDE']
+    with Image.open(source, formats=ALLOWED_FORMATS) as image:
+        if image.format == 'JPEG':
+            image.draft('RGB', (max_side, max_side))
+        icc_profile = image.info.get('icc_profile')
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+        image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    if has_alpha:
+        image = image.convert('RGBA')
+        image.save(destination, 'PNG', optimize=True, icc_profile=icc_profile)
+        return 'png', 'image/png', image.width, image.height
+    image = image.convert('RGB')
+    image.save(destination, 'JPEG', quality=config['QUALITY'], optimize=True, icc_profile=icc_profile)
+    return 'jpg', 'image/jpeg', image.width, image.height
+
+
+def process_image(source, destination, config):
+    """
+    在同时重新编码数的限制内执行 reencode_image
+
+    Raises:
+        ImageRejected: 等待超时或图片无法解码
+    """
+    slots = get_encode_slots()
+    if not slots.acquire(timeout=ENCODE_TIMEOUT):
+        raise ImageRejected('服务器繁忙，请稍后重新上传')
+    try:
+        return reencode_image(source, destination, config)
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        logger.error(f"上传的图片无法解码: {str(e)}")
+        raise ImageRejected('图片已损坏，无法读取')
+    finally:
+        slots.release()
+
+
+class EventImageUploadHandler(FileUploadHandler):
+    """
+    边接收边校验事件图片的上传处理器
+
+    只接受 field_name 字段的文件，其他文件字段直接丢弃。
+    被拒绝的原因记录在 errors 中，由视图加到表单的图片字段上。
+
+    Args:
+        request: 当前请求
+        field_name (str): 图片字段名
+        config (dict, optional): 上传配置，默认读取 settings.IMAGE_UPLOADS
+    """
+
+    def __init__(self, request=None, field_name='image', config=None):
+        super().__init__(request)
+        self.field_name = field_name
+        self.config = config or upload_config()
+        self.errors = []
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        if field_name != self.field_name:
+            raise SkipFile()
+        self.size = 0
+        self.head = bytearray()
+        self.dimensions = None
+        self.file = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE, dir=settings.FILE_UPLOAD_TEMP_DIR,
+        )
+
+    def reject(self, message):
+        """
+        记录拒绝原因并丢弃这个文件的剩余数据
+        """
+        self.errors.append(message)
+        raise SkipFile()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > self.config['MAX_BYTES']:
+            self.reject(f"图片不能超过 {self.config['MAX_BYTES'] // (1024 * 1024)}MB")
+        if self.dimensions is None:
+            self.head += raw_data[:MAX_HEADER_BYTES - len(self.head)]
+            self.check_header(complete=False)
+        self.file.write(raw_data)
+        return None
+
+    def check_header(self, complete):
+        """
+        根据已收到的文件头校验格式和尺寸，数据不足时继续等待
+        """
+        try:
+            result = probe_header(self.head, self.config, complete)
+        except ImageRejected as e:
+            self.reject(str(e))
+        if result is not None:
+            self.dimensions = result[1]
+            # 文件头已经用完，不再保留
+            self.head = bytearray()
+
+    def file_complete(self, file_size):
+        try:
+            if self.dimensions is None:
+                self.check_header(complete=True)
+        except SkipFile:
+            self.file.close()
+            return None
+        self.file.seek(0)
+
+        stem = posixpath.splitext(self.file_name or '')[0] or 'image'
+        upload = TemporaryUploadedFile(self.file_name, self.content_type, 0, None)
+        try:
+            extension, content_type, _, _ = process_image(self.file, upload.file, self.config)
+        except ImageRejected as e:
+            self.errors.append(str(e))
+            upload.close()
+            return None
+        finally:
+            self.file.close()
+
+        upload.name = f'{stem}.{extension}'
+        upload.content_type = content_type
+        upload.size = upload.file.tell()
+        upload.file.seek(0)
+        return upload
+
+    def upload_interrupted(self):
+        if hasattr(self, 'file'):
+            self.file.close()
+
+
+_slots = None
+_slots_lock = threading.Lock()
+
+
+def get_encode_slots():
+    """
+    按 settings.IMAGE_UPLOADS 创建并返回进程内限制同时重新编码数的信号量
+    """
+    global _slots
+    if _slots is None:
+        with _slots_lock:
+            if _slots is None:
+                _slots = threading.BoundedSemaphore(upload_config()['MAX_CONCURRENT'])
+    return _slots
+
+
+@receiver(setting_changed)
+def reset_encode_slots(setting, **kwargs):
+    """
+    IMAGE_UPLOADS 变化时重建信号量
+    """
+    global _slots
+    if setting == 'IMAGE_UPLOADS':
+        with _slots_lock:
+            _slots = None
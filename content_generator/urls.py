@@ -12,10 +12,17 @@ urlpatterns = [
     path('tasks/toggle/<int:task_id>/', views.toggle_task_completion, name='toggle_task_completion'),
     path('tasks/update-willingness/<int:task_id>/', views.update_willingness, name='update_willingness'),
     path('tasks/advice/<int:task_id>/', views.get_llm_advice, name='get_llm_advice'),
+    path('tasks/analytics/', views.task_analytics, name='task_analytics'),
     
     # 事件记录
     path('events/', views.event_list, name='event_list'),
     path('events/add/', views.add_event, name='add_event'),
+    path('events/moods/', views.mood_calendar, name='mood_calendar'),
+    path('events/<int:event_id>/similar/', views.similar_events, name='similar_events'),
+    path('events/<int:event_id>/image/<str:version>/<int:width>.<str:image_format>', views.resized_image, name='resized_image'),
+    path('uploads/', views.create_upload, name='create_upload'),
+    path('uploads/<uuid:upload_id>/', views.upload_session, name='upload_session'),
+    path('uploads/<uuid:upload_id>/finalize/', views.finalize_upload, name='finalize_upload'),
     
     # 日总结
     path('summary/', views.daily_summary, name='daily_summary'),
@@ -23,4 +30,8 @@ urlpatterns = [
     
     # 内容生成
     path('generate-content/<int:event_id>/', views.generate_content, name='generate_content'),
+    path('generate-content/<int:event_id>/stream/', views.stream_content, name='stream_content'),
+    path('jobs/<int:job_id>/', views.llm_job_status, name='llm_job_status'),
+    path('search/', views.search_view, name='search'),
+    path('search/suggest/', views.typeahead, name='typeahead'),
 ]
\ No newline at end of file
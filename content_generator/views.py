@@ -1,65 +1,181 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
+from django.urls import reverse
+from django.template.loader import render_to_string
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import condition, require_http_methods
+from django.views.decorators.cache import cache_control
+from django.utils.cache import patch_cache_control
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
-from .models import Task, Event, DailySummary, LLMAdvice
+from .models import Task, Event, DailySummary, LLMAdvice, LLMJob
 from .forms import TaskForm, EventForm
+from .stats import (
+    get_task_stats, get_event_stats, get_summary_stats, get_summary_streaks, get_daily_task_counts,
+    get_mood_calendar, mood_calendar_version,
+)
+from .pagination import paginate_by_cursor
+from .llm import generate_summary_with_llm, generate_work_evaluation_with_llm, stream_content_with_llm
+from .llm_backends import LLMError
+from .jobs import (
+    abandon_job, claim_jobs, complete_job, enqueue_advice_job, job_status_payload, renew_lease, submit_advice_job,
+)
+from .search import search, DEFAULT_LIMIT as DEFAULT_SEARCH_LIMIT, MAX_LIMIT as MAX_SEARCH_LIMIT
+from .uploads import EventImageUploadHandler, ImageRejected
+from .resumable import (
+    UploadConflict, attach_upload, create_session as create_upload_session, discard_session,
+    finalize_session, get_session as get_upload_session, resumable_config, session_payload, write_chunk,
+)
+from .resize import (
+    CACHE_MAX_AGE, FORMATS as RESIZE_FORMATS, ResizeUnavailable, get_resize_cache, image_version, render_resized,
+    resize_config, resize_key,
+)
+from .typeahead import get_typeahead_index, DEFAULT_LIMIT as DEFAULT_TYPEAHEAD_LIMIT, MAX_LIMIT as MAX_TYPEAHEAD_LIMIT
 from utils import is_mobile_device
+from PIL import Image
 import json
 import logging
+import os
+import re
+import socket
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+# 流式生成时领取任务的租约（秒），生成期间每过一半续约一次
+STREAM_LEASE_SECONDS = 120
+
+# 流式请求等待其他请求（可能在其他进程中）生成结果的最长时间和轮询间隔（秒）；
+# 等待期间占用一个 worker 线程，超时后改为发送 pending，由客户端轮询任务状态接口
+FLIGHT_WAIT_SECONDS = 5
+FLIGHT_POLL_SECONDS = 0.5
+
+# 心情日历一次最多返回的天数
+MOOD_CALENDAR_MAX_DAYS = 731
+
 def is_mobile(request):
     """检测是否为移动端设备"""
     return is_mobile_device(request)
 
+def pending_job_payload(job):
+    """排队中的生成任务，前端据此轮询结果"""
+    return {
+        'success': True,
+        'pending': True,
+        'job_id': job.id,
+        'status': job.status,
+        'poll_url': reverse('content_generator:llm_job_status', args=[job.id]),
+    }
+
+def pending_job_response(job):
+    """返回排队中的生成任务"""
+    return JsonResponse(pending_job_payload(job))
+
+def sse_event(event, data):
+    """编码一条 Server-Sent Events 消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def content_event_stream(user, event):
+    """
+    逐段推送事件分享文案，生成完成后保存为LLM建议
+
+    依次发送 token 消息（{"text": 片段}），最后发送 done（{"content", "advice_id"}）、
+    error（{"error"}）或 pending（与 pending_job_response 相同，客户端改为轮询 poll_url）。
+
+    同一事件的生成通过 LLMJob 协调：领取到该事件未完成任务的请求调用模型，
+    其他请求（包括其他进程中的请求和后台执行者正在执行的任务）轮询任务状态，完成后直接发送 done；
+    FLIGHT_WAIT_SECONDS 内没有完成时发送 pending 并结束，不长时间占用 worker。
+    """
+    worker_id = f'stream:{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+    job = enqueue_advice_job(user, 'event', event.id)
+    deadline = time.monotonic() + FLIGHT_WAIT_SECONDS
+    while True:
+        claimed = claim_jobs(worker_id, lease_seconds=STREAM_LEASE_SECONDS, job_ids=[job.id])
+        if claimed:
+            yield from lead_content_stream(claimed[0], worker_id, event)
+            return
+        job = LLMJob.objects.select_related('advice').get(pk=job.pk)
+        if job.status == 'done' and job.advice_id:
+            yield sse_event('done', {'content': job.advice.content, 'advice_id': job.advice_id})
+            return
+        if job.status == 'failed':
+            logger.error(f"等待分享文案生成失败: 任务 {job.id} 状态为 {job.status}")
+            yield sse_event('error', {'error': '生成失败，请重试'})
+            return
+        if time.monotonic() > deadline:
+            yield sse_event('pending', pending_job_payload(job))
+            return
+        time.sleep(FLIGHT_POLL_SECONDS)
+
+def lead_content_stream(job, worker_id, event):
+    """
+    持有任务租约时调用模型逐段推送，结束后写入任务结果
+    """
+    parts = []
+    renewed_at = time.monotonic()
+    finished = False
+    try:
+        try:
+            for piece in stream_content_with_llm(event):
+                parts.append(piece)
+                if time.monotonic() - renewed_at > STREAM_LEASE_SECONDS / 2:
+                    renew_lease([job], worker_id, STREAM_LEASE_SECONDS)
+                    renewed_at = time.monotonic()
+                yield sse_event('token', {'text': piece})
+        except LLMError as e:
+            abandon_job(job, worker_id, e)
+            finished = True
+            logger.error(f"流式生成分享文案失败: {str(e)}")
+            yield sse_event('error', {'error': '生成失败，请重试'})
+            return
+
+        content = ''.join(parts).strip()
+        complete_job(job, worker_id, content)
+        finished = True
+        job.refresh_from_db()
+        yield sse_event('done', {'content': content, 'advice_id': job.advice_id})
+    finally:
+        # 客户端中途断开时也要结束任务，避免等待者一直轮询到超时
+        if not finished:
+            abandon_job(job, worker_id, '生成已中断')
+
+def render_cards_fragment(request, template_name, context, next_cursor):
+    """渲染“加载更多”请求返回的卡片片段"""
+    return JsonResponse({
+        'success': True,
+        'html': render_to_string(template_name, context, request=request),
+        'next_cursor': next_cursor,
+    })
+
 @login_required
 def task_list(request):
     """
     任务列表页面
     """
-    tasks = Task.objects.filter(user=request.user).order_by('-created_at')
+    tasks, next_cursor = paginate_by_cursor(
+        Task.objects.filter(user=request.user),
+        request.GET.get('cursor'),
+    )
     now = timezone.now()
+    mobile = is_mobile(request)
     
-    # 计算统计信息
-    total_tasks = tasks.count()
-    completed_tasks = tasks.filter(completed=True).count()
-    pending_tasks = total_tasks - completed_tasks
-    overdue_tasks = tasks.filter(due_date__lt=now, completed=False).count()
-    completion_rate = round((completed_tasks / total_tasks * 100)) if total_tasks > 0 else 0
-    
-    # 计算优先级分布
-    high_priority_count = tasks.filter(priority='high').count()
-    medium_priority_count = tasks.filter(priority='medium').count()
-    low_priority_count = tasks.filter(priority='low').count()
-    
-    # 计算图表百分比（以最大值为100%）
-    max_count = max(high_priority_count, medium_priority_count, low_priority_count)
-    high_priority_percent = round((high_priority_count / max_count * 100)) if max_count > 0 else 0
-    medium_priority_percent = round((medium_priority_count / max_count * 100)) if max_count > 0 else 0
-    low_priority_percent = round((low_priority_count / max_count * 100)) if max_count > 0 else 0
+    # 加载更多：只返回卡片片段
+    if request.GET.get('fragment'):
+        cards_template = 'content_generator/_mobile_task_cards.html' if mobile else 'content_generator/_task_cards.html'
+        return render_cards_fragment(request, cards_template, {'tasks': tasks, 'now': now}, next_cursor)
     
+    # 计算统计信息
     context = {
         'tasks': tasks,
-        'total_tasks': total_tasks,
-        'completed_tasks': completed_tasks,
-        'pending_tasks': pending_tasks,
-        'overdue_tasks': overdue_tasks,
-        'completion_rate': completion_rate,
-        'high_priority_count': high_priority_count,
-        'medium_priority_count': medium_priority_count,
-        'low_priority_count': low_priority_count,
-        'high_priority_percent': high_priority_percent,
-        'medium_priority_percent': medium_priority_percent,
-        'low_priority_percent': low_priority_percent,
+        'next_cursor': next_cursor,
         'now': now,
+        **get_task_stats(request.user, now),
     }
     
     # 根据设备类型选择模板
-    template_name = 'content_generator/mobile_task_list.html' if is_mobile(request) else 'content_generator/task_list.html'
+    template_name = 'content_generator/mobile_task_list.html' if mobile else 'content_generator/task_list.html'
     return render(request, template_name, context)
 
 @login_required
@@ -74,14 +190,8 @@ def add_task(request):
             task.user = request.user
             task.save()
             
-            # 生成LLM建议
-            advice_content = generate_task_advice_with_llm(task)
-            LLMAdvice.objects.create(
-                user=request.user,
-                content=advice_content,
-                advice_type='task',
-                related_id=task.id
-            )
+            # LLM建议交给后台执行者生成（没有执行者时在请求中生成）
+            submit_advice_job(request.user, 'task', task.id)
             
             messages.success(request, '任务已添加')
             return redirect('content_generator:task_list')
@@ -90,7 +200,7 @@ def add_task(request):
     
     context = {
         'form': form,
-        'today': timezone.now().date()
+        'today': timezone.localdate()
     }
     
     # 根据设备类型选择模板
@@ -149,46 +259,184 @@ def event_list(request):
     from datetime import datetime, timedelta
     from django.utils import timezone
     
-    events = Event.objects.filter(user=request.user).order_by('-created_at')
+    events, next_cursor = paginate_by_cursor(
+        Event.objects.filter(user=request.user),
+        request.GET.get('cursor'),
+    )
+    mobile = is_mobile(request)
     
-    # 计算统计信息
-    now = timezone.now()
-    today = now.date()
-    week_start = today - timedelta(days=today.weekday())
-    month_start = today.replace(day=1)
+    # 加载更多：只返回卡片片段
+    if request.GET.get('fragment'):
+        cards_template = 'content_generator/_mobile_event_cards.html' if mobile else 'content_generator/_event_cards.html'
+        return render_cards_fragment(request, cards_template, {'events': events}, next_cursor)
     
-    total_events = events.count()
-    today_events = events.filter(created_at__date=today).count()
-    this_week_events = events.filter(created_at__date__gte=week_start).count()
-    this_month_events = events.filter(created_at__date__gte=month_start).count()
-    events_with_images = events.exclude(image='').count()
-    happy_events = events.filter(mood='😄').count()
+    # 计算统计信息
+    today = timezone.localdate()
     
     context = {
         'events': events,
-        'total_events': total_events,
-        'today_events': today_events,
-        'this_week_events': this_week_events,
-        'this_month_events': this_month_events,
-        'events_with_images': events_with_images,
-        'happy_events': happy_events
+        'next_cursor': next_cursor,
+        **get_event_stats(request.user, today),
     }
     
     # 根据设备类型选择模板
-    template_name = 'content_generator/mobile_event_list.html' if is_mobile(request) else 'content_generator/event_list.html'
+    template_name = 'content_generator/mobile_event_list.html' if mobile else 'content_generator/event_list.html'
     return render(request, template_name, context)
 
+def mood_calendar_range(request):
+    """
+    解析心情日历的日期范围，默认最近一年
+
+    Returns:
+        tuple: (start, end)，参数非法时返回None
+    """
+    from datetime import date, timedelta
+
+    try:
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else timezone.localdate()
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else end - timedelta(days=364)
+    except ValueError:
+        return None
+    if start > end or (end - start).days >= MOOD_CALENDAR_MAX_DAYS:
+        return None
+    return start, end
+
+def mood_calendar_etag(request):
+    """
+    心情日历的 ETag，由范围内每日汇总的版本决定
+    """
+    date_range = mood_calendar_range(request)
+    if date_range is None:
+        return None
+    return mood_calendar_version(request.user, *date_range)
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=mood_calendar_etag)
+def mood_calendar(request):
+    """
+    每日心情分布（日历热力图/心情时间线）
+
+    GET 参数 start、end 为 YYYY-MM-DD，默认最近一年；
+    数据未变化时根据 If-None-Match 返回304。
+    """
+    date_range = mood_calendar_range(request)
+    if date_range is None:
+        return JsonResponse({'success': False, 'error': f'日期范围无效（YYYY-MM-DD，最长 {MOOD_CALENDAR_MAX_DAYS} 天）'}, status=400)
+    return JsonResponse({'success': True, **get_mood_calendar(request.user, *date_range)})
+
+@login_required
+def similar_events(request, event_id):
+    """
+    与事件内容相似的其他事件（相似回忆）
+
+    GET 参数 k 为最多返回的条数。
+    """
+    # 向量检索依赖 NumPy，只在请求时加载
+    from .similar import DEFAULT_K, MAX_K, similar_events as find_similar_events
+
+    event = get_object_or_404(Event, id=event_id, user=request.user)
+    try:
+        k = min(max(int(request.GET.get('k', DEFAULT_K)), 1), MAX_K)
+    except ValueError:
+        k = DEFAULT_K
+    results = [
+        {
+            'id': other.id,
+            'title': other.title,
+            'mood': other.mood,
+            'created_at': other.created_at.isoformat(),
+            'score': round(score, 4),
+        }
+        for other, score in find_similar_events(event, k)
+    ]
+    return JsonResponse({'success': True, 'results': results})
+
+def resized_image_etag(request, event_id, version, width, image_format):
+    """
+    缩放结果的 ETag，参数不合法或图片已更换时为 None（由视图返回404）
+
+    结果连同事件记在 request.resized_image 上，视图直接使用，不再重复查询。
+    """
+    request.resized_image = (None, None)
+    config = resize_config()
+    if width not in config['WIDTHS'] or image_format not in config['FORMATS'] or image_format not in RESIZE_FORMATS:
+        return None
+    event = Event.objects.filter(pk=event_id, user=request.user).only('pk', 'image').first()
+    if event is None or not event.image or image_version(event.image.name) != version:
+        return None
+    etag = resize_key(event.image.name, width, image_format, config['QUALITY'])
+    request.resized_image = (etag, event)
+    return etag
+
+@login_required
+@condition(etag_func=resized_image_etag)
+def resized_image(request, event_id, version, width, image_format):
+    """
+    按需缩放的事件图片
+
+    宽度和格式必须在 IMAGE_RESIZE 的白名单中；地址带图片版本，响应可永久缓存。
+    """
+    etag, event = request.resized_image
+    if etag is None:
+        return JsonResponse({'success': False, 'error': '图片不存在或尺寸不支持'}, status=404)
+    _, content_type, extension = RESIZE_FORMATS[image_format]
+
+    def render():
+        with event.image.open('rb') as source:
+            return render_resized(source, width, image_format, resize_config()['QUALITY'])
+
+    try:
+        f = get_resize_cache().open(etag, extension, render)
+    except ResizeUnavailable as e:
+        logger.warning(f"缩放事件 {event_id} 的图片暂时不可用: {str(e)}")
+        response = JsonResponse({'success': False, 'error': '图片正在处理，请稍后重试'}, status=503)
+        response['Retry-After'] = '1'
+        return response
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        logger.error(f"缩放事件 {event_id} 的图片失败: {str(e)}")
+        return JsonResponse({'success': False, 'error': '图片无法读取'}, status=404)
+    response = FileResponse(f, content_type=content_type)
+    patch_cache_control(response, private=True, max_age=CACHE_MAX_AGE, immutable=True)
+    return response
+
+@login_required
+@csrf_exempt
 def add_event(request):
     """
     添加事件记录
+
+    图片由 EventImageUploadHandler 边接收边校验。替换上传处理器必须在读取 request.POST 之前，
+    而 CSRF 中间件会先读取它，因此这里豁免中间件，改由 _add_event 上的 csrf_protect 校验。
+    """
+    upload_handler = EventImageUploadHandler(request)
+    request.upload_handlers = [upload_handler]
+    return _add_event(request, upload_handler)
+
+@csrf_protect
+def _add_event(request, upload_handler):
+    """
+    添加事件记录（CSRF 校验之后）
     """
     if request.method == 'POST':
         form = EventForm(request.POST, request.FILES)
+        for error in upload_handler.errors:
+            form.add_error('image', error)
+        # 断点续传的图片以 upload_id 提交，见 resumable.py
+        upload_session = None
+        upload_id = request.POST.get('upload_id')
+        if upload_id and not request.FILES.get('image'):
+            upload_session = get_upload_session(request.user, upload_id)
+            if upload_session is None or not upload_session.result_name:
+                form.add_error('image', '图片上传已过期，请重新选择图片')
         if form.is_valid():
             event = form.save(commit=False)
             event.user = request.user
+            if upload_session is not None:
+                attach_upload(event, upload_session)
             event.save()
+            if upload_session is not None:
+                discard_session(upload_session)
             messages.success(request, '事件已记录')
             return redirect('content_generator:event_list')
     else:
@@ -198,6 +446,82 @@ def add_event(request):
     template_name = 'content_generator/mobile_add_event.html' if is_mobile(request) else 'content_generator/add_event.html'
     return render(request, template_name, {'form': form})
 
+@login_required
+@require_http_methods(["POST"])
+def create_upload(request):
+    """
+    创建断点续传的图片上传会话
+    """
+    try:
+        data = json.loads(request.body)
+        filename = str(data.get('filename', ''))
+        size = int(data.get('size'))
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'success': False, 'error': '需要 filename 和 size'}, status=400)
+    try:
+        upload_session = create_upload_session(request.user, filename, size)
+    except ImageRejected as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    return JsonResponse({'success': True, **session_payload(upload_session)}, status=201)
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+@login_required
+@require_http_methods(["GET", "PUT"])
+def upload_session(request, upload_id):
+    """
+    查询上传会话的进度（GET），或上传一个分片（PUT，带 Content-Range 请求头）
+
+    分片起点与已接收的字节数不一致时返回409和当前 offset，客户端从 offset 继续。
+    """
+    session = get_upload_session(request.user, upload_id)
+    if session is None:
+        return JsonResponse({'success': False, 'error': '上传会话不存在或已过期'}, status=404)
+    if request.method == 'GET':
+        return JsonResponse({'success': True, **session_payload(session)})
+
+    match = CONTENT_RANGE_RE.match(request.headers.get('Content-Range', ''))
+    if not match:
+        return JsonResponse({'success': False, 'error': '需要 Content-Range: bytes 起点-终点/总大小'}, status=400)
+    start, end, total = (int(value) for value in match.groups())
+    length = end - start + 1
+    if length <= 0 or length > resumable_config()['CHUNK_SIZE']:
+        return JsonResponse({'success': False, 'error': '分片过大'}, status=413)
+    # 分片大小有上限，整块读入内存后再写文件
+    data = request.read(length)
+    if len(data) != length:
+        return JsonResponse({'success': False, 'error': '分片不完整', 'offset': session.offset}, status=400)
+    try:
+        write_chunk(session, start, total, data)
+    except UploadConflict as e:
+        return JsonResponse({'success': False, 'error': str(e), 'offset': e.offset}, status=409)
+    except ImageRejected as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except OSError as e:
+        logger.error(f"写入上传分片失败: {str(e)}")
+        return JsonResponse({'success': False, 'error': '保存分片失败，请重试', 'offset': start}, status=500)
+    return JsonResponse({'success': True, **session_payload(session)})
+
+@login_required
+@require_http_methods(["POST"])
+def finalize_upload(request, upload_id):
+    """
+    完成上传：校验并重新编码图片，之后可在事件表单中以 upload_id 提交
+    """
+    session = get_upload_session(request.user, upload_id)
+    if session is None:
+        return JsonResponse({'success': False, 'error': '上传会话不存在或已过期'}, status=404)
+    try:
+        finalize_session(session)
+    except UploadConflict as e:
+        return JsonResponse({'success': False, 'error': '图片还没有上传完', 'offset': e.offset}, status=409)
+    except ImageRejected as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except OSError as e:
+        logger.error(f"处理上传的图片失败: {str(e)}")
+        return JsonResponse({'success': False, 'error': '处理图片失败，请重新上传'}, status=500)
+    return JsonResponse({'success': True, **session_payload(session)})
+
 @login_required
 def daily_summary(request):
     """
@@ -230,7 +554,7 @@ def daily_summary(request):
         return redirect('content_generator:daily_summary')
     
     # 获取数据
-    today = timezone.now().date()
+    today = timezone.localdate()
     week_start = today - timedelta(days=today.weekday())
     month_start = today.replace(day=1)
     
@@ -239,19 +563,12 @@ def daily_summary(request):
     summaries = all_summaries[:10]  # 最近10条
     
     # 计算统计数据
-    total_summaries = all_summaries.count()
-    this_week_summaries = all_summaries.filter(date__gte=week_start).count()
-    this_month_summaries = all_summaries.filter(date__gte=month_start).count()
+    summary_stats = get_summary_stats(request.user, today)
+    this_week_summaries = summary_stats['this_week_summaries']
+    this_month_summaries = summary_stats['this_month_summaries']
     
     # 计算连续天数
-    streak_days = 0
-    current_date = today
-    while True:
-        if all_summaries.filter(date=current_date).exists():
-            streak_days += 1
-            current_date -= timedelta(days=1)
-        else:
-            break
+    streaks = get_summary_streaks(request.user, today)
     
     # 计算完成度
     days_in_month = (today.replace(month=today.month+1, day=1) - timedelta(days=1)).day if today.month < 12 else 31
@@ -263,10 +580,8 @@ def daily_summary(request):
     context = {
         'summaries': summaries,
         'today': today,
-        'total_summaries': total_summaries,
-        'this_week_summaries': this_week_summaries,
-        'this_month_summaries': this_month_summaries,
-        'streak_days': streak_days,
+        **summary_stats,
+        **streaks,
         'month_progress': min(month_progress, 100),
         'week_progress': min(week_progress, 100),
     }
@@ -280,21 +595,21 @@ def generate_daily_summary(request):
     """
     生成日总结
     """
-    today = timezone.now().date()
-    
-    # 获取今天的任务完成情况
-    today_tasks = Task.objects.filter(
-        user=request.user,
-        created_at__date=today
-    )
-    
-    completed_tasks = today_tasks.filter(completed=True)
+    today = timezone.localdate()
     
-    # 生成LLM总结
-    summary_content = generate_summary_with_llm(today_tasks, completed_tasks)
+    # 获取今天的任务完成情况（一次聚合查询）
+    counts = get_daily_task_counts([request.user.id], today)[request.user.id]
     
-    # 生成工作评估
-    work_evaluation = generate_work_evaluation_with_llm(today_tasks, completed_tasks)
+    try:
+        # 生成LLM总结
+        summary_content = generate_summary_with_llm(counts)
+        
+        # 生成工作评估
+        work_evaluation = generate_work_evaluation_with_llm(counts)
+    except LLMError as e:
+        logger.error(f"生成日总结失败: {str(e)}")
+        messages.error(request, '日总结生成失败，请稍后重试')
+        return redirect('content_generator:daily_summary')
     
     # 保存总结
     summary, created = DailySummary.objects.get_or_create(
@@ -321,22 +636,29 @@ def generate_content(request, event_id):
     """
     event = get_object_or_404(Event, id=event_id, user=request.user)
     
-    # 生成LLM内容
-    generated_content = generate_content_with_llm(event)
-    
-    # 保存生成的建议
-    advice = LLMAdvice.objects.create(
-        user=request.user,
-        content=generated_content,
-        advice_type='event',
-        related_id=event.id
-    )
+    # 排队生成，前端轮询任务状态获取结果；没有执行者时已在请求中生成完毕
+    job = submit_advice_job(request.user, 'event', event.id)
+    if job.status == 'done' and job.advice_id:
+        return JsonResponse({'success': True, 'content': job.advice.content, 'advice_id': job.advice_id})
+    return pending_job_response(job)
+
+@login_required
+@require_http_methods(["POST"])
+def stream_content(request, event_id):
+    """
+    以 Server-Sent Events 流式生成事件分享文案
+
+    调用模型的请求在整个生成期间占用处理它的 worker，Gunicorn 需要使用线程 worker
+    （Procfile 中的 --worker-class gthread --threads）或以 ASGI 方式部署，
+    否则几个并发的流就会占满全部同步 worker；等待其他请求生成的流最多占用 FLIGHT_WAIT_SECONDS。
+    """
+    event = get_object_or_404(Event, id=event_id, user=request.user)
     
-    return JsonResponse({
-        'success': True,
-        'content': generated_content,
-        'advice_id': advice.id
-    })
+    response = StreamingHttpResponse(content_event_stream(request.user, event), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # 禁止反向代理缓冲，片段生成后立即送达浏览器
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 @login_required
 def get_llm_advice(request, task_id):
@@ -353,102 +675,74 @@ def get_llm_advice(request, task_id):
             related_id=task.id
         )
     except LLMAdvice.DoesNotExist:
-        # 生成新的建议
-        advice_content = generate_task_advice_with_llm(task)
-        advice = LLMAdvice.objects.create(
-            user=request.user,
-            content=advice_content,
-            advice_type='task',
-            related_id=task.id
-        )
+        # 排队生成新的建议，没有执行者时已在请求中生成完毕
+        job = submit_advice_job(request.user, 'task', task.id)
+        if job.status == 'done' and job.advice_id:
+            return JsonResponse({'success': True, 'advice': job.advice.content})
+        return pending_job_response(job)
     
     return JsonResponse({
         'success': True,
         'advice': advice.content
     })
 
-def generate_summary_with_llm(today_tasks, completed_tasks):
+@login_required
+def search_view(request):
     """
-    使用LLM生成日总结（模拟实现）
+    搜索任务、事件和日总结
+
+    GET 参数 q 为搜索词，limit 为最多返回的结果数；结果中的 snippet 已转义并用 <mark> 高亮。
     """
-    total_tasks = today_tasks.count()
-    completed_count = completed_tasks.count()
-    
-    if total_tasks == 0:
-        return "今天没有安排任务，可以适当放松一下。"
-    
-    completion_rate = completed_count / total_tasks * 100
-    
-    templates = [
-        f"今天完成了{completed_count}个任务，完成率{completion_rate:.1f}%。继续保持良好的工作状态！",
-        f"今日任务完成情况：{completed_count}/{total_tasks}，完成率{completion_rate:.1f}%。做得很好！",
-        f"今天完成了{completed_count}项任务，完成率{completion_rate:.1f}%。继续努力！"
-    ]
-    
-    import random
-    return random.choice(templates)
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit', DEFAULT_SEARCH_LIMIT)), 1), MAX_SEARCH_LIMIT)
+    except ValueError:
+        limit = DEFAULT_SEARCH_LIMIT
+    return JsonResponse({'success': True, 'query': query, 'results': search(request.user, query, limit)})
 
-def generate_work_evaluation_with_llm(today_tasks, completed_tasks):
+@login_required
+def typeahead(request):
     """
-    使用LLM生成工作评估（模拟实现）
+    任务和事件标题联想
+
+    GET 参数 q 为已输入的文本，limit 为最多返回的条数。
     """
-    total_tasks = today_tasks.count()
-    completed_count = completed_tasks.count()
-    
-    if total_tasks == 0:
-        return "今日无任务安排。"
-    
-    completion_rate = completed_count / total_tasks * 100
-    
-    if completion_rate >= 80:
-        evaluation = "工作效率很高，任务完成度优秀。"
-    elif completion_rate >= 60:
-        evaluation = "工作效率良好，任务完成度较好。"
-    elif completion_rate >= 40:
-        evaluation = "工作效率一般，还有提升空间。"
-    else:
-        evaluation = "工作效率较低，需要加强时间管理。"
-    
-    # 添加具体建议
-    if completed_tasks.filter(priority='high').count() < today_tasks.filter(priority='high').count():
-        evaluation += "建议优先处理高优先级任务。"
-    
-    return evaluation
+    query = request.GET.get('q', '')
+    try:
+        limit = min(max(int(request.GET.get('limit', DEFAULT_TYPEAHEAD_LIMIT)), 1), MAX_TYPEAHEAD_LIMIT)
+    except ValueError:
+        limit = DEFAULT_TYPEAHEAD_LIMIT
+    suggestions = get_typeahead_index().suggest(request.user.pk, query, limit) if query.strip() else []
+    return JsonResponse({'success': True, 'suggestions': suggestions})
 
-def generate_content_with_llm(event):
+@login_required
+def task_analytics(request):
     """
-    使用LLM生成内容（模拟实现）
+    任务效率分析（完成率趋势、意愿度与按时完成、各优先级逾期时长）
+
+    GET 参数 days 为统计天数，window 为完成率的滑动窗口天数。
     """
-    # 这里应该调用实际的LLM API
-    # 目前使用模拟数据
-    templates = [
-        f"今天发生了件有趣的事：{event.title}。{event.content} {event.get_mood_display()}",
-        f"分享一个生活片段：{event.title}。{event.content} 感觉{event.get_mood_display()}",
-        f"今日心情记录：{event.title}。{event.content} {event.get_mood_display()}",
-    ]
-    
-    import random
-    return random.choice(templates)
+    # 分析依赖 NumPy，只在请求分析时加载
+    from .analytics import DEFAULT_DAYS, DEFAULT_WINDOW, MAX_DAYS, get_task_analytics
+
+    try:
+        days = int(request.GET.get('days', DEFAULT_DAYS))
+        window = int(request.GET.get('window', DEFAULT_WINDOW))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': '参数必须是整数'}, status=400)
+    if not 1 <= days <= MAX_DAYS or not 1 <= window <= days:
+        return JsonResponse({'success': False, 'error': f'days 应在 1~{MAX_DAYS} 之间，window 应在 1~days 之间'}, status=400)
+
+    analytics = get_task_analytics(request.user, timezone.localdate(), days, window)
+    return JsonResponse({'success': True, **analytics})
 
-def generate_task_advice_with_llm(task):
+@login_required
+def llm_job_status(request, job_id):
     """
-    使用LLM为任务生成建议（模拟实现）
+    查询LLM生成任务的状态
     """
-    # 根据任务优先级和意愿度生成建议
-    if task.priority == 'high' and task.willingness in ['😭', '😕']:
-        advice = "这是一个高优先级但你不太愿意做的任务。建议将其分解成小步骤，逐步完成。"
-    elif task.priority == 'high' and task.willingness in ['🙂', '😄']:
-        advice = "这是一个高优先级且你愿意做的任务。建议安排专门的时间块来高效完成。"
-    elif task.priority == 'low' and task.willingness in ['😭', '😕']:
-        advice = "这是一个低优先级且你不太愿意做的任务。可以考虑委托给他人或延后处理。"
-    else:
-        advice = "这是一个常规任务。建议合理安排时间，平衡工作与休息。"
-    
-    # 添加时间管理建议
-    if task.due_date:
-        advice += f" 任务截止时间是{task.due_date.strftime('%Y-%m-%d %H:%M')}，请合理安排时间。"
-    
-    return advice
+    job = get_object_or_404(LLMJob.objects.select_related('advice'), id=job_id, user=request.user)
+    return JsonResponse(job_status_payload(job))
 
 @login_required
 @require_http_methods(["POST"])
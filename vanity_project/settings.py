@@ -210,6 +210,91 @@ try:
 except Exception:
     pass
 
+# LLM backend
+# 设置 LLM_API_URL（OpenAI 兼容的 chat completions 地址）后通过HTTP后端生成内容，
+# 未设置时使用内置模板。本地可用 `python manage.py run_llm_stub` 启动模拟服务：
+# LLM_API_URL=http://127.0.0.1:8001/v1/chat/completions
+LLM_API_URL = os.environ.get('LLM_API_URL', '')
+if LLM_API_URL:
+    LLM_BACKEND = {
+        'BACKEND': 'content_generator.llm_backends.HTTPBackend',
+        'OPTIONS': {
+            'url': LLM_API_URL,
+            'api_key': os.environ.get('LLM_API_KEY', ''),
+            'model': os.environ.get('LLM_MODEL', 'default'),
+            'timeout': float(os.environ.get('LLM_TIMEOUT', '30')),
+            'max_retries': int(os.environ.get('LLM_MAX_RETRIES', '2')),
+            'pool_size': int(os.environ.get('LLM_POOL_SIZE', '10')),
+            # 接受提示词列表的 completions 接口路径（如 /v1/completions），执行者据此合并请求
+            'batch_path': os.environ.get('LLM_BATCH_PATH') or None,
+            'max_batch_size': int(os.environ.get('LLM_MAX_BATCH_SIZE', '16')),
+        },
+    }
+else:
+    LLM_BACKEND = None
+
+# LLM调用费用估算：每千token单价，用于后台“LLM调用记录”汇总，均为0时不显示费用
+LLM_PRICING = {
+    'PROMPT': float(os.environ.get('LLM_PROMPT_PRICE', '0')),
+    'COMPLETION': float(os.environ.get('LLM_COMPLETION_PRICE', '0')),
+}
+
+# LLM调用记录保留的天数，更早的记录由 purge_llm_calls 命令删除
+LLM_CALL_RETENTION_DAYS = int(os.environ.get('LLM_CALL_RETENTION_DAYS', '30'))
+
+# LLM响应缓存：按提示词指纹缓存生成结果，MAX_SIZE 条目上限（0为关闭），TTL 有效期（秒）
+LLM_CACHE = {
+    'MAX_SIZE': int(os.environ.get('LLM_CACHE_SIZE', '1024')),
+    'TTL': int(os.environ.get('LLM_CACHE_TTL', '3600')),
+}
+
+# 标题联想索引：进程内最多保留 MAX_USERS 个用户的索引，TTL 秒后重新加载（其他进程的写入在此之后可见）
+TYPEAHEAD = {
+    'MAX_USERS': int(os.environ.get('TYPEAHEAD_MAX_USERS', '500')),
+    'TTL': int(os.environ.get('TYPEAHEAD_TTL', '300')),
+}
+
+# 相似回忆：事件向量的嵌入器和存放目录（目录中的文件可随时删除，查询时会重新构建）
+EVENT_EMBEDDER = {
+    'BACKEND': 'content_generator.similar.HashingEmbedder',
+    'OPTIONS': {'dim': int(os.environ.get('EVENT_EMBEDDING_DIM', '512'))},
+}
+EVENT_VECTORS_DIR = os.environ.get('EVENT_VECTORS_DIR', os.path.join(BASE_DIR, 'vectors'))
+
+# 事件图片缩略图：生成的宽度、质量，后台线程数和最多排队的任务数
+IMAGE_VARIANTS = {
+    'WIDTHS': [320, 640, 1280],
+    'QUALITY': 80,
+    'WORKERS': int(os.environ.get('IMAGE_VARIANT_WORKERS', '2')),
+    'MAX_PENDING': 32,
+}
+
+# 事件图片上传：单个文件的字节数、像素数上限，保存时的最长边、JPEG 质量和同时重新编码的上传数
+IMAGE_UPLOADS = {
+    'MAX_BYTES': int(os.environ.get('IMAGE_UPLOAD_MAX_BYTES', str(15 * 1024 * 1024))),
+    'MAX_PIXELS': 40_000_000,
+    'MAX_SIDE': 4096,
+    'QUALITY': 90,
+    'MAX_CONCURRENT': int(os.environ.get('IMAGE_UPLOAD_CONCURRENCY', '2')),
+}
+
+# 断点续传：分片暂存目录、分片大小、会话有效期（秒）和每个用户同时进行的会话数
+RESUMABLE_UPLOADS = {
+    'DIR': os.environ.get('UPLOAD_STAGING_DIR', os.path.join(BASE_DIR, 'upload_staging')),
+    'CHUNK_SIZE': 1024 * 1024,
+    'EXPIRY': 24 * 60 * 60,
+    'MAX_SESSIONS': 10,
+}
+
+# 按需缩放事件图片：允许的宽度和格式、质量，以及缩放结果磁盘缓存的目录和总大小上限
+IMAGE_RESIZE = {
+    'WIDTHS': [160, 320, 480, 640, 960, 1280, 1920],
+    'FORMATS': ['webp', 'jpeg'],
+    'QUALITY': 80,
+    'CACHE_DIR': os.environ.get('IMAGE_CACHE_DIR', os.path.join(BASE_DIR, 'image_cache')),
+    'MAX_CACHE_BYTES': int(os.environ.get('IMAGE_CACHE_MAX_BYTES', str(256 * 1024 * 1024))),
+}
+
 # Authentication settings
 LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = '/content/tasks/'